@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.utils import timezone
+from .catalog import songs_changed
 from .models import Artist, Song, SongLyricLine
 
 
@@ -7,6 +9,23 @@ class ArtistAdmin(admin.ModelAdmin):
     list_display = ("id", "name")
     search_fields = ("name",)
 
+    # Song payloads embed the artist name
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and "name" in form.changed_data:
+            obj.song_set.update(updated_at=timezone.now())
+            songs_changed(*obj.song_set.values_list("id", flat=True))
+
+    def delete_model(self, request, obj):
+        song_ids = list(obj.song_set.values_list("id", flat=True))
+        super().delete_model(request, obj)
+        songs_changed(*song_ids)
+
+    def delete_queryset(self, request, queryset):
+        song_ids = list(Song.objects.filter(artist__in=queryset).values_list("id", flat=True))
+        super().delete_queryset(request, queryset)
+        songs_changed(*song_ids)
+
 
 class SongLyricLineInline(admin.TabularInline):
     model = SongLyricLine
@@ -15,14 +34,17 @@ class SongLyricLineInline(admin.TabularInline):
     can_delete = False
 
 from django.contrib import admin
-from .models import Song, Artist, SongLyricLine
-from .utils import parse_lrc
+from .images import generate_cover_derivatives
+from .jobs import enqueue
+from .lyrics import repack_lyrics, store_lyrics
+from .models import Job, Song, Artist, SongLyricLine
+from .utils import LrcParser
 
 
 @admin.register(Song)
 class SongAdmin(admin.ModelAdmin):
-    list_display = ("id", "title", "artist", "genre", "language", "duration")
-    readonly_fields = ("uploaded_by",)
+    list_display = ("id", "title", "artist", "genre", "language", "duration", "processing_state")
+    readonly_fields = ("uploaded_by", "processing_state")
 
     def save_model(self, request, obj, form, change):
         """
@@ -40,19 +62,33 @@ class SongAdmin(admin.ModelAdmin):
 
         # PARSE LRC ONLY IF FILE WAS UPLOADED OR CHANGED
         if "lrc_file" in form.changed_data:
-            # Remove old lyrics
-            SongLyricLine.objects.filter(song=obj).delete()
+            parsed = []
 
             if obj.lrc_file:
-                lrc_text = obj.lrc_file.read().decode("utf-8-sig")
-                parsed = parse_lrc(lrc_text)
+                obj.lrc_file.open("rb")
+                parsed = list(LrcParser(obj.lrc_file))
+
+            # Replaces old lyric rows and the packed blob
+            store_lyrics(obj, parsed)
 
-                bulk_list = [
-                    SongLyricLine(song=obj, timestamp=line["timestamp"], text=line["text"])
-                    for line in parsed
-                ]
-                SongLyricLine.objects.bulk_create(bulk_list)
+        if "cover_image" in form.changed_data:
+            generate_cover_derivatives(obj.cover_image)
 
+        # Peaks and the decoded duration come from a worker, as for API uploads
+        if "audio_file" in form.changed_data:
+            enqueue("waveform", obj)
+
+        songs_changed(obj.pk)
+
+    def delete_model(self, request, obj):
+        pk = obj.pk
+        super().delete_model(request, obj)
+        songs_changed(pk)
+
+    def delete_queryset(self, request, queryset):
+        song_ids = list(queryset.values_list("id", flat=True))
+        super().delete_queryset(request, queryset)
+        songs_changed(*song_ids)
 
 
 @admin.register(SongLyricLine)
@@ -60,3 +96,28 @@ class SongLyricLineAdmin(admin.ModelAdmin):
     list_display = ("id", "song", "timestamp", "text")
     list_filter = ("song",)
     search_fields = ("text", "song__title")
+
+    # Keep the packed blob in sync with hand-edited lines
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        repack_lyrics(obj.song_id)
+        songs_changed(obj.song_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        repack_lyrics(obj.song_id)
+        songs_changed(obj.song_id)
+
+    def delete_queryset(self, request, queryset):
+        song_ids = set(queryset.values_list("song_id", flat=True))
+        super().delete_queryset(request, queryset)
+        for song_id in song_ids:
+            repack_lyrics(song_id)
+        songs_changed(*song_ids)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "song", "state", "attempts", "run_after", "locked_by")
+    list_filter = ("state", "kind")
+    readonly_fields = ("locked_by", "locked_at", "last_error", "created_at", "finished_at")
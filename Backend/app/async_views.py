@@ -0,0 +1,105 @@
+"""
+Async versions of the catalog read views, used when ASYNC_VIEWS is on
+(off by default, also under ASGI). They share the catalog cache, the
+serializers and the representations (app/renderers.py) with the DRF
+views in views.py.
+
+In Django 5.0 the async ORM calls still run through
+sync_to_async(thread_sensitive=True), so every query holds the single
+sync thread and concurrent requests queue for it. `manage.py loadtest`
+measures these views slower than the DRF views under WSGI.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.request import Request
+
+from .cache import catalog_cache
+from .conditional import not_modified, page_etag, set_validators, song_etag
+from .facets import catalog_facets
+from .filters import SongFilter
+from .metrics import span
+from .models import Song
+from .pagination import SongCursorPagination
+from .renderers import negotiate, render, representation_etag
+from .serializers import FastSongSerializer, SongListSerializer
+
+
+def _not_acceptable():
+    return HttpResponse(b'{"detail":"Could not satisfy the request Accept header."}',
+                        status=406, content_type="application/json")
+
+
+@require_GET
+async def song_list(request):
+    if negotiate(request) is None:
+        return _not_acceptable()
+    key = catalog_cache.list_key(request)
+    cached = catalog_cache.get(key)
+
+    if cached is None:
+        queryset = Song.objects.select_related("artist").defer("lyrics_packed")
+        filterset = SongFilter(request.GET, queryset=queryset, request=request)
+        # ?artist= is validated against the Artist table
+        if not await sync_to_async(filterset.is_valid)():
+            return render(request, {
+                field: [error["message"] for error in errors.get_json_data()]
+                for field, errors in filterset.errors.items()
+            }, status=400)
+
+        paginator = SongCursorPagination()
+        page = await paginator.apaginate_queryset(filterset.qs, Request(request))
+        facets = None
+        if request.GET.get("facets") in ("1", "true"):
+            facets = await sync_to_async(catalog_facets)()
+        links = (paginator.get_next_link(), paginator.get_previous_link())
+        etag = page_etag(request, page, links, json.dumps(facets, sort_keys=True) if facets else "")
+
+        response = not_modified(request, representation_etag(request, etag))
+        if response is not None:
+            return response
+
+        with span("serialize"):
+            results = SongListSerializer(page, many=True, context={"request": request}).data
+            data = paginator.get_paginated_response(results).data
+        if facets is not None:
+            data["facets"] = facets
+        cached = (etag, data)
+        catalog_cache.set(key, cached)
+
+    etag = representation_etag(request, cached[0])
+    return not_modified(request, etag) or set_validators(render(request, cached[1]), etag)
+
+
+@require_GET
+async def song_detail(request, pk):
+    if negotiate(request) is None:
+        return _not_acceptable()
+    key = catalog_cache.song_key(request, pk)
+    cached = catalog_cache.get(key)
+
+    if cached is None:
+        song = await Song.objects.select_related("artist").filter(pk=pk).afirst()
+        if song is None:
+            return render(request, {"detail": "No Song matches the given query."}, status=404)
+        etag = song_etag(request, song)
+
+        response = not_modified(request, representation_etag(request, etag), song.updated_at)
+        if response is not None:
+            return response
+
+        serializer = FastSongSerializer(song, context={"request": request})
+        with span("serialize"):
+            if song.lyrics_packed is None:
+                # No blob yet: the lyrics come from SongLyricLine rows
+                data = await sync_to_async(lambda: serializer.data)()
+            else:
+                data = serializer.data
+        cached = (etag, song.updated_at, data)
+        catalog_cache.set(key, cached)
+
+    etag, last_modified, data = cached
+    etag = representation_etag(request, etag)
+    return not_modified(request, etag, last_modified) or set_validators(render(request, data), etag, last_modified)
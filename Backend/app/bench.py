@@ -0,0 +1,115 @@
+"""
+Shared pieces of the benchmark commands (bench_lrc, bench_micro,
+generate_catalog, loadtest): synthetic data and timing helpers.
+"""
+import gc
+import io
+import math
+import platform
+import random
+import struct
+import subprocess
+import time
+import tracemalloc
+import wave
+
+WORDS = ["love", "night", "baby", "dance", "forever", "heart", "fire", "rain", "ça", "こころ"]
+
+
+def synthetic_lrc(target_bytes, seed=0):
+    """
+    Plain LRC body of roughly `target_bytes` UTF-8 bytes.
+    """
+    rng = random.Random(seed)
+    out = ["[ti:Synthetic]", "[ar:Benchmark]"]
+    size = 0
+    centis = 0
+    while size < target_bytes:
+        centis += rng.randint(150, 500)
+        line = _lrc_line(rng, centis)
+        out.append(line)
+        size += len(line.encode("utf-8")) + 1
+    return "\n".join(out).encode("utf-8")
+
+
+def synthetic_lyrics(lines, seed=0, title="Synthetic", artist="Benchmark"):
+    """
+    LRC body with exactly `lines` timed lines. Returns (bytes, last timestamp in seconds).
+    """
+    rng = random.Random(seed)
+    out = [f"[ti:{title}]", f"[ar:{artist}]"]
+    centis = 0
+    for _ in range(lines):
+        centis += rng.randint(150, 500)
+        out.append(_lrc_line(rng, centis))
+    return "\n".join(out).encode("utf-8"), centis / 100
+
+
+def _lrc_line(rng, centis):
+    minutes, rest = divmod(centis, 6000)
+    return f"[{minutes:02d}:{rest // 100:02d}.{rest % 100:02d}]" + " ".join(
+        rng.choice(WORDS) for _ in range(rng.randint(3, 9)))
+
+
+def synthetic_wav(seconds, frequency=440.0, rate=8000):
+    """
+    Mono 16-bit PCM sine tone.
+    """
+    frames = int(seconds * rate)
+    step = 2 * math.pi * frequency / rate
+    samples = struct.pack(f"<{frames}h", *(int(12000 * math.sin(i * step)) for i in range(frames)))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(samples)
+    return buf.getvalue()
+
+
+def synthetic_cover(seed, size=256):
+    """
+    PNG with a seed-dependent colour.
+    """
+    from PIL import Image
+
+    rng = random.Random(seed)
+    buf = io.BytesIO()
+    Image.new("RGB", (size, size), tuple(rng.randrange(256) for _ in range(3))).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def measure(fn, repeat):
+    """
+    Best wall time over `repeat` runs with the GC paused (as timeit does),
+    then one traced run for peak memory. tracemalloc slows allocation
+    down, so it is kept out of the timings.
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - started)
+        finally:
+            gc.enable()
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, min(timings), peak
+
+
+def run_metadata():
+    """
+    What a result was measured on, so JSON results can be compared across commits.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "machine": platform.machine()}
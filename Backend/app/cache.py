@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class LRUBackend:
+    """
+    In-process LRU cache. Default backend for the catalog cache.
+    Every worker process keeps its own copy; entries older than `timeout`
+    seconds are dropped on read (None keeps them until evicted).
+    """
+
+    def __init__(self, max_entries=2048, timeout=None):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            expires, value = self._data[key]
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.timeout if self.timeout is not None else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {"entries": len(self._data), "max_entries": self.max_entries, "evictions": self.evictions}
+
+
+class DjangoCacheBackend:
+    """
+    Adapter over a Django cache alias (e.g. Redis or Memcached from CACHES),
+    for sharing the catalog cache between worker processes.
+    """
+
+    def __init__(self, alias="default", timeout=None):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        # Looked up per use, so a CACHES override (e.g. in tests) applies
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        return {}
+
+
+class CatalogCache:
+    """
+    Response cache for the song catalog.
+
+    Detail entries are keyed by song id + that song's version, list pages
+    by the catalog version. A write bumps both, so stale entries are never
+    read again and simply age out of the backend.
+
+    The versions live in `versions`, a store every process shares (web
+    workers, run_workers, management commands), so a write anywhere
+    invalidates the entries cached everywhere.
+
+    With read replicas, a read right after a write may come from a replica
+    that hasn't caught up and cache the old rows. For REPLICA_PIN_SECONDS
+    after a bump the version reads as "settling": entries cached meanwhile
+    are keyed apart and dropped once the window closes, in every process.
+    """
+
+    def __init__(self, backend, versions=None):
+        self.backend = backend
+        self.versions = versions or backend
+        self.hits = 0
+        self.misses = 0
+
+    def _version(self, key):
+        value = self.versions.get(key)
+        if value is None:
+            value = self._bump(key, settle=False)
+        version, settled_at = value
+        return f"{version}~" if time.time() < settled_at else version
+
+    def _bump(self, key, settle=True):
+        settled_at = time.time() + settings.REPLICA_PIN_SECONDS if settle and settings.DATABASE_REPLICAS else 0
+        value = (time.time_ns(), settled_at)
+        self.versions.set(key, value)
+        return value
+
+    def song_key(self, request, pk):
+        version = self._version(f"catalog:song-version:{pk}")
+        return f"catalog:song:{pk}:{version}:{request.get_host()}"
+
+    def list_key(self, request):
+        return self.catalog_key(f"list:{request.get_host()}:{request.get_full_path()}")
+
+    def catalog_key(self, name):
+        # Valid until the next write to any song
+        version = self._version("catalog:version")
+        return f"catalog:{version}:{name}"
+
+    def get(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    def invalidate_song(self, pk):
+        self._bump(f"catalog:song-version:{pk}")
+        self._bump("catalog:version")
+
+    def invalidate_catalog(self):
+        # New songs only: existing detail entries stay valid
+        self._bump("catalog:version")
+
+    def clear(self):
+        self.backend.clear()
+        if self.versions is not self.backend:
+            self.versions.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            **self.backend.stats(),
+        }
+
+
+def _build_backend(config):
+    backend_class = import_string(config.get("BACKEND", "app.cache.LRUBackend"))
+    return backend_class(**config.get("OPTIONS", {}))
+
+
+def _build_cache():
+    config = getattr(settings, "CATALOG_CACHE", {})
+    versions = config.get("VERSIONS")
+    return CatalogCache(_build_backend(config), _build_backend(versions) if versions else None)
+
+
+catalog_cache = _build_cache()
+
+
+def invalidate_songs(*song_ids):
+    """
+    Invalidate cached responses for these songs once the current
+    transaction commits (right away in autocommit mode).
+    """
+    def invalidate():
+        for pk in song_ids:
+            catalog_cache.invalidate_song(pk)
+
+    transaction.on_commit(invalidate)
@@ -0,0 +1,12 @@
+from .cache import invalidate_songs
+from .search import update_index
+
+
+def songs_changed(*song_ids):
+    """
+    Propagate a write (create, edit, lyric change, delete) to the state
+    derived from the catalog: the search index, updated in the current
+    transaction, and the response cache, invalidated after commit.
+    """
+    update_index(song_ids)
+    invalidate_songs(*song_ids)
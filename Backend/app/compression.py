@@ -0,0 +1,146 @@
+import gzip
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.cache import has_vary_header, patch_vary_headers
+
+from .metrics import span
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Types worth compressing; media is already compressed
+COMPRESSIBLE_TYPES = re.compile(r"^(text/|application/(json|javascript|xml|msgpack|[\w.+-]+\+json))")
+
+# Types whose compressed bodies may be reused across requests: the catalog
+# payloads are the same for everyone, while HTML (the browsable API) shows
+# the requesting user and their CSRF token
+SHAREABLE_TYPES = re.compile(r"^application/(json|msgpack|[\w.+-]+\+json)")
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0: the same body always compresses to the same bytes
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def accepted_encoding(header):
+    """
+    The best coding we support from an Accept-Encoding header, or None.
+    Brotli wins over gzip when both are acceptable.
+    """
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                continue
+        accepted[coding.strip().lower()] = quality
+
+    for coding in (("br", "gzip") if brotli else ("gzip",)):
+        if accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return None
+
+
+class CompressedBodies:
+    """
+    LRU of compressed bodies keyed by (strong ETag, content type, coding),
+    bounded by total size. A strong ETag names the exact bytes of the
+    uncompressed body, so an entry never goes stale; unused ones age out.
+    Only user-independent bodies belong here (see SHAREABLE_TYPES).
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._data[key]
+
+    def set(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._data[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self):
+        return {"entries": len(self._data), "bytes": self.size, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
+
+
+compressed_bodies = CompressedBodies(settings.COMPRESSION_CACHE_BYTES)
+
+
+def compress_response(request, response):
+    """
+    Compress a buffered response in place when the client accepts it, the
+    type is compressible and the body is at least COMPRESSION_MIN_BYTES.
+    """
+    if (response.streaming or response.has_header("Content-Encoding") or response.status_code != 200
+            or not COMPRESSIBLE_TYPES.match(response.get("Content-Type", ""))
+            or len(response.content) < settings.COMPRESSION_MIN_BYTES):
+        return response
+
+    patch_vary_headers(response, ("Accept-Encoding",))
+
+    encoding = accepted_encoding(request.headers.get("Accept-Encoding", ""))
+    if encoding is None:
+        return response
+
+    etag = response.get("ETag", "")
+    key = None
+    if (etag.startswith('"') and SHAREABLE_TYPES.match(response["Content-Type"])
+            and not has_vary_header(response, "Cookie")):
+        key = (etag, response["Content-Type"], encoding)
+    body = compressed_bodies.get(key) if key else None
+    if body is None:
+        with span("compress"):
+            body = compress(response.content, encoding)
+        if key:
+            compressed_bodies.set(key, body)
+    if len(body) >= len(response.content):
+        return response
+
+    response.content = body
+    response["Content-Encoding"] = encoding
+    response["Content-Length"] = str(len(body))
+    if key:
+        # Same representation, different bytes: the validator becomes weak
+        # (If-None-Match compares weakly, so revalidation still gets 304s)
+        response["ETag"] = f"W/{etag}"
+    return response
@@ -0,0 +1,48 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def song_etag(request, song, variant=""):
+    """
+    Strong ETag for a song detail payload. The payload embeds absolute
+    media URLs, so the host is part of the validator. `variant` tells
+    apart different representations of the same song version.
+    """
+    raw = f"{song.pk}:{song.updated_at.isoformat()}:{request.get_host()}:{variant}"
+    return '"%s"' % hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def page_etag(request, songs, links=(), extra=""):
+    """
+    Strong ETag for one cursor page: the rows on the page, their versions
+    and the page's next/previous links (a song added after a full last
+    page adds a next link). `extra` covers anything else in the body
+    (e.g. facet counts).
+    """
+    digest = hashlib.sha256(f"{request.get_host()}:{request.get_full_path()}:{links}:{extra}".encode())
+    for song in songs:
+        digest.update(f"|{song.pk}:{song.updated_at.isoformat()}".encode())
+    return '"%s"' % digest.hexdigest()[:32]
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Returns a 304 response when the request's If-None-Match /
+    If-Modified-Since validators match, else None.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    # Clients may keep the body but must revalidate before reuse
+    response["Cache-Control"] = "no-cache"
+    return response
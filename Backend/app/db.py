@@ -0,0 +1,15 @@
+from django.conf import settings
+
+
+def pragma_statements(pragmas):
+    """`PRAGMA name=value` for every pragma that is set."""
+    return [f"PRAGMA {name}={value}" for name, value in pragmas.items() if value]
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created receiver: tune each new SQLite connection (SQLITE_PRAGMAS)."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(settings.SQLITE_PRAGMAS):
+            cursor.execute(statement)
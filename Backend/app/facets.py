@@ -0,0 +1,25 @@
+from django.db.models import Count
+
+from .cache import catalog_cache
+from .models import Song
+
+FACET_FIELDS = ("genre", "language")
+
+
+def catalog_facets():
+    """
+    {field: [{"value", "count"}, ...]} over the whole catalog.
+    Computed once per catalog version, so the GROUP BY only runs after a write.
+    """
+    key = catalog_cache.catalog_key("facets")
+    facets = catalog_cache.get(key)
+    if facets is None:
+        facets = {
+            field: [
+                {"value": row[field], "count": row["count"]}
+                for row in Song.objects.values(field).annotate(count=Count("id")).order_by("-count", field)
+            ]
+            for field in FACET_FIELDS
+        }
+        catalog_cache.set(key, facets)
+    return facets
@@ -0,0 +1,15 @@
+import django_filters
+
+from .models import Song
+
+
+class SongFilter(django_filters.FilterSet):
+    """
+    Catalog filters; each maps onto an index on Song.
+    """
+    duration_min = django_filters.NumberFilter(field_name="duration", lookup_expr="gte")
+    duration_max = django_filters.NumberFilter(field_name="duration", lookup_expr="lte")
+
+    class Meta:
+        model = Song
+        fields = ["genre", "language", "artist"]
@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from .locks import named_lock
+
+try:
+    import fcntl
+except ImportError:  # Windows: per-process locking only
+    fcntl = None
+
+# Thumbnail edge lengths (px) and output formats for Song.cover_image
+COVER_SIZES = (160, 320, 640)
+COVER_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def cover_digest(source_name):
+    return hashlib.sha256(source_name.encode("utf-8")).hexdigest()
+
+
+def derivative_name(source_name, size, fmt):
+    """
+    Deterministic storage path for one derivative of a cover image.
+    """
+    digest = cover_digest(source_name)
+    return f"song_covers/derived/{digest[:2]}/{digest}/{size}.{fmt}"
+
+
+def delete_cover_derivatives(source_name):
+    """
+    Remove every derivative of a cover that is no longer stored.
+    """
+    digest = cover_digest(source_name)
+    shutil.rmtree(default_storage.path(f"song_covers/derived/{digest[:2]}/{digest}"), ignore_errors=True)
+
+
+def _render(source_path, target_path, size, fmt):
+    pil_format, options = COVER_FORMATS[fmt]
+
+    with Image.open(source_path) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((size, size), Image.LANCZOS)
+        if pil_format == "JPEG" and img.mode != "RGB":
+            img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+
+        # Write next to the target and rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                img.save(out, pil_format, **options)
+            os.replace(tmp_path, target_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def ensure_derivative(source_name, size, fmt):
+    """
+    Returns the filesystem path of a cover derivative, rendering it first
+    if it doesn't exist yet. Concurrent callers for the same derivative
+    wait for a single render (thread lock + flock across processes).
+    """
+    if size not in COVER_SIZES or fmt not in COVER_FORMATS:
+        raise ValueError(f"Unsupported cover derivative: {size}.{fmt}")
+
+    name = derivative_name(source_name, size, fmt)
+    target_path = default_storage.path(name)
+    if os.path.exists(target_path):
+        return target_path
+
+    # One lock per cover: a thread lock within the process, flock across processes
+    cover_dir = os.path.dirname(target_path)
+    os.makedirs(cover_dir, exist_ok=True)
+    with named_lock(cover_dir), open(os.path.join(cover_dir, ".lock"), "a") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if not os.path.exists(target_path):
+                _render(default_storage.path(source_name), target_path, size, fmt)
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    return target_path
+
+
+def generate_cover_derivatives(cover):
+    """
+    Render every size/format for a newly uploaded cover (a FieldFile).
+    Failures are logged and left for the lazy endpoint to retry.
+    """
+    if not cover:
+        return
+    for size in COVER_SIZES:
+        for fmt in COVER_FORMATS:
+            try:
+                ensure_derivative(cover.name, size, fmt)
+            except OSError as exc:
+                logger.warning("Could not render %s.%s of cover %s: %s", size, fmt, cover.name, exc)
+
+
+def cover_srcset(song, request=None):
+    """
+    {format: {size: url}} for the song's cover. URLs point at the lazy
+    derivative endpoint and carry the source digest, so they change
+    whenever the cover does and can be cached forever.
+    """
+    if not song.cover_image:
+        return {}
+
+    version = cover_digest(song.cover_image.name)[:12]
+    srcset = {}
+    for fmt in COVER_FORMATS:
+        srcset[fmt] = {}
+        for size in COVER_SIZES:
+            url = reverse("song-cover", args=[song.pk, size, fmt]) + f"?v={version}"
+            srcset[fmt][str(size)] = request.build_absolute_uri(url) if request else url
+    return srcset
@@ -0,0 +1,194 @@
+"""
+Bulk catalog import (used by `manage.py import_catalog`).
+
+Entries are prepared (LRC read and parsed) in worker processes, then
+written in large batches from the parent. Only stdlib and app.utils are
+imported at module level so that spawned workers don't need Django set up.
+"""
+import csv
+import hashlib
+import json
+import math
+import os
+import re
+from pathlib import Path
+
+from .utils import LrcParser
+
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".flac", ".ogg", ".m4a", ".aac"}
+COVER_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+MANIFEST_FIELDS = ("title", "artist", "language", "genre", "duration",
+                   "audio", "lrc", "cover", "key")
+
+
+def import_key(entry):
+    """
+    Stable identity of an entry: the manifest `key` if given, else a hash
+    of the audio path relative to the import root.
+    """
+    if entry.get("key"):
+        return str(entry["key"])[:64]
+    return hashlib.sha256(entry["audio"].encode("utf-8")).hexdigest()
+
+
+def _title_and_artist(stem):
+    # "Artist_-_Title" / "Artist - Title"
+    name = stem.replace("_", " ")
+    artist, sep, title = name.partition(" - ")
+    if not sep:
+        return name.strip(), ""
+    return re.sub(r"\s+", " ", title).strip(), re.sub(r"\s+", " ", artist).strip()
+
+
+def scan_directory(root):
+    """
+    Yield entries for every audio file under `root`, pairing it with a
+    same-stem .lrc and cover image when present.
+    """
+    root = Path(root)
+    for path in sorted(root.rglob("*")):
+        if path.suffix.lower() not in AUDIO_EXTENSIONS:
+            continue
+        title, artist = _title_and_artist(path.stem)
+        lrc = path.with_suffix(".lrc")
+        cover = next((path.with_suffix(ext) for ext in COVER_EXTENSIONS
+                      if path.with_suffix(ext).exists()), None)
+        yield {
+            "title": title,
+            "artist": artist,
+            "audio": str(path.relative_to(root)),
+            "lrc": str(lrc.relative_to(root)) if lrc.exists() else "",
+            "cover": str(cover.relative_to(root)) if cover else "",
+        }
+
+
+def read_manifest(path):
+    """
+    Yield entries from a CSV (header row) or JSONL manifest.
+    File paths in the manifest are relative to the manifest's directory.
+    """
+    path = Path(path)
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        if path.suffix.lower() == ".jsonl":
+            rows = (json.loads(line) for line in fh if line.strip())
+        else:
+            rows = csv.DictReader(fh)
+        for row in rows:
+            yield {field: row.get(field) or "" for field in MANIFEST_FIELDS}
+
+
+def prepare_entry(args):
+    """
+    Worker: validate the duration and files and parse the LRC.
+    Returns (entry, lines, error); `lines` are (timestamp, text) pairs.
+    """
+    entry, root = args
+    try:
+        try:
+            duration = float(entry.get("duration") or 0)
+        except ValueError:
+            duration = math.nan
+        if not 0 <= duration < 2 ** 31:  # also rejects nan
+            raise ValueError(f"invalid duration: {entry['duration']}")
+        entry = {**entry, "duration": int(duration)}
+
+        audio = os.path.join(root, entry["audio"])
+        if not os.path.isfile(audio):
+            raise FileNotFoundError(f"audio file not found: {entry['audio']}")
+
+        lines = []
+        if entry.get("lrc"):
+            with open(os.path.join(root, entry["lrc"]), "rb") as fh:
+                lines = [(line.timestamp, line.text) for line in LrcParser(fh)]
+
+        if entry.get("cover") and not os.path.isfile(os.path.join(root, entry["cover"])):
+            raise FileNotFoundError(f"cover file not found: {entry['cover']}")
+
+        return entry, lines, None
+    except (OSError, ValueError) as exc:
+        return entry, None, str(exc)
+
+
+def write_batch(prepared, root, defaults):
+    """
+    Copy the batch's files into media storage, then insert the entries in
+    a single transaction: artists (get-or-create), songs with packed
+    lyrics, lyric rows. Returns the number of songs written.
+    """
+    from django.core.files import File
+
+    from .models import Song
+    from .storage import media_storage, release_unreferenced
+
+    if not prepared:
+        return 0
+
+    def store(field_name, relative_path):
+        if not relative_path:
+            return ""
+        field = Song._meta.get_field(field_name)
+        name = field.generate_filename(None, os.path.basename(relative_path))
+        with open(os.path.join(root, relative_path), "rb") as fh:
+            return field.storage.save(name, File(fh), max_length=field.max_length)
+
+    # Copied outside the transaction; released again if the batch fails.
+    # bulk_create() sends no post_save, so the batch drops its own leases
+    files = []
+    try:
+        for entry, _ in prepared:
+            files.append((store("audio_file", entry["audio"]), store("lrc_file", entry.get("lrc")),
+                          store("cover_image", entry.get("cover"))))
+        written = _insert_batch(prepared, files, defaults)
+    except BaseException:
+        stored = [name for names in files for name in names]
+        media_storage.drop_leases(stored)
+        release_unreferenced(stored)
+        raise
+    media_storage.drop_leases([name for names in files for name in names])
+    return written
+
+
+def _insert_batch(prepared, files, defaults):
+    from django.db import transaction
+
+    from .lyrics import BULK_BATCH_SIZE, pack_lyrics
+    from .models import Artist, Song, SongLyricLine
+    from .search import update_index
+
+    with transaction.atomic():
+        names = {entry["artist"] for entry, _ in prepared if entry["artist"]}
+        artists = {}
+        for artist in Artist.objects.filter(name__in=names).order_by("id"):
+            artists.setdefault(artist.name, artist)
+        missing = [Artist(name=name) for name in names if name not in artists]
+        for artist in Artist.objects.bulk_create(missing):
+            artists[artist.name] = artist
+
+        songs = Song.objects.bulk_create([
+            Song(
+                title=entry["title"] or Path(entry["audio"]).stem,
+                artist=artists.get(entry["artist"]),
+                language=entry.get("language") or defaults["language"],
+                genre=entry.get("genre") or defaults["genre"],
+                duration=entry["duration"],
+                audio_file=audio_file,
+                lrc_file=lrc_file,
+                cover_image=cover_image,
+                lyrics_packed=pack_lyrics(lines),
+                import_key=import_key(entry),
+            )
+            for (entry, lines), (audio_file, lrc_file, cover_image) in zip(prepared, files)
+        ])
+
+        SongLyricLine.objects.bulk_create(
+            (
+                SongLyricLine(song=song, timestamp=timestamp, text=text)
+                for song, (_, lines) in zip(songs, prepared)
+                for timestamp, text in lines
+            ),
+            batch_size=BULK_BATCH_SIZE,
+        )
+
+        update_index([song.pk for song in songs])
+
+    return len(songs)
@@ -0,0 +1,223 @@
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import invalidate_songs
+from .models import Job, Song
+
+logger = logging.getLogger(__name__)
+
+# kind -> callable(song)
+HANDLERS = {}
+
+# Jobs queued for every API upload; they run concurrently
+UPLOAD_JOBS = ("lyrics", "covers", "waveform")
+
+
+def handler(kind):
+    """
+    Register the function that runs jobs of `kind`.
+    """
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, song=None, delay=0):
+    return Job.objects.create(
+        kind=kind, song=song, max_attempts=settings.JOBS_MAX_ATTEMPTS,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue_upload(song):
+    """
+    Queue the processing of a freshly uploaded song.
+    """
+    now = timezone.now()
+    Job.objects.bulk_create([
+        Job(kind=kind, song=song, max_attempts=settings.JOBS_MAX_ATTEMPTS, run_after=now)
+        for kind in UPLOAD_JOBS
+    ])
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff with jitter: base * 2^(attempts - 1), capped.
+    """
+    delay = min(settings.JOBS_RETRY_MAX_DELAY, settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def claim(worker, batch=10):
+    """
+    Take the next due job. The conditional UPDATE is the lock, so several
+    workers (threads or processes, on any backend) never run the same job.
+    """
+    now = timezone.now()
+    due = (Job.objects.filter(state=Job.QUEUED, run_after__lte=now)
+           .order_by("run_after", "id").values_list("id", flat=True)[:batch])
+    for job_id in due:
+        claimed = Job.objects.filter(pk=job_id, state=Job.QUEUED).update(
+            state=Job.RUNNING, locked_by=worker, locked_at=now, attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Job.objects.select_related("song").get(pk=job_id)
+    return None
+
+
+def requeue_stale():
+    """
+    Put back jobs whose worker died mid-run (locked longer than JOBS_LOCK_TIMEOUT).
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    return Job.objects.filter(state=Job.RUNNING, locked_at__lt=cutoff).update(
+        state=Job.QUEUED, locked_by="", locked_at=None, run_after=timezone.now(),
+    )
+
+
+def run_job(job):
+    """
+    Run a claimed job; on failure schedule a retry or, out of attempts, fail it.
+    """
+    if job.song_id is not None:
+        started = Song.objects.filter(pk=job.song_id, processing_state=Song.PENDING).update(
+            processing_state=Song.PROCESSING, updated_at=timezone.now(),
+        )
+        if started:
+            invalidate_songs(job.song_id)
+
+    try:
+        HANDLERS[job.kind](job.song)
+    except Exception as exc:
+        error = "".join(traceback.format_exception(exc))
+        if job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            logger.warning("Job %s failed (attempt %d), retrying in %.1fs: %s", job, job.attempts, delay, exc)
+            Job.objects.filter(pk=job.pk).update(
+                state=Job.QUEUED, locked_by="", locked_at=None, last_error=error,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+            return False
+        logger.error("Job %s failed after %d attempts: %s", job, job.attempts, exc)
+        Job.objects.filter(pk=job.pk).update(state=Job.FAILED, last_error=error, finished_at=timezone.now())
+    else:
+        Job.objects.filter(pk=job.pk).update(state=Job.DONE, last_error="", finished_at=timezone.now())
+
+    if job.song_id is not None:
+        settle(job.song_id)
+    return True
+
+
+def settle(song_id):
+    """
+    Once a song has no queued or running jobs left, mark it ready
+    (or failed, if any job gave up).
+    """
+    jobs = Job.objects.filter(song_id=song_id)
+    if jobs.filter(state__in=[Job.QUEUED, Job.RUNNING]).exists():
+        return
+    state = Song.FAILED if jobs.filter(state=Job.FAILED).exists() else Song.READY
+    changed = Song.objects.filter(pk=song_id).exclude(processing_state=state).update(
+        processing_state=state, updated_at=timezone.now(),
+    )
+    if changed:
+        # Drops the copies the web workers cached while the song was pending
+        invalidate_songs(song_id)
+
+
+def run_pending(worker=None):
+    """
+    Run due jobs until none are left. Returns how many were run.
+    """
+    worker = worker or worker_name()
+    count = 0
+    while (job := claim(worker)) is not None:
+        run_job(job)
+        count += 1
+    return count
+
+
+def work(stop, poll_interval):
+    """
+    Worker loop for one thread: run due jobs, sleep when idle, until `stop` is set.
+    """
+    worker = worker_name()
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            ran = run_pending(worker)
+        except Exception:
+            logger.exception("Worker %s could not claim jobs", worker)
+            ran = 0
+        if not ran:
+            stop.wait(poll_interval)
+    close_old_connections()
+
+
+# Upload processing
+
+@handler("lyrics")
+def parse_lyrics(song):
+    from .lyrics import store_lyrics
+    from .utils import LrcParser
+
+    with song.lrc_file.open("rb") as lrc_file:
+        lines = list(LrcParser(lrc_file))
+    store_lyrics(song, lines)
+    # The index covers lyrics, so it is rebuilt once they are stored
+    enqueue("index", song)
+
+
+@handler("covers")
+def render_covers(song):
+    from .images import COVER_FORMATS, COVER_SIZES, ensure_derivative
+
+    if not song.cover_image:
+        return
+    for size in COVER_SIZES:
+        for fmt in COVER_FORMATS:
+            ensure_derivative(song.cover_image.name, size, fmt)
+
+
+@handler("waveform")
+def analyse_audio(song):
+    from .waveform import UnsupportedAudio, decodable, ensure_waveform, read_header
+
+    if not song.audio_file or not decodable(song.audio_file.name):
+        return
+    try:
+        path = ensure_waveform(song.audio_file.name)
+    except UnsupportedAudio as exc:
+        # Not retried: decoding won't succeed next time either
+        logger.warning("No waveform for song %s: %s", song.pk, exc)
+        return
+    with open(path, "rb") as peaks:
+        header = read_header(peaks.read(4096))
+    # The decoded length replaces whatever the uploader typed in
+    duration = round(header["duration"])
+    if duration != song.duration:
+        Song.objects.filter(pk=song.pk).update(duration=duration, updated_at=timezone.now())
+        invalidate_songs(song.pk)
+
+
+@handler("index")
+def index_song(song):
+    from .catalog import songs_changed
+
+    with transaction.atomic():
+        songs_changed(song.pk)
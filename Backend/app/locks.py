@@ -0,0 +1,26 @@
+import threading
+from contextlib import contextmanager
+
+# name -> [lock, holders and waiters]
+_locks = {}
+_guard = threading.Lock()
+
+
+@contextmanager
+def named_lock(name):
+    """
+    Thread lock per name, for work that must not run twice at once in a
+    process (e.g. rendering one derivative). The entry is dropped when
+    the last holder releases it, so the table only holds names in use.
+    """
+    with _guard:
+        entry = _locks.setdefault(name, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _locks[name]
@@ -0,0 +1,194 @@
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Song, SongLyricLine
+
+# Rows per INSERT when storing lyric lines
+BULK_BATCH_SIZE = 500
+
+# Packed layout (little-endian):
+#   b"LRCP" magic, uint32 line count N,
+#   N float64 timestamps, N+1 uint32 offsets into the text table,
+#   UTF-8 text table.
+MAGIC = b"LRCP"
+HEADER = struct.Struct("<4sI")
+
+
+def pack_lyrics(lines):
+    """
+    Pack (timestamp, text) pairs into a single compact blob.
+    Lines are stored sorted by timestamp (stable), so readers can bisect.
+    """
+    lines = sorted(lines, key=lambda line: line[0])
+    timestamps = array("d")
+    offsets = array("I", [0])
+    texts = []
+    position = 0
+
+    for timestamp, text in lines:
+        encoded = text.encode("utf-8")
+        timestamps.append(timestamp)
+        texts.append(encoded)
+        position += len(encoded)
+        offsets.append(position)
+
+    if sys.byteorder == "big":
+        timestamps.byteswap()
+        offsets.byteswap()
+
+    return b"".join([
+        HEADER.pack(MAGIC, len(timestamps)),
+        timestamps.tobytes(),
+        offsets.tobytes(),
+        *texts,
+    ])
+
+
+def _read(blob):
+    """
+    (timestamps, offsets, text table) views of a packed blob.
+    """
+    blob = bytes(blob)
+    magic, count = HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("Not a packed lyrics blob")
+
+    start = HEADER.size
+    timestamps = array("d")
+    timestamps.frombytes(blob[start:start + count * 8])
+    start += count * 8
+
+    offsets = array("I")
+    offsets.frombytes(blob[start:start + (count + 1) * 4])
+    table = blob[start + (count + 1) * 4:]
+
+    if sys.byteorder == "big":
+        timestamps.byteswap()
+        offsets.byteswap()
+
+    return timestamps, offsets, table
+
+
+def _lines(timestamps, offsets, table, lo, hi):
+    if lo >= hi:
+        return []
+    base = offsets[lo]
+    chunk = table[base:offsets[hi]]
+    if chunk.isascii():
+        # Byte offsets are character offsets: decode once, slice the str
+        text = chunk.decode("ascii")
+        return [
+            {"timestamp": timestamp, "text": text[start - base:end - base]}
+            for timestamp, start, end in zip(timestamps[lo:hi], offsets[lo:hi], offsets[lo + 1:hi + 1])
+        ]
+    return [
+        {"timestamp": timestamps[i], "text": table[offsets[i]:offsets[i + 1]].decode("utf-8")}
+        for i in range(lo, hi)
+    ]
+
+
+def unpack_lyrics(blob):
+    """
+    Returns list of {timestamp, text} in the same shape as SongLyricLineSerializer.
+    """
+    timestamps, offsets, table = _read(blob)
+    return _lines(timestamps, offsets, table, 0, len(timestamps))
+
+
+def unpack_window(blob, start=None, end=None):
+    """
+    Lines with start <= timestamp < end, found by bisecting the sorted
+    timestamp array; only those lines' text is decoded.
+    Returns (index of the first line, lines, timestamp of the line after the window or None).
+    """
+    timestamps, offsets, table = _read(blob)
+    lo = bisect_left(timestamps, start) if start is not None else 0
+    hi = bisect_left(timestamps, end) if end is not None else len(timestamps)
+    hi = max(lo, hi)
+    following = timestamps[hi] if hi < len(timestamps) else None
+    return lo, _lines(timestamps, offsets, table, lo, hi), following
+
+
+def unpack_line_at(blob, time):
+    """
+    The line showing at `time` (last line with timestamp <= time).
+    Returns (index or None, line or None, timestamp of the next line or None).
+    """
+    timestamps, offsets, table = _read(blob)
+    index = bisect_right(timestamps, time) - 1
+    following = timestamps[index + 1] if index + 1 < len(timestamps) else None
+    if index < 0:
+        return None, None, following
+    return index, _lines(timestamps, offsets, table, index, index + 1)[0], following
+
+
+def store_lyrics(song, lines):
+    """
+    Replace a song's lyrics: one row per line plus the packed blob.
+    `lines` are (timestamp, text, ...) tuples, e.g. from LrcParser.
+    An unsaved song is inserted together with its blob.
+    """
+    pairs = [(line[0], line[1]) for line in lines]
+
+    with transaction.atomic():
+        song.lyrics_packed = pack_lyrics(pairs)
+        if song.pk is None:
+            song.save()
+        else:
+            SongLyricLine.objects.filter(song=song).delete()
+            song.save(update_fields=["lyrics_packed", "updated_at"])
+
+        SongLyricLine.objects.bulk_create(
+            (SongLyricLine(song=song, timestamp=timestamp, text=text) for timestamp, text in pairs),
+            batch_size=BULK_BATCH_SIZE,
+        )
+
+
+def repack_lyrics(song_id):
+    """
+    Rebuild the packed blob from the song's lyric rows (after a row was edited).
+    """
+    pairs = SongLyricLine.objects.filter(song_id=song_id).values_list("timestamp", "text")
+    Song.objects.filter(pk=song_id).update(lyrics_packed=pack_lyrics(pairs), updated_at=timezone.now())
+
+
+def lyrics_window(song, start=None, end=None):
+    """
+    Lines of `song` with start <= timestamp < end (either bound optional).
+    Bisects the packed blob; songs without one use the (song, timestamp) index.
+    """
+    if song.lyrics_packed is not None:
+        index, lines, following = unpack_window(song.lyrics_packed, start, end)
+    else:
+        rows = SongLyricLine.objects.filter(song=song)
+        window = rows
+        if start is not None:
+            window = window.filter(timestamp__gte=start)
+        if end is not None:
+            window = window.filter(timestamp__lt=end)
+        lines = list(window.values("timestamp", "text"))
+        index = rows.filter(timestamp__lt=start).count() if start is not None else 0
+        following = (
+            rows.filter(timestamp__gte=end).values_list("timestamp", flat=True).first()
+            if end is not None else None
+        )
+    return {"from": start, "to": end, "index": index, "lyrics": lines, "next": following}
+
+
+def line_at(song, time):
+    """
+    The line showing at `time`: the last line with timestamp <= time.
+    """
+    if song.lyrics_packed is not None:
+        index, line, following = unpack_line_at(song.lyrics_packed, time)
+    else:
+        rows = SongLyricLine.objects.filter(song=song)
+        line = rows.filter(timestamp__lte=time).order_by("-timestamp", "-id").values("timestamp", "text").first()
+        index = rows.filter(timestamp__lte=time).count() - 1 if line else None
+        following = rows.filter(timestamp__gt=time).values_list("timestamp", flat=True).first()
+    return {"at": time, "index": index, "line": line, "next": following}
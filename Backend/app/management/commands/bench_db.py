@@ -0,0 +1,167 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from statistics import quantiles
+
+from django.core.management.base import BaseCommand
+
+from app.db import pragma_statements
+
+# "before" is what the dev profile gets (Python's 5 s busy timeout and
+# SQLite defaults), "after" the production profile's SQLITE_PRAGMAS.
+PROFILES = {
+    "dev": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 268435456,
+        "busy_timeout": 5000,
+        "cache_size": -20000,
+    },
+}
+
+SCHEMA = """
+CREATE TABLE song (id INTEGER PRIMARY KEY, title TEXT, genre TEXT, updated_at REAL);
+CREATE TABLE line (id INTEGER PRIMARY KEY, song_id INTEGER, timestamp REAL, text TEXT);
+CREATE INDEX line_song_ts ON line (song_id, timestamp);
+"""
+
+
+def connect(path, pragmas):
+    # autocommit like Django; transactions are opened with a plain BEGIN
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    for statement in pragma_statements(pragmas):
+        conn.execute(statement)
+    return conn
+
+
+def seed(path, pragmas, songs, lines):
+    conn = connect(path, pragmas)
+    conn.executescript(SCHEMA)
+    conn.execute("BEGIN")
+    for song_id in range(1, songs + 1):
+        conn.execute("INSERT INTO song VALUES (?, ?, 'pop', ?)", (song_id, f"Song {song_id}", time.time()))
+        conn.executemany("INSERT INTO line (song_id, timestamp, text) VALUES (?, ?, ?)",
+                         [(song_id, float(i), f"line {i}") for i in range(lines)])
+    conn.execute("COMMIT")
+    conn.close()
+
+
+class Worker(threading.Thread):
+    def __init__(self, path, pragmas, stop, action):
+        super().__init__(daemon=True)
+        self.conn = connect(path, pragmas)
+        self.stop = stop
+        self.action = action
+        self.latencies = []
+        self.errors = 0
+
+    def run(self):
+        rng = random.Random(self.ident)
+        while not self.stop.is_set():
+            started = time.perf_counter()
+            try:
+                self.action(self.conn, rng)
+            except sqlite3.OperationalError:
+                # "database is locked" once the busy timeout runs out
+                self.errors += 1
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                continue
+            self.latencies.append(time.perf_counter() - started)
+        self.conn.close()
+
+
+def read_page(songs):
+    def action(conn, rng):
+        # A catalog page plus one song's lyrics, as the list/detail views do
+        start = rng.randint(0, songs)
+        conn.execute("SELECT id, title, genre, updated_at FROM song WHERE id > ? ORDER BY id LIMIT 50",
+                     (start,)).fetchall()
+        conn.execute("SELECT timestamp, text FROM line WHERE song_id = ? ORDER BY timestamp",
+                     (start + 1,)).fetchall()
+    return action
+
+
+def write_upload(lines):
+    def action(conn, rng):
+        # An upload: the song row and its lyric lines in one transaction
+        conn.execute("BEGIN")
+        song_id = conn.execute("INSERT INTO song (title, genre, updated_at) VALUES ('new', 'rock', ?)",
+                               (time.time(),)).lastrowid
+        conn.executemany("INSERT INTO line (song_id, timestamp, text) VALUES (?, ?, ?)",
+                         [(song_id, float(i), f"line {i}") for i in range(lines)])
+        conn.execute("COMMIT")
+    return action
+
+
+def stats(workers, seconds):
+    latencies = sorted(ms * 1000 for worker in workers for ms in worker.latencies)
+    cuts = quantiles(latencies, n=100) if len(latencies) > 1 else (latencies or [0.0]) * 99
+    return {
+        "ops": len(latencies),
+        "ops_per_second": round(len(latencies) / seconds, 1),
+        "p50_ms": round(cuts[49], 2),
+        "p99_ms": round(cuts[98], 2),
+        "errors": sum(worker.errors for worker in workers),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Measure SQLite read and write concurrency with the dev and production "
+            "database profiles (SQLITE_PRAGMAS) on a scratch database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile", action="append", choices=sorted(PROFILES), dest="profiles",
+                            help="Profile to run; repeat for several. Default: all.")
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=5.0, help="Run time per profile.")
+        parser.add_argument("--songs", type=int, default=2000, help="Songs seeded before the run.")
+        parser.add_argument("--lines", type=int, default=40, help="Lyric lines per song.")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        results = []
+        for name in options["profiles"] or list(PROFILES):
+            with tempfile.TemporaryDirectory() as tmp:
+                results.append(self.run(name, os.path.join(tmp, "bench.sqlite3"), options))
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for row in results:
+            self.stdout.write(f"{row['profile']} ({row['readers']} readers, {row['writers']} writers)")
+            for kind in ("reads", "writes"):
+                s = row[kind]
+                self.stdout.write(
+                    f"  {kind:<7} {s['ops_per_second']:>9} ops/s  p50 {s['p50_ms']:>7} ms  "
+                    f"p99 {s['p99_ms']:>8} ms  locked {s['errors']}"
+                )
+
+    def run(self, name, path, options):
+        pragmas = PROFILES[name]
+        seed(path, pragmas, options["songs"], options["lines"])
+
+        stop = threading.Event()
+        readers = [Worker(path, pragmas, stop, read_page(options["songs"])) for _ in range(options["readers"])]
+        writers = [Worker(path, pragmas, stop, write_upload(options["lines"])) for _ in range(options["writers"])]
+        for worker in readers + writers:
+            worker.start()
+        time.sleep(options["seconds"])
+        stop.set()
+        for worker in readers + writers:
+            worker.join()
+
+        return {
+            "profile": name,
+            "readers": options["readers"],
+            "writers": options["writers"],
+            "reads": stats(readers, options["seconds"]),
+            "writes": stats(writers, options["seconds"]),
+        }
@@ -0,0 +1,70 @@
+import io
+import json
+import re
+
+from django.core.management.base import BaseCommand
+
+from app.bench import measure, synthetic_lrc
+from app.utils import LrcParser
+
+
+def legacy_parse_lrc(lrc_text):
+    """
+    The regex-per-line parser app.utils.parse_lrc used before LrcParser,
+    kept here as the benchmark baseline.
+    """
+    pattern = re.compile(r"\[(\d+):(\d+(?:\.\d+)?)\](.*)")
+    lines = []
+    for raw_line in lrc_text.splitlines():
+        match = pattern.match(raw_line)
+        if not match:
+            continue
+        text = match.group(3).strip()
+        if text:
+            lines.append({"timestamp": int(match.group(1)) * 60 + float(match.group(2)), "text": text})
+    return lines
+
+
+class Command(BaseCommand):
+    help = "Benchmark LrcParser against the legacy parse_lrc on synthetic multi-MB LRC files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1,4,16",
+                            help="Comma-separated input sizes in MB (default: 1,4,16).")
+        parser.add_argument("--repeat", type=int, default=3,
+                            help="Runs per size; the fastest is reported.")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        results = []
+
+        for mb in [float(size) for size in options["sizes"].split(",")]:
+            data = synthetic_lrc(int(mb * 1024 * 1024))
+            row = {"size_mb": mb, "bytes": len(data)}
+
+            for name, fn in (
+                ("legacy", lambda: legacy_parse_lrc(data.decode("utf-8-sig"))),
+                ("streaming", lambda: list(LrcParser(io.BytesIO(data)))),
+            ):
+                result, best, peak = measure(fn, options["repeat"])
+                row[name] = {
+                    "lines": len(result),
+                    "seconds": round(best, 4),
+                    "lines_per_second": round(len(result) / best) if best else None,
+                    "peak_memory_mb": round(peak / 1024 / 1024, 2),
+                }
+
+            results.append(row)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for row in results:
+            self.stdout.write(f"{row['size_mb']:g} MB ({row['legacy']['lines']} lines)")
+            for name in ("legacy", "streaming"):
+                stats = row[name]
+                self.stdout.write(
+                    f"  {name:<10} {stats['seconds']:>8.3f}s  "
+                    f"{stats['lines_per_second']:>10} lines/s  peak {stats['peak_memory_mb']} MB"
+                )
@@ -0,0 +1,114 @@
+import io
+import json
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+
+from app.bench import run_metadata, synthetic_lyrics
+from app.lyrics import pack_lyrics, unpack_lyrics
+from app.models import Artist, Song, SongLyricLine
+from app.serializers import FastSongSerializer, SongListSerializer, SongSerializer
+from app.utils import LrcParser, parse_lrc
+
+
+def fake_song(pk, lines, packed=True):
+    """
+    Unsaved song whose lyrics are a packed blob or, with packed=False,
+    prefetched SongLyricLine rows, so serializing it needs no database.
+    """
+    lrc, _ = synthetic_lyrics(lines, seed=pk)
+    parsed = [(line.timestamp, line.text) for line in LrcParser(io.BytesIO(lrc))]
+    song = Song(
+        pk=pk, title=f"Song {pk}", artist=Artist(pk=pk, name=f"Artist {pk}"),
+        language="en", genre="pop", duration=180,
+        cover_image=f"song_covers/{pk:02d}/cover.png", audio_file=f"songs/audio/{pk}.mp3",
+        lyrics_packed=pack_lyrics(parsed) if packed else None,
+        updated_at=timezone.now(),
+    )
+    if not packed:
+        # What prefetch_related("lyrics") leaves behind
+        rows = SongLyricLine.objects.none()
+        rows._result_cache = [SongLyricLine(song=song, timestamp=t, text=text) for t, text in parsed]
+        rows._prefetch_done = True
+        song._prefetched_objects_cache = {"lyrics": rows}
+    return song
+
+
+def cases(lines):
+    """Benchmarks whose cost depends on the number of lyric lines."""
+    lrc, _ = synthetic_lyrics(lines)
+    text = lrc.decode("utf-8")
+    parsed = [(line.timestamp, line.text) for line in LrcParser(io.BytesIO(lrc))]
+    blob = pack_lyrics(parsed)
+    request = RequestFactory().get("/api/songs/", HTTP_HOST="localhost")
+    detail = fake_song(1, lines)
+    rows = fake_song(1, lines, packed=False)
+
+    return {
+        "parse_lrc": lambda: parse_lrc(text),
+        "lrc_parser": lambda: list(LrcParser(io.BytesIO(lrc))),
+        "pack_lyrics": lambda: pack_lyrics(parsed),
+        "unpack_lyrics": lambda: unpack_lyrics(blob),
+        "song_serializer": lambda: SongSerializer(detail, context={"request": request}).data,
+        "song_fast": lambda: FastSongSerializer(detail, context={"request": request}).data,
+        "song_serializer_rows": lambda: SongSerializer(rows, context={"request": request}).data,
+        "song_fast_rows": lambda: FastSongSerializer(rows, context={"request": request}).data,
+    }
+
+
+def page_case():
+    """One 50-song catalog page, as SongListView serializes it."""
+    request = RequestFactory().get("/api/songs/", HTTP_HOST="localhost")
+    page = [fake_song(pk, 0) for pk in range(1, 51)]
+    return lambda: SongListSerializer(page, many=True, context={"request": request}).data
+
+
+def time_op(fn, repeat):
+    """Best seconds per call, timeit-style (GC off, auto-ranged loop count)."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def result(name, lines, seconds):
+    return {
+        "benchmark": name,
+        "lines": lines,
+        "us_per_op": round(seconds * 1e6, 2),
+        "ops_per_second": round(1 / seconds, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Micro-benchmarks for LRC parsing, lyric packing and the song serializers. "
+            "Runs without a database; --json output is meant to be diffed between commits.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", default="100,1000,10000",
+                            help="Comma-separated lyric line counts (default: 100,1000,10000).")
+        parser.add_argument("--repeat", type=int, default=5, help="Timing rounds; the fastest is reported.")
+        parser.add_argument("--only", action="append", help="Run only this benchmark; repeat for several.")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        wanted = options["only"]
+        results = []
+        with override_settings(ALLOWED_HOSTS=["localhost"]):
+            for lines in [int(n) for n in options["lines"].split(",")]:
+                for name, fn in cases(lines).items():
+                    if not wanted or name in wanted:
+                        results.append(result(name, lines, time_op(fn, options["repeat"])))
+            if not wanted or "song_list_serializer_page" in wanted:
+                results.append(result("song_list_serializer_page", 0, time_op(page_case(), options["repeat"])))
+
+        if options["json"]:
+            self.stdout.write(json.dumps({**run_metadata(), "results": results}, indent=2))
+            return
+
+        for row in results:
+            self.stdout.write(
+                f"{row['benchmark']:<26} {row['lines']:>6} lines  "
+                f"{row['us_per_op']:>12.2f} us/op  {row['ops_per_second']:>12} ops/s"
+            )
@@ -0,0 +1,103 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from app.cache import catalog_cache
+from app.importer import import_key, prepare_entry, read_manifest, scan_directory, write_batch
+from app.models import Song
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-import songs from a directory of audio/LRC/cover files or a CSV/JSONL "
+        "manifest. Re-running skips songs that were already imported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Directory to scan, or a .csv/.jsonl manifest.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Processes used to parse LRC files.")
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="Songs written per transaction.")
+        parser.add_argument("--language", default="unknown", help="Default language.")
+        parser.add_argument("--genre", default="unknown", help="Default genre.")
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        if os.path.isdir(source):
+            root, entries = source, scan_directory(source)
+        elif os.path.isfile(source):
+            root, entries = os.path.dirname(os.path.abspath(source)), read_manifest(source)
+        else:
+            raise CommandError(f"{source} is neither a directory nor a manifest file")
+
+        self.defaults = {"language": options["language"], "genre": options["genre"]}
+        self.root = root
+        self.imported = self.skipped = self.failed = 0
+        self.started = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            in_flight = None
+            for batch in self.new_batches(entries, options["batch_size"]):
+                # Parse the next batch while the previous one is written
+                chunksize = max(1, len(batch) // (options["workers"] * 4))
+                submitted = pool.map(prepare_entry, [(entry, root) for entry in batch], chunksize=chunksize)
+                if in_flight is not None:
+                    self.write(in_flight)
+                in_flight = submitted
+            if in_flight is not None:
+                self.write(in_flight)
+
+        if self.imported:
+            catalog_cache.invalidate_catalog()
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {self.progress()}"))
+
+    def new_batches(self, entries, size):
+        """
+        Batches of entries that haven't been imported yet.
+        """
+        seen = set()
+        entries = iter(entries)
+        while True:
+            chunk = list(islice(entries, size))
+            if not chunk:
+                return
+            keys = {import_key(entry) for entry in chunk}
+            # On the primary: a replica may not have the previous batches yet
+            existing = set(Song.objects.using(DEFAULT_DB_ALIAS).filter(import_key__in=keys)
+                           .values_list("import_key", flat=True))
+            batch = []
+            for entry in chunk:
+                key = import_key(entry)
+                if key in existing or key in seen:
+                    self.skipped += 1
+                    continue
+                seen.add(key)
+                batch.append(entry)
+            if batch:
+                yield batch
+
+    def write(self, results):
+        prepared = []
+        for entry, lines, error in results:
+            if error:
+                self.failed += 1
+                self.stderr.write(f"  skipped {entry['audio'] or entry}: {error}")
+            else:
+                prepared.append((entry, lines))
+
+        self.imported += write_batch(prepared, self.root, self.defaults)
+        self.stdout.write(self.progress())
+
+    def progress(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.imported / elapsed if elapsed else 0
+        return (
+            f"{self.imported} imported, {self.skipped} already present, "
+            f"{self.failed} failed - {rate:.0f} songs/s"
+        )
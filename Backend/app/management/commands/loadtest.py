@@ -0,0 +1,375 @@
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from statistics import quantiles
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.client import MULTIPART_CONTENT, encode_multipart, BOUNDARY
+
+from app.bench import run_metadata, synthetic_cover, synthetic_lyrics, synthetic_wav
+from app.cache import LRUBackend, catalog_cache
+from app.catalog import songs_changed
+from app.models import Artist, Song
+from base.models import User
+
+HOST = "localhost"
+USER, ADMIN, PASSWORD = "loadtest-user", "loadtest-admin", "loadtest-password"
+UPLOAD_TITLE = "Loadtest upload"
+
+
+class Step:
+    """One HTTP request of a scenario; `name` groups its timings."""
+
+    def __init__(self, name, method, path, body=b"", content_type=None, headers=None):
+        self.name, self.method, self.path = name, method, path
+        self.body, self.content_type, self.headers = body, content_type, headers or {}
+
+
+class Reply:
+    def __init__(self, status, headers, body):
+        self.status, self.headers, self.body = status, headers, body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+def get(name, path, **headers):
+    return Step(name, "GET", path, headers=headers)
+
+
+def post(name, path, data=None):
+    return Step(name, "POST", path, json.dumps(data or {}).encode(), "application/json")
+
+
+# Scenarios are generators: they yield Steps and are sent back Replies.
+# `ctx` holds what setup() prepared; `rng` is per virtual user.
+
+def scenario_paths(ctx, rng):
+    """GET the --path URLs (default: the list and 10 songs) round robin."""
+    yield get("get", ctx["paths"][rng.randrange(len(ctx["paths"]))])
+
+
+def scenario_browse(ctx, rng):
+    """Open the catalog, open a song, start playback and fetch the first lyrics."""
+    page = yield get("list", "/api/songs/?page_size=20")
+    results = page.json()["results"] if page.status == 200 else []
+    if not results:
+        return
+    song = (yield get("detail", f"/api/songs/{rng.choice(results)['id']}/")).json()
+    yield get("audio", urlsplit(song["audio_stream"]).path, Range="bytes=0-65535")
+    yield get("lyrics", f"/api/songs/{song['id']}/lyrics/?from=0&to=30")
+
+
+def scenario_auth(ctx, rng):
+    """Login/refresh churn: log in, check the session, refresh, log out."""
+    yield post("login", "/auth/login/", {"username": USER, "password": PASSWORD})
+    yield get("authenticated", "/auth/authenticated/")
+    yield post("refresh", "/auth/token/refresh/")
+    yield post("logout", "/auth/logout/")
+
+
+def scenario_upload(ctx, rng):
+    """An admin logs in and uploads a few songs with cover, audio and lyrics."""
+    yield post("login", "/auth/login/", {"username": ADMIN, "password": PASSWORD})
+    for _ in range(3):
+        lrc, last = synthetic_lyrics(ctx["lines"], seed=rng.randrange(1 << 30))
+        body = encode_multipart(BOUNDARY, {
+            "title": UPLOAD_TITLE, "artist": ctx["artist_id"], "language": "en", "genre": "pop",
+            "duration": int(last) + 3,
+            "cover_image": SimpleUploadedFile("cover.png", ctx["cover"], "image/png"),
+            "audio_file": SimpleUploadedFile("song.wav", ctx["audio"], "audio/wav"),
+            "lrc_file": SimpleUploadedFile("song.lrc", lrc, "text/plain"),
+        })
+        yield Step("upload", "POST", "/api/songs/upload/", body, MULTIPART_CONTENT)
+
+
+SCENARIOS = {
+    "paths": scenario_paths,
+    "browse": scenario_browse,
+    "auth": scenario_auth,
+    "upload": scenario_upload,
+}
+
+
+class VirtualUser:
+    """Runs scenario iterations with its own cookie jar."""
+
+    def __init__(self, scenario, ctx, seed):
+        self.scenario, self.ctx = scenario, ctx
+        self.rng = random.Random(seed)
+        self.cookies = {}
+
+    def headers(self, step):
+        headers = dict(step.headers)
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        return headers
+
+    def remember(self, reply):
+        for name, value in reply.headers:
+            if name.lower() != "set-cookie":
+                continue
+            for morsel in SimpleCookie(value).values():
+                if morsel["max-age"] == "0" or morsel.value == "":
+                    self.cookies.pop(morsel.key, None)
+                else:
+                    self.cookies[morsel.key] = morsel.value
+
+
+def wsgi_call(handler, factory, step, headers):
+    extra = {"HTTP_" + k.upper().replace("-", "_"): v for k, v in headers.items()}
+    request = factory.generic(step.method, step.path, step.body,
+                              content_type=step.content_type or "", HTTP_HOST=HOST, **extra)
+    status = []
+    response = handler(request.environ, lambda s, h, exc_info=None: status.append((int(s[:3]), h)))
+    body = b"".join(response)
+    response.close()
+    return Reply(status[0][0], status[0][1], body)
+
+
+async def asgi_call(handler, step, headers):
+    path, _, query = step.path.partition("?")
+    raw_headers = [(b"host", HOST.encode()), (b"content-length", str(len(step.body)).encode())]
+    if step.content_type:
+        raw_headers.append((b"content-type", step.content_type.encode()))
+    raw_headers += [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": step.method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query.encode(), "root_path": "", "headers": raw_headers,
+        "client": ("127.0.0.1", 0), "server": (HOST, 80),
+    }
+    body_sent = False
+    start, chunks = {}, []
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": step.body, "more_body": False}
+        # The client never disconnects; Django cancels this wait when done.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            start.update(message)
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await handler(scope, receive, send)
+    headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in start.get("headers", [])]
+    return Reply(start["status"], headers, b"".join(chunks))
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.steps = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.iterations = 0
+
+    def record(self, step, seconds, status):
+        with self.lock:
+            self.steps[step.name].append(seconds * 1000)
+            if status >= 400:
+                self.errors[step.name] += 1
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    cuts = quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {"p50_ms": round(cuts[49], 2), "p95_ms": round(cuts[94], 2), "p99_ms": round(cuts[98], 2)}
+
+
+def run_wsgi(scenario, ctx, iterations, concurrency, recorder):
+    """Virtual users on `concurrency` threads, each request through Django's WSGI handler."""
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    remaining = iter(range(iterations))
+    lock = threading.Lock()
+
+    def user(seed):
+        vu = VirtualUser(scenario, ctx, seed)
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            steps = scenario(ctx, vu.rng)
+            reply = None
+            try:
+                while True:
+                    step = steps.send(reply)
+                    started = time.perf_counter()
+                    reply = wsgi_call(handler, factory, step, vu.headers(step))
+                    recorder.record(step, time.perf_counter() - started, reply.status)
+                    vu.remember(reply)
+            except StopIteration:
+                pass
+            with lock:
+                recorder.iterations += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(user, range(concurrency)))
+
+
+async def run_asgi(scenario, ctx, iterations, concurrency, recorder):
+    """Virtual users as `concurrency` tasks, each request through Django's ASGI handler."""
+    handler = ASGIHandler()
+    remaining = iter(range(iterations))
+
+    async def user(seed):
+        vu = VirtualUser(scenario, ctx, seed)
+        while next(remaining, None) is not None:
+            steps = scenario(ctx, vu.rng)
+            reply = None
+            try:
+                while True:
+                    step = steps.send(reply)
+                    started = time.perf_counter()
+                    reply = await asgi_call(handler, step, vu.headers(step))
+                    recorder.record(step, time.perf_counter() - started, reply.status)
+                    vu.remember(reply)
+            except StopIteration:
+                pass
+            recorder.iterations += 1
+
+    await asyncio.gather(*(user(seed) for seed in range(concurrency)))
+
+
+def setup(scenario, options):
+    """Users, an artist and upload payloads the scenarios need."""
+    ctx = {"lines": 40}
+    if scenario == "paths":
+        ids = Song.objects.order_by("id").values_list("id", flat=True)[:10]
+        ctx["paths"] = options["paths"] or ["/api/songs/"] + [f"/api/songs/{pk}/" for pk in ids]
+    if scenario == "auth":
+        ensure_user(USER, staff=False)
+    if scenario == "upload":
+        ensure_user(ADMIN, staff=True)
+        ctx["artist_id"] = Artist.objects.get_or_create(name="Loadtest Artist")[0].pk
+        ctx["cover"] = synthetic_cover(0)
+        ctx["audio"] = synthetic_wav(2.0)
+    return ctx
+
+
+def ensure_user(username, staff):
+    user, created = User.objects.get_or_create(username=username, defaults={"is_staff": staff})
+    if created:
+        user.set_password(PASSWORD)
+        user.save()
+
+
+def cleanup(scenario):
+    if scenario == "upload":
+        ids = list(Song.objects.filter(title=UPLOAD_TITLE).values_list("id", flat=True))
+        Song.objects.filter(pk__in=ids).delete()
+        songs_changed(*ids)
+
+
+class Command(BaseCommand):
+    help = (
+        "Scripted load scenarios driven through Django's WSGI and ASGI handlers in-process, "
+        "at a fixed concurrency: paths (plain GETs), browse (list, open song, play, lyrics), "
+        "auth (login/refresh churn) and upload (bulk admin uploads). WSGI runs the DRF views, "
+        "ASGI the async views (ASYNC_VIEWS=true); each mode runs in its own process against "
+        "the configured database. The auth and upload scenarios create loadtest-* users, and "
+        "uploaded songs are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="paths")
+        parser.add_argument("--mode", choices=["both", "wsgi", "asgi"], default="both")
+        parser.add_argument("--path", action="append", dest="paths",
+                            help="Path for the paths scenario; repeat for several.")
+        parser.add_argument("--iterations", "--requests", type=int, default=2000,
+                            help="Scenario runs per mode (for paths: requests).")
+        parser.add_argument("--concurrency", type=int, default=32, help="Virtual users.")
+        parser.add_argument("--cold", action="store_true",
+                            help="Disable the catalog cache so every request reads the database.")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        if options["mode"] == "both":
+            runs = [self.spawn(mode, options) for mode in ("wsgi", "asgi")]
+        else:
+            runs = [self.run(options["mode"], options)]
+
+        if options["json"]:
+            output = {**run_metadata(), "runs": runs} if options["mode"] == "both" else runs[0]
+            self.stdout.write(json.dumps(output, indent=2))
+            return
+
+        for run in runs:
+            self.stdout.write(
+                f"{run['mode']:<5} {run['scenario']}: {run['iterations_per_second']} iterations/s, "
+                f"{run['requests_per_second']} req/s, errors {run['errors']}"
+            )
+            for name, step in run["steps"].items():
+                self.stdout.write(
+                    f"  {name:<14} {step['count']:>7}  p50 {step['p50_ms']:>8} ms  "
+                    f"p95 {step['p95_ms']:>8} ms  p99 {step['p99_ms']:>8} ms  errors {step['errors']}"
+                )
+
+    def run(self, mode, options):
+        if options["cold"]:
+            catalog_cache.backend = LRUBackend(max_entries=0)
+        scenario = SCENARIOS[options["scenario"]]
+        ctx = setup(options["scenario"], options)
+        recorder = Recorder()
+
+        started = time.perf_counter()
+        try:
+            if mode == "wsgi":
+                run_wsgi(scenario, ctx, options["iterations"], options["concurrency"], recorder)
+            else:
+                asyncio.run(run_asgi(scenario, ctx, options["iterations"], options["concurrency"], recorder))
+        finally:
+            cleanup(options["scenario"])
+        elapsed = time.perf_counter() - started
+
+        requests = sum(len(latencies) for latencies in recorder.steps.values())
+        return {
+            "mode": mode,
+            "scenario": options["scenario"],
+            "async_views": settings.ASYNC_VIEWS,
+            "concurrency": options["concurrency"],
+            "iterations": recorder.iterations,
+            "requests": requests,
+            "errors": sum(recorder.errors.values()),
+            "seconds": round(elapsed, 3),
+            "iterations_per_second": round(recorder.iterations / elapsed, 1),
+            "requests_per_second": round(requests / elapsed, 1),
+            "steps": {
+                name: {"count": len(latencies), "errors": recorder.errors[name], **percentiles(latencies)}
+                for name, latencies in recorder.steps.items()
+            },
+        }
+
+    def spawn(self, mode, options):
+        # The URLconf picks sync or async views at import, so each mode
+        # needs a fresh process.
+        command = [
+            sys.executable, str(settings.BASE_DIR / "manage.py"), "loadtest", "--json",
+            "--mode", mode, "--scenario", options["scenario"],
+            "--iterations", str(options["iterations"]), "--concurrency", str(options["concurrency"]),
+        ]
+        command += ["--cold"] if options["cold"] else []
+        for path in options["paths"] or []:
+            command += ["--path", path]
+        env = dict(os.environ, ASYNC_VIEWS="true" if mode == "asgi" else "false")
+        output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+        return json.loads(output)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from app.lyrics import repack_lyrics
+from app.models import Song
+
+
+class Command(BaseCommand):
+    help = "Build the packed lyrics blob for songs from their SongLyricLine rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true",
+                            help="Repack every song, not only songs without a blob.")
+
+    def handle(self, *args, **options):
+        songs = Song.objects.all()
+        if not options["all"]:
+            songs = songs.filter(lyrics_packed__isnull=True)
+
+        count = 0
+        for song_id in songs.values_list("id", flat=True).iterator():
+            repack_lyrics(song_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Packed lyrics for {count} song(s)."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from app.uploads import discard, expired_sessions
+
+
+class Command(BaseCommand):
+    help = ("Delete resumable upload sessions older than UPLOAD_SESSION_TTL, with their "
+            "part files. Meant to be run periodically, e.g. hourly from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only report how many sessions would be removed.")
+
+    def handle(self, *args, **options):
+        sessions = expired_sessions()
+
+        if options["dry_run"]:
+            self.stdout.write(f"{sessions.count()} expired upload session(s).")
+            return
+
+        count = 0
+        for session in sessions.iterator():
+            discard(session)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Pruned {count} expired upload session(s)."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for every song."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} song(s)."))
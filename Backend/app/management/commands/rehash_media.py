@@ -0,0 +1,36 @@
+import re
+
+from django.core.management.base import BaseCommand
+
+from app.models import Song
+from app.storage import SONG_FILE_FIELDS, media_storage, release_unreferenced
+
+CONTENT_ADDRESSED = re.compile(r"/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$")
+
+
+class Command(BaseCommand):
+    help = (
+        "Move song files stored under legacy names into the content-addressed "
+        "layout, collapsing duplicates and deleting the old copies."
+    )
+
+    def handle(self, *args, **options):
+        moved = 0
+        for song in Song.objects.only(*SONG_FILE_FIELDS).iterator():
+            updates = {}
+            for field in SONG_FILE_FIELDS:
+                name = getattr(song, field).name
+                if not name or CONTENT_ADDRESSED.search(name) or not media_storage.exists(name):
+                    continue
+                with media_storage.open(name) as fh:
+                    updates[field] = media_storage.save(name, fh)
+
+            if updates:
+                old_names = [getattr(song, field).name for field in updates]
+                # update() skips the save signals; leases and old names are handled here
+                Song.objects.filter(pk=song.pk).update(**updates)
+                media_storage.drop_leases(updates.values())
+                release_unreferenced(old_names)
+                moved += len(updates)
+
+        self.stdout.write(self.style.SUCCESS(f"Rehashed {moved} file(s)."))
@@ -0,0 +1,51 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.jobs import requeue_stale, run_pending, work
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued background jobs (upload lyrics parsing, cover derivatives, "
+        "search indexing) with a pool of worker threads until interrupted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.JOBS_WORKERS,
+                            help="Worker threads.")
+        parser.add_argument("--poll-interval", type=float, default=settings.JOBS_POLL_SECONDS,
+                            help="Seconds an idle worker waits before looking for jobs again.")
+        parser.add_argument("--once", action="store_true",
+                            help="Run the jobs that are due now, then exit.")
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} job(s) left running by a stopped worker.")
+
+        if options["once"]:
+            count = run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Ran {count} job(s)."))
+            return
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+
+        threads = [
+            threading.Thread(target=work, args=(stop, options["poll_interval"]), name=f"worker-{i}")
+            for i in range(options["workers"])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"{len(threads)} worker(s) running; Ctrl-C to stop.")
+
+        # Also reclaims jobs of crashed workers while running
+        while not stop.wait(settings.JOBS_LOCK_TIMEOUT):
+            requeue_stale()
+        for thread in threads:
+            thread.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
@@ -0,0 +1,31 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = ("Copy the SQLite primary into every DATABASE_REPLICAS file. Stands in for "
+            "replication when testing the replica router locally.")
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas configured (set DB_REPLICAS).")
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != "sqlite":
+            raise CommandError("Only SQLite replicas can be synced; use the server's replication.")
+
+        source = sqlite3.connect(primary.settings_dict["NAME"])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                connections[alias].close()
+                target = sqlite3.connect(connections[alias].settings_dict["NAME"])
+                try:
+                    # Online backup: consistent even while the primary is in use
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f"Synced {alias}.")
+        finally:
+            source.close()
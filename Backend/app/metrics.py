@@ -0,0 +1,177 @@
+"""
+Per-request performance metrics (MetricsMiddleware, /metrics).
+
+Only active with METRICS_ENABLED. Each request gets a RequestMetrics in a
+context variable; a database execute wrapper adds query counts, time and
+SQL to it, and `span()` blocks add named timings (e.g. "serialize").
+Totals are kept per view in an in-process registry and rendered in the
+Prometheus text format. Every worker process has its own registry.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+MAX_CAPTURED_SQL = 50
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    __slots__ = ("started", "queries", "db_seconds", "spans", "sql")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.spans = {}
+        self.sql = []
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Time a block of the current request under `name`; free when metrics are off."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.spans[name] = metrics.spans.get(name, 0.0) + time.perf_counter() - started
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.queries += 1
+        metrics.db_seconds += elapsed
+        if len(metrics.sql) < MAX_CAPTURED_SQL:
+            metrics.sql.append((sql, elapsed))
+
+
+def _install(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_query_recorder():
+    """Attach record_query to every database connection, current and future."""
+    connection_created.connect(_install, dispatch_uid="app.metrics.install")
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+class Registry:
+
+    HISTOGRAMS = {
+        "cadence_http_request_duration_seconds": ("Request latency by view.", LATENCY_BUCKETS),
+        "cadence_db_queries": ("SQL queries per request by view.", QUERY_BUCKETS),
+        "cadence_db_duration_seconds": ("SQL time per request by view.", LATENCY_BUCKETS),
+        "cadence_span_duration_seconds": ("Time in named spans (e.g. serialize) by view.", LATENCY_BUCKETS),
+        "cadence_http_response_size_bytes": ("Response body size by view.", SIZE_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.requests = {}
+        self.histograms = {name: {} for name in self.HISTOGRAMS}
+
+    def _observe(self, name, labels, value):
+        series = self.histograms[name]
+        if labels not in series:
+            series[labels] = Histogram(self.HISTOGRAMS[name][1])
+        series[labels].observe(value)
+
+    def observe(self, view, method, status, seconds, size, metrics):
+        by_view = (("view", view),)
+        with self._lock:
+            key = (("view", view), ("method", method), ("status", status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self._observe("cadence_http_request_duration_seconds", by_view, seconds)
+            self._observe("cadence_db_queries", by_view, metrics.queries)
+            self._observe("cadence_db_duration_seconds", by_view, metrics.db_seconds)
+            self._observe("cadence_http_response_size_bytes", by_view, size)
+            for name, elapsed in metrics.spans.items():
+                self._observe("cadence_span_duration_seconds", by_view + (("span", name),), elapsed)
+
+    def render(self, extra=()):
+        """Prometheus text exposition; `extra` is (name, type, help, value) for gauges/counters."""
+        out = [
+            "# HELP cadence_http_requests_total Requests by view, method and status.",
+            "# TYPE cadence_http_requests_total counter",
+        ]
+        with self._lock:
+            for labels, value in sorted(self.requests.items()):
+                out.append(f"cadence_http_requests_total{{{_labels(labels)}}} {value}")
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                out += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for labels, hist in sorted(self.histograms[name].items()):
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        out.append(f'{name}_bucket{{{_labels(labels + (("le", bound),))}}} {count}')
+                    out.append(f'{name}_bucket{{{_labels(labels + (("le", "+Inf"),))}}} {hist.count}')
+                    out.append(f"{name}_sum{{{_labels(labels)}}} {hist.sum}")
+                    out.append(f"{name}_count{{{_labels(labels)}}} {hist.count}")
+        for name, kind, help_text, value in extra:
+            out += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
+
+
+def server_timing(metrics, total):
+    parts = [f'db;dur={metrics.db_seconds * 1000:.1f};desc="{metrics.queries} queries"']
+    parts += [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in metrics.spans.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,113 @@
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.deprecation import MiddlewareMixin
+
+from . import metrics
+from .compression import compress_response
+from .routers import RequestPin, request_pin
+
+logger = logging.getLogger("app.metrics")
+
+PIN_COOKIE = "db_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    """
+    Read-your-writes for the replica router: unsafe requests and clients
+    that wrote in the last REPLICA_PIN_SECONDS read from the primary.
+    """
+
+    def process_request(self, request):
+        pinned = request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+        request._replica_pin = RequestPin(pinned)
+        request_pin.set(request._replica_pin)
+
+    def process_response(self, request, response):
+        pin = getattr(request, "_replica_pin", None)
+        if pin is None:
+            return response
+        request_pin.set(None)
+        if pin.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite="Lax")
+        return response
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    gzip (and Brotli, if installed) for API responses of at least
+    COMPRESSION_MIN_BYTES; bodies with a strong ETag are compressed once
+    and reused (app/compression.py). Off unless COMPRESSION_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        if not settings.COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_response(self, request, response):
+        return compress_response(request, response)
+
+
+class MetricsMiddleware:
+    """
+    Per-request latency, SQL, span and size metrics (app/metrics.py),
+    a Server-Timing header, and sampled logging of slow requests with
+    their SQL. Removed from the stack unless METRICS_ENABLED is set.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        metrics.install_query_recorder()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        collected, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.record(request, response, collected)
+
+    async def __acall__(self, request):
+        collected, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.record(request, response, collected)
+
+    def record(self, request, response, collected):
+        total = time.perf_counter() - collected.started
+        match = request.resolver_match
+        view = (match.view_name if match else None) or "unmatched"
+        if response.streaming:
+            size = int(response.get("Content-Length") or 0)
+        else:
+            size = len(response.content)
+
+        metrics.registry.observe(view, request.method, response.status_code, total, size, collected)
+        response["Server-Timing"] = metrics.server_timing(collected, total)
+
+        if total * 1000 >= settings.METRICS_SLOW_REQUEST_MS and random.random() < settings.METRICS_SLOW_SAMPLE_RATE:
+            statements = "\n".join(f"  {elapsed * 1000:8.2f} ms  {sql[:500]}" for sql, elapsed in collected.sql)
+            logger.warning(
+                "Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms\n%s",
+                request.method, request.get_full_path(), view, total * 1000,
+                collected.queries, collected.db_seconds * 1000, statements,
+            )
+        return response
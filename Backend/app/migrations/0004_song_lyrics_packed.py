@@ -0,0 +1,30 @@
+# Generated by Django 5.0.3 on 2026-10-18 08:57
+
+from django.db import migrations, models
+
+
+def backfill_packed_lyrics(apps, schema_editor):
+    from app.lyrics import pack_lyrics
+
+    Song = apps.get_model("app", "Song")
+    SongLyricLine = apps.get_model("app", "SongLyricLine")
+
+    for song_id in Song.objects.values_list("id", flat=True).iterator():
+        pairs = SongLyricLine.objects.filter(song_id=song_id).order_by("id").values_list("timestamp", "text")
+        Song.objects.filter(pk=song_id).update(lyrics_packed=pack_lyrics(pairs))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_delete_recording'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='song',
+            name='lyrics_packed',
+            field=models.BinaryField(blank=True, help_text='All lyric lines packed into one blob (see app.lyrics)', null=True),
+        ),
+        migrations.RunPython(backfill_packed_lyrics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_song_lyrics_packed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='song',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_song_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='song',
+            name='import_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
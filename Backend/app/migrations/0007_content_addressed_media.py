@@ -0,0 +1,29 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:06
+
+import app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_song_import_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='song',
+            name='audio_file',
+            field=models.FileField(db_index=True, storage=app.storage.content_addressed_storage, upload_to='songs/audio/'),
+        ),
+        migrations.AlterField(
+            model_name='song',
+            name='cover_image',
+            field=models.ImageField(db_index=True, storage=app.storage.content_addressed_storage, upload_to='song_covers/'),
+        ),
+        migrations.AlterField(
+            model_name='song',
+            name='lrc_file',
+            field=models.FileField(db_index=True, storage=app.storage.content_addressed_storage, upload_to='songs/lyrics/'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:20
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from app.search import get_backend, song_documents
+
+    Song = apps.get_model("app", "Song")
+    connection = schema_editor.connection
+    backend = get_backend(connection.vendor)
+    songs = Song.objects.using(connection.alias)
+
+    with connection.cursor() as cursor:
+        backend.create(cursor)
+        # Index the existing catalog, in batches
+        batch = []
+        for document in song_documents(songs):
+            batch.append(document)
+            if len(batch) == 500:
+                backend.insert(cursor, batch)
+                batch = []
+        backend.insert(cursor, batch)
+
+
+def drop_search_index(apps, schema_editor):
+    from app.search import get_backend
+
+    with schema_editor.connection.cursor() as cursor:
+        get_backend(schema_editor.connection.vendor).drop(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_song_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='song',
+            name='duration',
+            field=models.PositiveIntegerField(db_index=True, help_text='Duration in seconds'),
+        ),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['genre', 'id'], name='song_genre_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['language', 'id'], name='song_language_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['artist', 'id'], name='song_artist_id_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:08
+
+from django.db import migrations, models
+
+
+def repack_sorted(apps, schema_editor):
+    # Blobs written before this migration kept insertion order
+    from app.lyrics import pack_lyrics
+
+    Song = apps.get_model("app", "Song")
+    SongLyricLine = apps.get_model("app", "SongLyricLine")
+
+    for song_id in Song.objects.filter(lyrics_packed__isnull=False).values_list("id", flat=True).iterator():
+        pairs = SongLyricLine.objects.filter(song_id=song_id).order_by("timestamp", "id").values_list("timestamp", "text")
+        Song.objects.filter(pk=song_id).update(lyrics_packed=pack_lyrics(pairs))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_song_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='songlyricline',
+            options={'ordering': ['timestamp', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='songlyricline',
+            index=models.Index(fields=['song', 'timestamp'], name='lyric_song_timestamp_idx'),
+        ),
+        migrations.RunPython(repack_sorted, migrations.RunPython.noop),
+    ]
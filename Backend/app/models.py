@@ -1,5 +1,8 @@
+import uuid
+
 from django.db import models
 from base.models import User   # adjust import based on your structure
+from .storage import content_addressed_storage
 
 class Artist(models.Model):
     name = models.CharField(max_length=200)
@@ -9,18 +12,48 @@ class Artist(models.Model):
 
 
 class Song(models.Model):
+    # Uploads are processed by background jobs (see app.jobs)
+    PENDING = "pending"
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+    PROCESSING_STATES = [
+        (PENDING, "Pending"),
+        (PROCESSING, "Processing"),
+        (READY, "Ready"),
+        (FAILED, "Failed"),
+    ]
+
     title = models.CharField(max_length=255)
     artist = models.ForeignKey(Artist, on_delete=models.SET_NULL, null=True)
     language = models.CharField(max_length=100)
     genre = models.CharField(max_length=100)
-    cover_image = models.ImageField(upload_to="song_covers/")
-    audio_file = models.FileField(upload_to="songs/audio/")
-    lrc_file = models.FileField(upload_to="songs/lyrics/")
-    duration = models.PositiveIntegerField(help_text="Duration in seconds")
+    # Content-addressed: songs/audio/ab/cd/<sha256>.mp3, shared between songs
+    cover_image = models.ImageField(upload_to="song_covers/", storage=content_addressed_storage, db_index=True)
+    audio_file = models.FileField(upload_to="songs/audio/", storage=content_addressed_storage, db_index=True)
+    lrc_file = models.FileField(upload_to="songs/lyrics/", storage=content_addressed_storage, db_index=True)
+    duration = models.PositiveIntegerField(help_text="Duration in seconds", db_index=True)
+    lyrics_packed = models.BinaryField(null=True, blank=True, editable=False,
+                                       help_text="All lyric lines packed into one blob (see app.lyrics)")
+    # Bumped on any change to metadata, files or lyric lines; drives ETag/Last-Modified
+    updated_at = models.DateTimeField(auto_now=True)
 
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL,
                                     null=True, related_name="uploaded_songs")
 
+    # Stable id from a bulk import (see import_catalog); makes re-runs idempotent
+    import_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
+    processing_state = models.CharField(max_length=16, choices=PROCESSING_STATES, default=READY, editable=False)
+
+    class Meta:
+        # Filtered catalog pages are keyset-ordered by id (see SongCursorPagination)
+        indexes = [
+            models.Index(fields=["genre", "id"], name="song_genre_id_idx"),
+            models.Index(fields=["language", "id"], name="song_language_id_idx"),
+            models.Index(fields=["artist", "id"], name="song_artist_id_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -30,5 +63,78 @@ class SongLyricLine(models.Model):
     timestamp = models.FloatField(help_text="Seconds since start of song")
     text = models.CharField(max_length=500)
 
+    class Meta:
+        ordering = ["timestamp", "id"]
+        indexes = [
+            models.Index(fields=["song", "timestamp"], name="lyric_song_timestamp_idx"),
+        ]
+
     def __str__(self):
         return f"[{self.timestamp}] {self.text}"
+
+
+class Job(models.Model):
+    """
+    A unit of background work, claimed and run by `manage.py run_workers`.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=50)
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, null=True, related_name="jobs")
+    state = models.CharField(max_length=16, choices=STATES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # Not claimed before this; pushed back after each failed attempt
+    run_after = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["state", "run_after"], name="job_state_run_after_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.state})"
+
+
+class UploadSession(models.Model):
+    """
+    A resumable audio upload (see app.uploads): chunks are written at their
+    offsets into a preallocated part file, in any order, and the file is
+    attached to a song once every byte has arrived.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="upload_sessions")
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(help_text="Total length in bytes")
+    # Optional hex sha256 of the whole file, checked when the upload is attached
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.size} bytes)"
+
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name="chunks")
+    offset = models.PositiveBigIntegerField()
+    length = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["session", "offset"], name="upload_chunk_offset_uniq"),
+        ]
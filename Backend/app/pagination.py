@@ -0,0 +1,91 @@
+from django.db.models import Q
+from rest_framework.pagination import CursorPagination
+
+
+class SongCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the song catalog.
+    Ordering on the primary key keeps every page an indexed range scan,
+    so page cost doesn't grow with the size of the catalog.
+
+    `apaginate_queryset` is the async twin of `paginate_queryset`: the
+    same cursor logic with the page fetched through the async ORM.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = "id"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        window = self._page_window(queryset, request, view)
+        if window is None:
+            return None
+        return self._set_page(list(window))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        window = self._page_window(queryset, request, view)
+        if window is None:
+            return None
+        return self._set_page([song async for song in window])
+
+    # CursorPagination.paginate_queryset, split around the one query it runs
+
+    def _page_window(self, queryset, request, view):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, position = self.cursor or (0, False, None)
+
+        order = self.ordering[0]
+        is_reversed = order.startswith("-")
+        order_attr = order.lstrip("-")
+        if reverse:
+            queryset = queryset.order_by(*[o[1:] if o.startswith("-") else "-" + o for o in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if str(position) != "None":
+            lookup = "__lt" if self.cursor.reverse != is_reversed else "__gt"
+            query = Q(**{order_attr + lookup: position})
+            if (reverse and not is_reversed) or is_reversed:
+                query |= Q(**{order_attr + "__isnull": True})
+            queryset = queryset.filter(query)
+
+        # One extra row tells whether another page follows
+        return queryset[offset:offset + self.page_size + 1]
+
+    def _set_page(self, results):
+        offset, reverse, position = self.cursor or (0, False, None)
+        self.page = results[:self.page_size]
+
+        if len(results) > len(self.page):
+            has_following = True
+            following = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following = False
+            following = None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = (position is not None) or (offset > 0)
+            self.has_previous = has_following
+            if self.has_next:
+                self.next_position = position
+            if self.has_previous:
+                self.previous_position = following
+        else:
+            self.has_next = has_following
+            self.has_previous = (position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following
+            if self.has_previous:
+                self.previous_position = position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
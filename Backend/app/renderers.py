@@ -0,0 +1,126 @@
+"""
+Compact representations of the catalog payloads, picked by the Accept
+header (or ?format=) on the song endpoints:
+
+- application/vnd.cadence.columnar+json: lists of uniform objects become
+  one array per field, and `timestamp` columns become integer-millisecond
+  deltas (`timestamp_delta_ms`: first value absolute, then differences)
+- application/msgpack: the plain payload as MessagePack, if msgpack is
+  installed
+
+The JSON payload stays the default. ETags name the representation, see
+representation_etag().
+"""
+from django.http import HttpResponse
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+try:
+    import msgpack
+except ImportError:  # optional: application/msgpack is not offered
+    msgpack = None
+
+
+def _delta_ms(timestamps):
+    deltas, previous = [], 0
+    for timestamp in timestamps:
+        ms = round(timestamp * 1000)
+        deltas.append(ms - previous)
+        previous = ms
+    return deltas
+
+
+def columnar(data):
+    """
+    [{"timestamp": 1.5, "text": "a"}, {"timestamp": 2.0, "text": "b"}]
+    -> {"timestamp_delta_ms": [1500, 500], "text": ["a", "b"]}, recursively.
+    Lists of anything else are kept as lists.
+    """
+    if isinstance(data, dict):
+        return {key: columnar(value) for key, value in data.items()}
+    if isinstance(data, list):
+        if data and all(isinstance(row, dict) for row in data):
+            fields = list(data[0])
+            if all(list(row) == fields for row in data):
+                columns = {}
+                for field in fields:
+                    values = [columnar(row[field]) for row in data]
+                    if field == "timestamp" and all(isinstance(v, (int, float)) for v in values):
+                        columns["timestamp_delta_ms"] = _delta_ms(values)
+                    else:
+                        columns[field] = values
+                return columns
+        return [columnar(item) for item in data]
+    return data
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    media_type = "application/vnd.cadence.columnar+json"
+    format = "columnar"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(columnar(data), accepted_media_type, renderer_context)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, use_bin_type=True, default=str)
+
+
+COMPACT_RENDERERS = [ColumnarJSONRenderer] + ([MessagePackRenderer] if msgpack else [])
+
+# For the DRF song views: the project defaults plus the compact formats
+CATALOG_RENDERERS = list(api_settings.DEFAULT_RENDERER_CLASSES) + COMPACT_RENDERERS
+
+# For the async views, which render without a DRF view (no browsable API)
+ASYNC_RENDERERS = [JSONRenderer] + COMPACT_RENDERERS
+
+
+def representation_etag(request, etag):
+    """
+    The ETag of `etag`'s payload as rendered for this request: unchanged
+    for JSON, suffixed with the format for every other representation
+    (the compact ones and the browsable API's HTML).
+    """
+    renderer = getattr(request, "accepted_renderer", None)
+    if renderer is None or renderer.format == "json":
+        return etag
+    return f'{etag[:-1]}-{renderer.format}"'
+
+
+def negotiate(request):
+    """
+    Pick a renderer from ASYNC_RENDERERS for a plain Django request, as
+    DRF would, and remember it on the request. None if nothing is acceptable.
+    """
+    renderers = [renderer_class() for renderer_class in ASYNC_RENDERERS]
+    try:
+        request.accepted_renderer, request.accepted_media_type = (
+            DefaultContentNegotiation().select_renderer(Request(request), renderers)
+        )
+    except NotAcceptable:
+        return None
+    return request.accepted_renderer
+
+
+def render(request, data, status=200):
+    """
+    HttpResponse with `data` in the representation negotiated for `request`.
+    """
+    renderer = getattr(request, "accepted_renderer", None) or JSONRenderer()
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type += f"; charset={renderer.charset}"
+    response = HttpResponse(renderer.render(data), status=status, content_type=content_type)
+    response["Vary"] = "Accept"
+    return response
@@ -0,0 +1,64 @@
+"""
+Primary/replica database routing.
+
+Catalog reads (songs, artists, lyric lines) go to a random alias from
+DATABASE_REPLICAS; everything else, and every write, goes to `default`.
+Replicas lag the primary, so reads stay on the primary:
+
+- inside a transaction on the primary,
+- for the rest of a request once it has written anything,
+- for REPLICA_PIN_SECONDS after a client's write: ReplicaPinMiddleware
+  sets a short-lived cookie, so a client reads its own uploads.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_MODELS = {"app.artist", "app.song", "app.songlyricline"}
+
+
+class RequestPin:
+    __slots__ = ("pinned", "wrote")
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+# Set per request by ReplicaPinMiddleware. The object is mutated rather
+# than replaced so the flag survives sync/async thread hops.
+request_pin = contextvars.ContextVar("request_pin", default=None)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or model._meta.label_lower not in REPLICA_MODELS:
+            return DEFAULT_DB_ALIAS
+        pin = request_pin.get()
+        if pin is not None and pin.pinned:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        pin = request_pin.get()
+        if pin is not None:
+            pin.pinned = pin.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,227 @@
+"""
+Full-text search over song titles, artist names and lyrics.
+
+One document per song. SQLite uses an FTS5 virtual table, PostgreSQL a
+weighted tsvector with a GIN index; other backends fall back to LIKE
+queries. The index is kept current by app.catalog.songs_changed.
+Index writes go to the primary; searches read wherever the router sends
+Song reads (a replica, see app/routers.py).
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections, router
+
+from .lyrics import unpack_lyrics
+
+FTS_TABLE = "app_song_fts"
+PG_TABLE = "app_song_search"
+
+SNIPPET_START, SNIPPET_END, SNIPPET_ELLIPSIS = "[", "]", "…"
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _documents(song_ids, using):
+    """
+    (song_id, title, artist, lyrics) for existing songs among `song_ids`.
+    """
+    from .models import Song
+
+    return song_documents(Song.objects.using(using).filter(pk__in=song_ids))
+
+
+def song_documents(songs):
+    """
+    (song_id, title, artist, lyrics) for every song in the `songs` queryset
+    (historical models too, for migrations).
+    """
+    songs = songs.select_related("artist").only("id", "title", "artist__name", "lyrics_packed")
+    for song in songs.iterator(chunk_size=500):
+        if song.lyrics_packed is not None:
+            lines = [line["text"] for line in unpack_lyrics(song.lyrics_packed)]
+        else:
+            lines = list(song.lyrics.values_list("text", flat=True))
+        yield song.pk, song.title, song.artist.name if song.artist else "", "\n".join(lines)
+
+
+class SQLiteFTSBackend:
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(title, artist, lyrics, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+    def drop(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def update(self, song_ids):
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in song_ids])
+            self.insert(cursor, _documents(song_ids, self.using))
+
+    def insert(self, cursor, documents):
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, artist, lyrics) VALUES (%s, %s, %s, %s)",
+            list(documents),
+        )
+
+    def clear(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    def search(self, query, limit):
+        # Every word must match; the last one as a prefix (search-as-you-type)
+        words = WORD_RE.findall(query)
+        if not words:
+            return []
+        terms = [f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*']
+
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, bm25({FTS_TABLE}, 10.0, 5.0, 1.0) AS rank, "
+                f"snippet({FTS_TABLE}, 2, %s, %s, %s, 12) "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s",
+                [SNIPPET_START, SNIPPET_END, SNIPPET_ELLIPSIS, " ".join(terms), limit],
+            )
+            # bm25 is lower-is-better; flip it so higher rank means more relevant
+            return [(pk, -rank, snippet) for pk, rank, snippet in cursor.fetchall()]
+
+
+class PostgresSearchBackend:
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {PG_TABLE} ("
+            "song_id bigint PRIMARY KEY REFERENCES app_song(id) ON DELETE CASCADE, "
+            "lyrics text NOT NULL, document tsvector NOT NULL)"
+        )
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_document ON {PG_TABLE} USING GIN (document)")
+
+    def drop(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {PG_TABLE}")
+
+    def update(self, song_ids):
+        documents = list(_documents(song_ids, self.using))
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {PG_TABLE} WHERE song_id = ANY(%s)", [list(song_ids)])
+            self.insert(cursor, documents)
+
+    def insert(self, cursor, documents):
+        cursor.executemany(
+            f"INSERT INTO {PG_TABLE} (song_id, lyrics, document) VALUES (%s, %s, "
+            "setweight(to_tsvector('simple', %s), 'A') || "
+            "setweight(to_tsvector('simple', %s), 'B') || "
+            "setweight(to_tsvector('simple', %s), 'C'))",
+            [(pk, lyrics, title, artist, lyrics) for pk, title, artist, lyrics in documents],
+        )
+
+    def clear(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {PG_TABLE}")
+
+    def search(self, query, limit):
+        if not WORD_RE.search(query):
+            return []
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT song_id, ts_rank(document, q) AS rank, "
+                "ts_headline('simple', lyrics, q, %s) "
+                f"FROM {PG_TABLE}, websearch_to_tsquery('simple', %s) q "
+                "WHERE document @@ q ORDER BY rank DESC LIMIT %s",
+                [f"StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxWords=12, MinWords=4",
+                 query, limit],
+            )
+            return cursor.fetchall()
+
+
+class BasicSearchBackend:
+    """
+    Unindexed fallback for other databases: LIKE over titles, artists and lyric rows.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def create(self, cursor):
+        pass
+
+    def drop(self, cursor):
+        pass
+
+    def update(self, song_ids):
+        pass
+
+    def insert(self, cursor, documents):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, query, limit):
+        from django.db.models import Q
+
+        from .models import Song
+
+        query = query.strip()
+        if not query:
+            return []
+        ids = (
+            Song.objects.using(self.using).filter(
+                Q(title__icontains=query) | Q(artist__name__icontains=query) | Q(lyrics__text__icontains=query)
+            )
+            .values_list("id", flat=True)
+            .distinct()[:limit]
+        )
+        return [(pk, 0.0, "") for pk in ids]
+
+
+def get_backend(vendor=None, using=DEFAULT_DB_ALIAS):
+    vendor = vendor or connections[using].vendor
+    if vendor == "sqlite":
+        return SQLiteFTSBackend(using)
+    if vendor == "postgresql":
+        return PostgresSearchBackend(using)
+    return BasicSearchBackend(using)
+
+
+def update_index(song_ids):
+    """
+    Re-index these songs; ids that no longer exist are removed.
+    """
+    song_ids = list(song_ids)
+    if song_ids:
+        get_backend().update(song_ids)
+
+
+def rebuild_index(batch_size=1000):
+    from .models import Song
+
+    backend = get_backend()
+    backend.clear()
+    count = 0
+    batch = []
+    for pk in Song.objects.using(backend.using).values_list("id", flat=True).iterator(chunk_size=batch_size):
+        batch.append(pk)
+        if len(batch) == batch_size:
+            backend.update(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        backend.update(batch)
+        count += len(batch)
+    return count
+
+
+def search_songs(query, limit=20):
+    """
+    [(song_id, rank, snippet)] best match first.
+    """
+    from .models import Song
+
+    return get_backend(using=router.db_for_read(Song)).search(query, limit)
@@ -1,5 +1,10 @@
+from django.db import transaction
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Song, SongLyricLine, Artist
+from .images import cover_srcset
+from .lyrics import unpack_lyrics
+from .models import Song, SongLyricLine, Artist, UploadSession
+from .waveform import decodable, waveform_url
 
 class SongLyricLineSerializer(serializers.ModelSerializer):
     class Meta:
@@ -7,44 +12,215 @@ class SongLyricLineSerializer(serializers.ModelSerializer):
         fields = ["timestamp", "text"]
 
 
+class PackedLyricsField(serializers.Field):
+    """
+    Serves lyrics from Song.lyrics_packed when present, so no lyric rows
+    are loaded. Falls back to the SongLyricLine rows for unpacked songs.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, song):
+        if song.lyrics_packed is not None:
+            return unpack_lyrics(song.lyrics_packed)
+        return SongLyricLineSerializer(song.lyrics.all(), many=True).data
+
+
 class SongSerializer(serializers.ModelSerializer):
-    lyrics = SongLyricLineSerializer(many=True, read_only=True)
+    artist_name = serializers.CharField(source="artist.name", read_only=True, default=None)
+    cover_srcset = serializers.SerializerMethodField()
+    audio_stream = serializers.SerializerMethodField()
+    waveform = serializers.SerializerMethodField()
+    lyrics = PackedLyricsField()
+
+    class Meta:
+        model = Song
+        fields = [
+            "id", "title", "artist", "artist_name", "language", "genre",
+            "cover_image", "cover_srcset", "audio_file", "audio_stream", "waveform", "duration", "lyrics"
+        ]
+
+    def get_cover_srcset(self, song):
+        return cover_srcset(song, self.context.get("request"))
+
+    def get_audio_stream(self, song):
+        # Range-capable streaming endpoint; prefer it over the raw media URL
+        url = reverse("song-audio", args=[song.pk])
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    def get_waveform(self, song):
+        return waveform_url(song, self.context.get("request"))
+
+
+class FastSongSerializer:
+    """
+    Read-only stand-in for SongSerializer that builds the same payload
+    directly: no per-instance field construction and no serializer per
+    lyric line. Lyrics come from the packed blob, prefetched rows or a
+    single values_list() query. Selected per view via serializer_class;
+    tests keep the rendered output byte-identical to SongSerializer.
+    """
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @property
+    def data(self):
+        if self.many:
+            return [self.to_representation(song) for song in self.instance]
+        return self.to_representation(self.instance)
+
+    def to_representation(self, song):
+        request = self.context.get("request")
+        audio_stream = reverse("song-audio", args=[song.pk])
+        return {
+            "id": song.pk,
+            "title": song.title,
+            "artist": song.artist_id,
+            "artist_name": song.artist.name if song.artist_id is not None else None,
+            "language": song.language,
+            "genre": song.genre,
+            "cover_image": self.file_url(song.cover_image, request),
+            "cover_srcset": cover_srcset(song, request),
+            "audio_file": self.file_url(song.audio_file, request),
+            "audio_stream": request.build_absolute_uri(audio_stream) if request else audio_stream,
+            "waveform": waveform_url(song, request),
+            "duration": song.duration,
+            "lyrics": self.lyrics(song),
+        }
+
+    @staticmethod
+    def file_url(field_file, request):
+        # As serializers.FileField with UPLOADED_FILES_USE_URL
+        if not field_file:
+            return None
+        url = field_file.url
+        return request.build_absolute_uri(url) if request else url
+
+    @staticmethod
+    def lyrics(song):
+        if song.lyrics_packed is not None:
+            return unpack_lyrics(song.lyrics_packed)
+        if "lyrics" in getattr(song, "_prefetched_objects_cache", {}):
+            rows = ((line.timestamp, line.text) for line in song.lyrics.all())
+        else:
+            rows = song.lyrics.values_list("timestamp", "text")
+        return [{"timestamp": timestamp, "text": text} for timestamp, text in rows]
+
+
+# Lightweight representation for the catalog listing (no lyrics)
+class SongListSerializer(serializers.ModelSerializer):
+    artist_name = serializers.CharField(source="artist.name", read_only=True, default=None)
+    cover_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Song
         fields = [
-            "id", "title", "artist", "language", "genre",
-            "cover_image", "audio_file", "duration", "lyrics"
+            "id", "title", "artist", "artist_name", "genre", "language",
+            "cover_image", "cover_srcset", "duration"
         ]
 
+    def get_cover_srcset(self, song):
+        return cover_srcset(song, self.context.get("request"))
+
 
 class SongUploadSerializer(serializers.ModelSerializer):
+    # A finished resumable upload (see UploadSessionView), instead of audio_file
+    audio_upload = serializers.PrimaryKeyRelatedField(
+        queryset=UploadSession.objects.all(), write_only=True, required=False,
+    )
+
     class Meta:
         model = Song
         fields = [
             "title", "artist", "language", "genre",
-            "cover_image", "audio_file", "lrc_file",
+            "cover_image", "audio_file", "audio_upload", "lrc_file",
             "duration"
         ]
+        # duration is measured from WAV audio by the workers (see app.waveform)
+        extra_kwargs = {"audio_file": {"required": False}, "duration": {"required": False}}
 
-    def create(self, validated_data):
-        from .utils import parse_lrc
-        from .models import SongLyricLine
+    def validate_audio_upload(self, session):
+        from .uploads import received_ranges, upload_offset
 
-        lrc_file = validated_data.get("lrc_file")
+        request = self.context.get("request")
+        if request is not None and session.owner_id != request.user.id:
+            raise serializers.ValidationError("Unknown upload session.")
+        if upload_offset(received_ranges(session)) < session.size:
+            raise serializers.ValidationError("Upload is incomplete.")
+        return session
 
-        # Save the song first
-        song = Song.objects.create(**validated_data)
+    def validate(self, attrs):
+        audio, upload = attrs.get("audio_file"), attrs.get("audio_upload")
+        if bool(audio) == bool(upload):
+            raise serializers.ValidationError("Send either audio_file or audio_upload.")
+        if "duration" not in attrs:
+            if not decodable(audio.name if audio else upload.filename):
+                raise serializers.ValidationError({"duration": ["Required unless the audio is WAV."]})
+            attrs["duration"] = 0
+        return attrs
 
-        # Parse the LRC
-        lrc_text = lrc_file.read().decode("utf-8")
-        parsed_lines = parse_lrc(lrc_text)
+    def create(self, validated_data):
+        from .cache import invalidate_songs
+        from .jobs import enqueue_upload
+        from .uploads import UploadError, finish
 
-        # Create lyric lines
-        bulk_list = [
-            SongLyricLine(song=song, timestamp=line["timestamp"], text=line["text"])
-            for line in parsed_lines
-        ]
-        SongLyricLine.objects.bulk_create(bulk_list)
+        session = validated_data.pop("audio_upload", None)
+
+        # Lyrics, cover derivatives and the search index are left to the
+        # workers (see app.jobs); the song is listed meanwhile, without lyrics
+        with transaction.atomic():
+            if session is not None:
+                name = Song._meta.get_field("audio_file").generate_filename(None, session.filename)
+                try:
+                    validated_data["audio_file"] = finish(session, name)
+                except UploadError as exc:
+                    raise serializers.ValidationError({"audio_upload": [str(exc)]})
+            song = Song.objects.create(processing_state=Song.PENDING, **validated_data)
+            enqueue_upload(song)
+        invalidate_songs(song.pk)
 
         return song
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ["id", "filename", "size", "sha256"]
+        read_only_fields = ["id"]
+        extra_kwargs = {"sha256": {"required": False}}
+
+    def validate_sha256(self, value):
+        if value and (len(value) != 64 or any(c not in "0123456789abcdefABCDEF" for c in value)):
+            raise serializers.ValidationError("Expected a hex sha256 digest.")
+        return value
+
+    def create(self, validated_data):
+        from .uploads import UploadError, create_session
+
+        try:
+            return create_session(self.context["request"].user.id, **validated_data)
+        except UploadError as exc:
+            raise serializers.ValidationError({"size": [str(exc)]})
+
+
+class SongProcessingSerializer(serializers.ModelSerializer):
+    jobs = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Song
+        fields = ["id", "processing_state", "jobs"]
+
+    def get_jobs(self, song):
+        # Last traceback line only, e.g. "ValueError: Not a packed lyrics blob"
+        return [
+            {"kind": job.kind, "state": job.state, "attempts": job.attempts,
+             "error": job.last_error.strip().rpartition("\n")[2]}
+            for job in song.jobs.order_by("id")
+        ]
@@ -0,0 +1,33 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Song
+from .storage import SONG_FILE_FIELDS, media_storage, release_unreferenced
+
+
+@receiver(pre_save, sender=Song)
+def remember_replaced_files(sender, instance, **kwargs):
+    # Names this save will stop referencing (file replaced in admin / API)
+    instance._replaced_files = []
+    update_fields = kwargs.get("update_fields")
+    if instance.pk is None or (update_fields is not None and not set(SONG_FILE_FIELDS) & set(update_fields)):
+        return
+    previous = Song.objects.filter(pk=instance.pk).values(*SONG_FILE_FIELDS).first()
+    if previous:
+        instance._replaced_files = [
+            previous[field] for field in SONG_FILE_FIELDS
+            if previous[field] and previous[field] != getattr(instance, field).name
+        ]
+
+
+@receiver(post_save, sender=Song)
+def release_replaced_files(sender, instance, **kwargs):
+    # The row now references its files; leases from storing them can go
+    media_storage.drop_leases(getattr(instance, field).name for field in SONG_FILE_FIELDS)
+    if getattr(instance, "_replaced_files", None):
+        release_unreferenced(instance._replaced_files)
+
+
+@receiver(post_delete, sender=Song)
+def release_deleted_files(sender, instance, **kwargs):
+    release_unreferenced([getattr(instance, field).name for field in SONG_FILE_FIELDS])
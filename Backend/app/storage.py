@@ -0,0 +1,217 @@
+import glob
+import hashlib
+import os
+import posixpath
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .locks import named_lock
+
+try:
+    import fcntl
+except ImportError:  # Windows: per-process locking only
+    fcntl = None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each upload once, under <upload_to>/ab/cd/<sha256><ext>.
+
+    The hash is computed while the upload is streamed to a temp file, so
+    nothing is held in memory. If a blob with the same hash already
+    exists the temp file is dropped and the existing name is returned.
+    Blobs are shared between songs; see release_unreferenced().
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is decided by content in _save(), never suffixed
+        return name
+
+    def _save(self, name, content):
+        incoming = os.path.join(self.location, ".incoming")
+        os.makedirs(incoming, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=incoming)
+
+        try:
+            digest = hashlib.sha256()
+            if hasattr(content, "seek"):
+                content.seek(0)
+            with os.fdopen(fd, "wb") as out:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    out.write(chunk)
+
+            return self.adopt(tmp_path, name, digest.hexdigest())
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def blob_name(self, name, hexdigest):
+        """
+        Where content with this sha256 is stored for `name`'s upload_to.
+        """
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return posixpath.join(directory, hexdigest[:2], hexdigest[2:4], hexdigest + extension)
+
+    def adopt(self, path, name, hexdigest, lease=True):
+        """
+        Move an already hashed file (on the same filesystem, e.g. under
+        .incoming/) into place as the blob for `name`, without copying it.
+        Returns the blob name.
+
+        A reused blob is leased until drop_leases() is called for it, i.e.
+        until the Song row referencing it is saved. Pass lease=False when
+        that row is already committed.
+        """
+        blob_name = self.blob_name(name, hexdigest)
+        blob_path = self.path(blob_name)
+
+        with self.blob_lock(blob_name):
+            if os.path.exists(blob_path):
+                # Reused: keep a concurrent release from deleting it before
+                # the Song row that will reference it commits
+                if lease:
+                    _pending_leases().setdefault(blob_name, []).append(self._take_lease(blob_name))
+                os.unlink(path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                if self.directory_permissions_mode is not None:
+                    os.chmod(os.path.dirname(blob_path), self.directory_permissions_mode)
+                os.replace(path, blob_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(blob_path, self.file_permissions_mode)
+        return blob_name
+
+    def drop_leases(self, names):
+        """
+        Remove the leases this thread took on `names` once the current
+        transaction commits (right away in autocommit mode), when the saved
+        rows hold the references themselves. If it rolls back the leases
+        are left to expire.
+        """
+        leases = [lease for name in set(filter(None, names)) for lease in _pending_leases().pop(name, ())]
+        if leases:
+            transaction.on_commit(lambda: [_unlink_quietly(lease) for lease in leases])
+
+    @contextmanager
+    def blob_lock(self, name):
+        """
+        Exclusive lock (across processes where fcntl is available)
+        serializing reuse and release of the blob `name`. Names share one
+        of 256 lock files.
+        """
+        stripe = hashlib.sha256(name.encode("utf-8")).hexdigest()[:2]
+        path = os.path.join(self.location, ".incoming", "locks", stripe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with named_lock(path), open(path, "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _lease_prefix(self, name):
+        return os.path.join(self.location, ".incoming", "leases", hashlib.sha256(name.encode("utf-8")).hexdigest())
+
+    def _take_lease(self, name):
+        """
+        A fresh lease file on `name` for one reuse; returns its path.
+        """
+        prefix = self._lease_prefix(name)
+        os.makedirs(os.path.dirname(prefix), exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=os.path.dirname(prefix), prefix=os.path.basename(prefix) + ".")
+        os.close(fd)
+        return path
+
+    def leased(self, name):
+        """
+        Whether a save reused `name` in the last MEDIA_BLOB_LEASE_SECONDS
+        and hasn't committed yet; expired leases are removed. Call under
+        blob_lock().
+        """
+        prefix = self._lease_prefix(name)
+        leased = False
+        for path in glob.glob(glob.escape(prefix) + ".*"):
+            try:
+                age = time.time() - os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            if age < settings.MEDIA_BLOB_LEASE_SECONDS:
+                leased = True
+            else:
+                _unlink_quietly(path)
+        return leased
+
+
+_local = threading.local()
+
+
+def _pending_leases():
+    """
+    Leases taken by this thread's saves whose rows aren't saved yet, as
+    {blob name: [lease path, ...]}.
+    """
+    if not hasattr(_local, "leases"):
+        _local.leases = {}
+    return _local.leases
+
+
+def _unlink_quietly(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+media_storage = ContentAddressedStorage()
+
+
+def content_addressed_storage():
+    """
+    Storage callable for Song file fields (keeps the instance out of migrations).
+    """
+    return media_storage
+
+
+SONG_FILE_FIELDS = ("audio_file", "lrc_file", "cover_image")
+
+
+def release_unreferenced(names):
+    """
+    Delete blobs that no Song references any more, once the current
+    transaction commits. The reference count is the number of Song rows
+    pointing at the name (file fields are indexed for this).
+
+    The check and delete run under the blob's lock, and a blob reused by
+    a save whose transaction hasn't committed yet (its Song row isn't
+    visible) is kept; see ContentAddressedStorage.leased(). If that save
+    rolls back, the blob stays until the name is released again.
+    """
+    from .images import delete_cover_derivatives
+    from .models import Song
+    from .waveform import delete_waveform
+
+    def release():
+        # Counted on the primary: a replica may not have the latest saves yet
+        songs = Song.objects.using(DEFAULT_DB_ALIAS)
+        for name in set(filter(None, names)):
+            with media_storage.blob_lock(name):
+                referenced = media_storage.leased(name) or any(
+                    songs.filter(**{field: name}).exists() for field in SONG_FILE_FIELDS
+                )
+                if not referenced:
+                    media_storage.delete(name)
+                    delete_cover_derivatives(name)
+                    delete_waveform(name)
+
+    transaction.on_commit(release)
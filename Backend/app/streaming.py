@@ -0,0 +1,143 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+from .conditional import not_modified
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeFile:
+    """
+    File-like view over `length` bytes of an open file, starting at `start`.
+
+    The underlying descriptor is positioned at `start`, so servers whose
+    wsgi.file_wrapper uses os.sendfile (gunicorn, uWSGI) send the range
+    zero-copy, bounded by Content-Length. Servers that iterate instead
+    get at most `length` bytes from read().
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range `Range: bytes=...` header.
+    Returns (start, end) inclusive, None if the header should be ignored
+    (malformed or multi-range), or raises ValueError if unsatisfiable.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def _offload_response(fieldfile, path, content_type):
+    mode = settings.AUDIO_STREAM_OFFLOAD
+    response = HttpResponse(content_type=content_type)
+    if mode == "x-accel":
+        # nginx serves the bytes (and Range) from an internal location
+        response["X-Accel-Redirect"] = settings.AUDIO_STREAM_ACCEL_PREFIX.rstrip("/") + "/" + fieldfile.name
+    elif mode == "x-sendfile":
+        response["X-Sendfile"] = path
+    else:
+        raise ValueError(f"Unknown AUDIO_STREAM_OFFLOAD mode: {mode!r}")
+    return response
+
+
+def stream_file(request, fieldfile):
+    """
+    Serve a stored file with Range / If-Range / conditional GET support.
+    """
+    path = fieldfile.path
+    stat = os.stat(path)
+    size = stat.st_size
+    mtime = stat.st_mtime
+    etag = '"%x-%x"' % (stat.st_mtime_ns, size)
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+
+    if settings.AUDIO_STREAM_OFFLOAD:
+        response = _offload_response(fieldfile, path, content_type)
+    else:
+        response = _local_response(request, path, size, etag, mtime, content_type)
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(mtime)
+    response["Accept-Ranges"] = "bytes"
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+def _local_response(request, path, size, etag, mtime, content_type):
+    byte_range = None
+    range_header = request.headers.get("Range")
+    if range_header and _if_range_matches(request, etag, mtime):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    if byte_range is None:
+        # Full body: FileResponse hands the file to wsgi.file_wrapper (sendfile)
+        return FileResponse(open(path, "rb"), content_type=content_type)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = FileResponse(RangeFile(open(path, "rb"), start, length),
+                            content_type=content_type, status=206)
+    response["Content-Length"] = str(length)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
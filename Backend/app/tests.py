@@ -1,3 +1,1393 @@
-from django.test import TestCase
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import wave
+from datetime import timedelta
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import patch
+from uuid import UUID
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.contrib.admin import site as admin_site
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from base.models import User
+from . import async_views
+from .admin import SongAdmin
+from .bench import synthetic_wav
+from .cache import CatalogCache, DjangoCacheBackend, LRUBackend, catalog_cache, invalidate_songs
+from .catalog import songs_changed
+from .compression import compressed_bodies
+from .db import apply_sqlite_pragmas, pragma_statements
+from .images import COVER_FORMATS, COVER_SIZES, ensure_derivative, generate_cover_derivatives
+from .importer import write_batch
+from .locks import _locks as named_locks
+from .metrics import registry
+from .middleware import PIN_COOKIE, ReplicaPinMiddleware
+from .lyrics import pack_lyrics, store_lyrics, unpack_lyrics, unpack_window
+from .jobs import HANDLERS, claim, requeue_stale, run_pending
+from .models import Artist, Job, Song, SongLyricLine, UploadChunk, UploadSession
+from .renderers import ColumnarJSONRenderer, columnar, msgpack
+from .routers import PrimaryReplicaRouter
+from .search import get_backend, rebuild_index, search_songs
+from .storage import media_storage, release_unreferenced
+from .serializers import FastSongSerializer, SongSerializer
+from .uploads import _hashers as upload_hashers, part_path
+from .waveform import compute_peaks, pack_peaks, read_header, unpack_peaks
+from .utils import LrcParser, parse_lrc
+from .views import SongDetailView, SongListView
+
+
+def make_png():
+    buf = io.BytesIO()
+    Image.new("RGB", (4, 4)).save(buf, format="PNG")
+    return SimpleUploadedFile("cover.png", buf.getvalue(), content_type="image/png")
+
+
+def make_lrc(lines):
+    body = "\n".join(f"[00:{i:02d}.00]line {i}" for i in range(lines))
+    return SimpleUploadedFile("song.lrc", body.encode("utf-8"), content_type="text/plain")
+
+
+def seed_catalog(songs, lines_per_song):
+    """Create `songs` songs, each with its own artist and `lines_per_song` lyric lines."""
+    created = []
+    for i in range(songs):
+        artist = Artist.objects.create(name=f"Artist {i}")
+        song = Song.objects.create(
+            title=f"Song {i}", artist=artist, language="en", genre="pop",
+            cover_image="song_covers/c.png", audio_file="songs/audio/a.mp3",
+            lrc_file="songs/lyrics/l.lrc", duration=180,
+        )
+        store_lyrics(song, [(float(j), f"line {j}") for j in range(lines_per_song)])
+        created.append(song)
+    return created
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Exact query counts for the catalog endpoints.
+    If one of these fails, a serializer or queryset change has
+    reintroduced per-row queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.songs = seed_catalog(songs=20, lines_per_song=15)
+
+    def setUp(self):
+        # Budgets are for uncached responses
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+        self.client = APIClient()
+
+    def test_song_list_query_count_is_constant(self):
+        with self.assertNumQueries(1):
+            res = self.client.get(reverse("song-list"))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data["results"]), 20)
+        self.assertEqual(res.data["results"][0]["artist_name"], "Artist 0")
+
+        seed_catalog(songs=20, lines_per_song=15)
+        catalog_cache.clear()
+        with self.assertNumQueries(1):
+            self.client.get(reverse("song-list"))
+
+    def test_song_detail_query_count_is_constant(self):
+        song = self.songs[0]
+        with self.assertNumQueries(1):
+            res = self.client.get(reverse("song-detail", args=[song.pk]))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["artist_name"], "Artist 0")
+        self.assertEqual(len(res.data["lyrics"]), 15)
+
+    def test_song_detail_without_packed_lyrics_falls_back_to_rows(self):
+        song = self.songs[1]
+        packed = self.client.get(reverse("song-detail", args=[song.pk])).json()
+
+        Song.objects.filter(pk=song.pk).update(lyrics_packed=None)
+        catalog_cache.clear()
+        with self.assertNumQueries(2):
+            res = self.client.get(reverse("song-detail", args=[song.pk]))
+        self.assertEqual(res.json(), packed)
+
+
+class CatalogCacheTests(TestCase):
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+        self.client = APIClient()
+        self.song = seed_catalog(songs=2, lines_per_song=3)[0]
+
+    def test_repeat_reads_are_served_from_cache(self):
+        self.client.get(reverse("song-list"))
+        self.client.get(reverse("song-detail", args=[self.song.pk]))
+        with self.assertNumQueries(0):
+            self.client.get(reverse("song-list"))
+            self.client.get(reverse("song-detail", args=[self.song.pk]))
+
+    def test_new_song_invalidates_list(self):
+        self.client.get(reverse("song-list"))
+        with self.captureOnCommitCallbacks(execute=True):
+            song = seed_catalog(songs=1, lines_per_song=1)[0]
+            invalidate_songs(song.pk)
+        res = self.client.get(reverse("song-list"))
+        self.assertEqual(len(res.data["results"]), 3)
+
+    def test_lyric_edit_invalidates_detail(self):
+        self.client.get(reverse("song-detail", args=[self.song.pk]))
+        with self.captureOnCommitCallbacks(execute=True):
+            store_lyrics(self.song, [(1.0, "edited")])
+            invalidate_songs(self.song.pk)
+        res = self.client.get(reverse("song-detail", args=[self.song.pk]))
+        self.assertEqual(res.data["lyrics"], [{"timestamp": 1.0, "text": "edited"}])
+
+    def test_invalidation_reaches_other_processes(self):
+        # Two processes: bodies kept apart, versions shared
+        versions = DjangoCacheBackend("catalog-versions")
+        web, worker = CatalogCache(LRUBackend(), versions), CatalogCache(LRUBackend(), versions)
+        request = RequestFactory().get("/")
+
+        key = web.song_key(request, self.song.pk)
+        web.set(key, "body")
+        self.assertEqual(web.get(web.song_key(request, self.song.pk)), "body")
+
+        worker.invalidate_song(self.song.pk)
+        self.assertIsNone(web.get(web.song_key(request, self.song.pk)))
+
+    @override_settings(DATABASE_REPLICAS=["replica1"], REPLICA_PIN_SECONDS=5)
+    def test_entries_cached_while_replicas_catch_up_are_dropped(self):
+        request = RequestFactory().get("/")
+        catalog_cache.invalidate_song(self.song.pk)
+        # Possibly read from a lagging replica
+        catalog_cache.set(catalog_cache.song_key(request, self.song.pk), "maybe stale")
+        self.assertEqual(catalog_cache.get(catalog_cache.song_key(request, self.song.pk)), "maybe stale")
+
+        with patch("app.cache.time.time", return_value=time.time() + 6):
+            self.assertIsNone(catalog_cache.get(catalog_cache.song_key(request, self.song.pk)))
+
+    def test_entries_expire(self):
+        backend = LRUBackend(timeout=60)
+        backend.set("key", "body")
+        self.assertEqual(backend.get("key"), "body")
+        with patch("app.cache.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertIsNone(backend.get("key"))
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+        self.client = APIClient()
+        self.song = seed_catalog(songs=2, lines_per_song=3)[0]
+
+    def test_detail_if_none_match(self):
+        url = reverse("song-detail", args=[self.song.pk])
+        etag = self.client.get(url)["ETag"]
+
+        catalog_cache.clear()
+        with self.assertNumQueries(1):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res["ETag"], etag)
+
+        store_lyrics(self.song, [(2.0, "changed")])
+        catalog_cache.clear()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_detail_if_modified_since(self):
+        url = reverse("song-detail", args=[self.song.pk])
+        last_modified = self.client.get(url)["Last-Modified"]
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(res.status_code, 304)
+
+    def test_list_if_none_match(self):
+        url = reverse("song-list")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.song.title = "Renamed"
+        self.song.save()
+        catalog_cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_etag_changes_when_full_last_page_gains_next(self):
+        url = reverse("song-list") + "?page_size=2"
+        res = self.client.get(url)
+        self.assertIsNone(res.data["next"])
+
+        seed_catalog(songs=1, lines_per_song=0)
+        catalog_cache.clear()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=res["ETag"])
+        self.assertEqual(res.status_code, 200)
+        self.assertIsNotNone(res.data["next"])
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.songs = seed_catalog(songs=2, lines_per_song=0)
+        self.payload = b"ID3" + bytes(range(256)) * 8
+
+    def attach(self, song, payload=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            song.audio_file.save("a.mp3", SimpleUploadedFile("a.mp3", payload or self.payload))
+        return song.audio_file.name
+
+    def test_identical_uploads_share_one_blob(self):
+        first, second = (self.attach(song) for song in self.songs)
+        digest = hashlib.sha256(self.payload).hexdigest()
+        self.assertEqual(first, second)
+        self.assertTrue(first.endswith(f"/{digest[:2]}/{digest[2:4]}/{digest}.mp3"))
+        self.assertEqual(media_storage.open(first).read(), self.payload)
+
+    def test_blob_is_released_with_its_last_reference(self):
+        name = self.attach(self.songs[0])
+        self.attach(self.songs[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.songs[0].delete()
+        self.assertTrue(media_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.songs[1].delete()
+        self.assertFalse(media_storage.exists(name))
+
+    def test_replaced_file_is_released(self):
+        old = self.attach(self.songs[0])
+        new = self.attach(self.songs[0], b"ID3 other")
+        self.assertNotEqual(old, new)
+        self.assertFalse(media_storage.exists(old))
+        self.assertTrue(media_storage.exists(new))
+
+    def test_blob_lock_without_fcntl(self):
+        with patch("app.storage.fcntl", None):
+            self.test_blob_is_released_with_its_last_reference()
+        self.assertEqual(named_locks, {})
+
+    def test_reused_blob_survives_a_concurrent_release(self):
+        name = self.attach(self.songs[0])
+        # Another request saves the same content; its row isn't committed yet
+        fd, path = tempfile.mkstemp(dir=os.path.join(media_storage.location, ".incoming"))
+        os.close(fd)
+        self.assertEqual(media_storage.adopt(path, "songs/audio/b.mp3", hashlib.sha256(self.payload).hexdigest()),
+                         name)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.songs[0].delete()
+        self.assertTrue(media_storage.exists(name))
+
+        with override_settings(MEDIA_BLOB_LEASE_SECONDS=0), self.captureOnCommitCallbacks(execute=True):
+            release_unreferenced([name])
+        self.assertFalse(media_storage.exists(name))
+
+
+class ContentAddressedStorageAutocommitTests(TransactionTestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_lease_is_dropped_once_the_row_is_saved(self):
+        songs = seed_catalog(songs=2, lines_per_song=0)
+        for song in songs:
+            song.audio_file.save("a.mp3", SimpleUploadedFile("a.mp3", b"ID3 shared"))
+        name = songs[1].audio_file.name
+        self.assertFalse(os.listdir(os.path.join(media_storage.location, ".incoming", "leases")))
+
+        for song in songs:
+            song.delete()
+        self.assertFalse(media_storage.exists(name))
+
+
+class ImportCatalogTests(TestCase):
+
+    def setUp(self):
+        media_root, self.source = tempfile.mkdtemp(), tempfile.mkdtemp()
+        for path in (media_root, self.source):
+            self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        for name, body in (("good.mp3", b"ID3 good"), ("bad.mp3", b"ID3 bad"), ("good.lrc", b"[00:01.00]hello")):
+            with open(os.path.join(self.source, name), "wb") as fh:
+                fh.write(body)
+        self.manifest = os.path.join(self.source, "manifest.csv")
+        with open(self.manifest, "w", newline="") as fh:
+            fh.write("title,artist,duration,audio,lrc\n"
+                     "Good,Importer,180,good.mp3,good.lrc\n"
+                     "Bad duration,Importer,3:00,bad.mp3,\n"
+                     "Missing,Importer,200,missing.mp3,\n")
+
+    def run_import(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_catalog", self.manifest, workers=1, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        out, err = self.run_import()
+        self.assertIn("1 imported, 0 already present, 2 failed", out)
+        self.assertIn("invalid duration: 3:00", err)
+        self.assertIn("audio file not found: missing.mp3", err)
+
+        song = Song.objects.get()
+        self.assertEqual((song.title, song.artist.name, song.duration), ("Good", "Importer", 180))
+        self.assertEqual(unpack_lyrics(song.lyrics_packed), [{"timestamp": 1.0, "text": "hello"}])
+        self.assertTrue(media_storage.exists(song.audio_file.name))
+        # Nothing was stored for the rejected rows
+        stored = os.listdir(os.path.dirname(media_storage.path(song.audio_file.name)))
+        self.assertEqual(len(stored), 1)
+
+    def test_rerun_is_idempotent(self):
+        self.run_import()
+        out, _ = self.run_import()
+        self.assertIn("0 imported, 1 already present, 2 failed", out)
+        self.assertEqual(Song.objects.count(), 1)
+
+    def test_failed_batch_releases_its_files(self):
+        with open(os.path.join(self.source, "cover.png"), "wb") as fh:
+            fh.write(make_png().read())
+        # Both entries share the cover: the second save reuses (and leases) its blob
+        prepared = [({"title": "", "artist": "", "duration": 180, "audio": audio, "lrc": "", "cover": "cover.png"}, [])
+                    for audio in ("good.mp3", "bad.mp3")]
+        with patch("app.importer._insert_batch", side_effect=RuntimeError("disk full")), \
+                self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+            write_batch(prepared, self.source, {"language": "en", "genre": "pop"})
+
+        left = [name for directory, _, names in os.walk(media_storage.location)
+                if os.path.basename(directory) != "locks" for name in names]
+        self.assertEqual(left, [])
+
+
+class CoverDerivativeTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+
+        buf = io.BytesIO()
+        Image.new("RGB", (800, 400), "red").save(buf, format="PNG")
+        self.song = seed_catalog(songs=1, lines_per_song=0)[0]
+        self.song.cover_image.save("cover.png", SimpleUploadedFile("cover.png", buf.getvalue()))
+
+    def test_srcset_urls_serve_versioned_derivatives(self):
+        srcset = self.client.get(reverse("song-detail", args=[self.song.pk])).json()["cover_srcset"]
+        self.assertEqual(set(srcset), set(COVER_FORMATS))
+        self.assertEqual(set(srcset["webp"]), {str(size) for size in COVER_SIZES})
+
+        res = self.client.get(srcset["webp"]["160"])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Content-Type"], "image/webp")
+        self.assertIn("immutable", res["Cache-Control"])
+        with Image.open(io.BytesIO(b"".join(res.streaming_content))) as img:
+            self.assertEqual((img.format, img.size), ("WEBP", (160, 80)))
+
+    def test_unversioned_url_must_revalidate(self):
+        res = self.client.get(reverse("song-cover", args=[self.song.pk, 320, "jpeg"]))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Cache-Control"], "no-cache")
+        res.close()
+
+    def test_undecodable_cover_is_not_found(self):
+        name = media_storage.save("song_covers/broken.png", SimpleUploadedFile("broken.png", b"not an image"))
+        Song.objects.filter(pk=self.song.pk).update(cover_image=name)
+        self.assertEqual(self.client.get(reverse("song-cover", args=[self.song.pk, 160, "webp"])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("song-cover", args=[self.song.pk, 161, "webp"])).status_code, 404)
+
+    def test_failed_size_does_not_skip_the_rest(self):
+        calls = []
+
+        def render(source_name, size, fmt):
+            calls.append((size, fmt))
+            if size == COVER_SIZES[0]:
+                raise OSError("disk full")
+
+        with patch("app.images.ensure_derivative", render), self.assertLogs("app.images", "WARNING"):
+            generate_cover_derivatives(self.song.cover_image)
+        self.assertEqual(len(calls), len(COVER_SIZES) * len(COVER_FORMATS))
+
+    def test_render_locks_are_released(self):
+        ensure_derivative(self.song.cover_image.name, 640, "jpeg")
+        self.assertEqual(named_locks, {})
+
+
+class AudioStreamingTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.payload = bytes(range(256)) * 4
+        self.song = seed_catalog(songs=1, lines_per_song=0)[0]
+        self.song.audio_file.save("a.mp3", SimpleUploadedFile("a.mp3", self.payload))
+        self.url = reverse("song-audio", args=[self.song.pk])
+
+    def test_full_body(self):
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Accept-Ranges"], "bytes")
+        self.assertEqual(b"".join(res.streaming_content), self.payload)
+
+    def test_range(self):
+        res = self.client.get(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(res["Content-Range"], "bytes 10-19/1024")
+        self.assertEqual(res["Content-Length"], "10")
+        self.assertEqual(b"".join(res.streaming_content), self.payload[10:20])
+
+        res = self.client.get(self.url, HTTP_RANGE="bytes=-4")
+        self.assertEqual(b"".join(res.streaming_content), self.payload[-4:])
+
+    def test_unsatisfiable_range(self):
+        res = self.client.get(self.url, HTTP_RANGE="bytes=4096-")
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res["Content-Range"], "bytes */1024")
+
+    def test_stale_if_range_gets_full_body(self):
+        res = self.client.get(self.url, HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(res.status_code, 200)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+        self.client = APIClient()
+        self.songs = seed_catalog(songs=3, lines_per_song=0)
+        store_lyrics(self.songs[0], [(1.0, "Sunshine on my shoulders"), (2.0, "makes me happy")])
+        store_lyrics(self.songs[1], [(1.0, "Rain on the window")])
+        songs_changed(*[song.pk for song in self.songs])
+
+    def search(self, q):
+        res = self.client.get(reverse("song-search"), {"q": q})
+        self.assertEqual(res.status_code, 200)
+        return res.data["results"]
+
+    def test_finds_song_by_lyric_line(self):
+        [hit] = self.search("shoulders sunshine")
+        self.assertEqual(hit["id"], self.songs[0].pk)
+        self.assertIn("[shoulders]", hit["snippet"])
+
+    def test_prefix_title_and_artist(self):
+        self.assertEqual([hit["id"] for hit in self.search("Song 2")], [self.songs[2].pk])
+        self.assertEqual([hit["id"] for hit in self.search("artist 1")], [self.songs[1].pk])
+        self.assertEqual(len(self.search("wind")), 1)
+
+    def test_index_follows_edits_and_deletes(self):
+        store_lyrics(self.songs[1], [(1.0, "Snow on the window")])
+        songs_changed(self.songs[1].pk)
+        catalog_cache.clear()
+        self.assertEqual(self.search("rain"), [])
+
+        pk = self.songs[1].pk
+        self.songs[1].delete()
+        songs_changed(pk)
+        catalog_cache.clear()
+        self.assertEqual(self.search("snow"), [])
+
+    def test_rebuild(self):
+        self.assertEqual(rebuild_index(), 3)
+        self.assertEqual(len(self.search("happy")), 1)
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('"* OR NEAR('), [])
+
+    def test_limit_is_validated(self):
+        url = reverse("song-search")
+        self.assertEqual(len(self.client.get(url, {"q": "song", "limit": -1}).data["results"]), 1)
+        self.assertEqual(len(self.client.get(url, {"q": "song", "limit": 0}).data["results"]), 1)
+        self.assertEqual(self.client.get(url, {"q": "song", "limit": "x"}).status_code, 400)
+
+    def test_migration_indexes_existing_songs(self):
+        migration = import_module("app.migrations.0008_song_search_index")
+        get_backend().clear()
+        self.assertEqual(search_songs("shoulders"), [])
+
+        migration.create_search_index(django_apps, SimpleNamespace(connection=connection))
+        self.assertEqual([hit[0] for hit in search_songs("shoulders")], [self.songs[0].pk])
+
+
+class FacetedBrowsingTests(TestCase):
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+        self.client = APIClient()
+        self.songs = seed_catalog(songs=4, lines_per_song=0)
+        Song.objects.filter(pk__in=[self.songs[0].pk, self.songs[1].pk]).update(genre="rock", duration=90)
+        Song.objects.filter(pk=self.songs[3].pk).update(language="es")
+
+    def ids(self, **params):
+        res = self.client.get(reverse("song-list"), params)
+        return [song["id"] for song in res.data["results"]]
+
+    def test_filters(self):
+        self.assertEqual(self.ids(genre="rock"), [self.songs[0].pk, self.songs[1].pk])
+        self.assertEqual(self.ids(language="es"), [self.songs[3].pk])
+        self.assertEqual(self.ids(artist=self.songs[2].artist_id), [self.songs[2].pk])
+        self.assertEqual(self.ids(duration_min=100, duration_max=200), [self.songs[2].pk, self.songs[3].pk])
+
+    def test_facets_are_computed_once_per_catalog_version(self):
+        res = self.client.get(reverse("song-list"), {"facets": "true"})
+        self.assertEqual(res.data["facets"]["genre"], [
+            {"value": "pop", "count": 2}, {"value": "rock", "count": 2},
+        ])
+        self.assertEqual(res.data["facets"]["language"], [
+            {"value": "en", "count": 3}, {"value": "es", "count": 1},
+        ])
+
+        # A different page of the same catalog version reuses the counts
+        with self.assertNumQueries(1):
+            self.client.get(reverse("song-list"), {"facets": "true", "genre": "pop"})
+
+
+class LyricWindowTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.song = seed_catalog(songs=1, lines_per_song=0)[0]
+        # Out of order on purpose: storage must sort
+        store_lyrics(self.song, [(30.0, "c"), (10.0, "a"), (20.0, "b"), (40.0, "d")])
+
+    def get(self, **params):
+        res = self.client.get(reverse("song-lyrics", args=[self.song.pk]), params)
+        self.assertEqual(res.status_code, 200)
+        return res.data
+
+    def check_both_paths(self, **params):
+        packed = self.get(**params)
+        Song.objects.filter(pk=self.song.pk).update(lyrics_packed=None)
+        from_rows = self.get(**params)
+        self.assertEqual(packed, from_rows)
+        store_lyrics(self.song, [(30.0, "c"), (10.0, "a"), (20.0, "b"), (40.0, "d")])
+        return packed
+
+    def test_window(self):
+        data = self.check_both_paths(**{"from": 15, "to": 35})
+        self.assertEqual([line["text"] for line in data["lyrics"]], ["b", "c"])
+        self.assertEqual(data["index"], 1)
+        self.assertEqual(data["next"], 40.0)
+
+    def test_line_at(self):
+        self.assertEqual(self.check_both_paths(at=25)["line"], {"timestamp": 20.0, "text": "b"})
+        self.assertEqual(self.check_both_paths(at=40)["index"], 3)
+        before = self.check_both_paths(at=5)
+        self.assertIsNone(before["line"])
+        self.assertEqual(before["next"], 10.0)
+
+    def test_rows_are_ordered_by_time(self):
+        self.assertEqual(list(self.song.lyrics.values_list("text", flat=True)), ["a", "b", "c", "d"])
+
+    def test_bad_params(self):
+        res = self.client.get(reverse("song-lyrics", args=[self.song.pk]), {"at": "soon"})
+        self.assertEqual(res.status_code, 400)
+
+    def test_non_finite_params(self):
+        for params in ({"at": "nan"}, {"from": "-inf"}, {"to": "inf"}):
+            res = self.client.get(reverse("song-lyrics", args=[self.song.pk]), params)
+            self.assertEqual(res.status_code, 400, params)
+
+
+class PackedLyricsTests(TestCase):
+
+    def test_round_trip(self):
+        lines = [(0.0, "first"), (12.5, "ünïcödé ✓"), (61.25, "")]
+        self.assertEqual(
+            unpack_lyrics(pack_lyrics(lines)),
+            [{"timestamp": t, "text": text} for t, text in lines],
+        )
+
+    def test_empty(self):
+        self.assertEqual(unpack_lyrics(pack_lyrics([])), [])
+
+    def test_window_of_ascii_and_unicode_lines(self):
+        lines = [(0.0, "plain"), (1.0, "ascii"), (2.0, "ünï"), (3.0, "tail")]
+        blob = pack_lyrics(lines)
+        self.assertEqual(unpack_window(blob, 0.5, 2.5)[1], [{"timestamp": 1.0, "text": "ascii"},
+                                                            {"timestamp": 2.0, "text": "ünï"}])
+        self.assertEqual(unpack_window(blob, 3.0)[1], [{"timestamp": 3.0, "text": "tail"}])
+        self.assertEqual(unpack_window(blob, 9.0)[1], [])
+
+
+class FastSongSerializerTests(TestCase):
+    """FastSongSerializer must render byte for byte like SongSerializer."""
+
+    def setUp(self):
+        self.request = APIRequestFactory().get("/api/songs/")
+        self.song = seed_catalog(songs=1, lines_per_song=5)[0]
+
+    def assertSameOutput(self, song, request=None):
+        context = {"request": request}
+        expected = JSONRenderer().render(SongSerializer(song, context=context).data)
+        self.assertEqual(JSONRenderer().render(FastSongSerializer(song, context=context).data), expected)
+
+    def test_packed_lyrics(self):
+        store_lyrics(self.song, [(0.5, "ünïcödé ✓"), (1.25, "plain"), (2.0, "")])
+        self.assertSameOutput(self.song, self.request)
+        self.assertSameOutput(self.song)
+
+    def test_lyric_rows(self):
+        Song.objects.filter(pk=self.song.pk).update(lyrics_packed=None)
+        song = Song.objects.select_related("artist").get(pk=self.song.pk)
+        with self.assertNumQueries(2):
+            self.assertSameOutput(song, self.request)
+
+        song = Song.objects.select_related("artist").prefetch_related("lyrics").get(pk=self.song.pk)
+        with self.assertNumQueries(0):
+            self.assertSameOutput(song, self.request)
+
+    def test_missing_artist_and_files(self):
+        Song.objects.filter(pk=self.song.pk).update(artist=None, cover_image="", audio_file="songs/audio/a.wav")
+        self.assertSameOutput(Song.objects.get(pk=self.song.pk), self.request)
+
+    def test_many(self):
+        songs = seed_catalog(songs=2, lines_per_song=2)
+        self.assertEqual(JSONRenderer().render(FastSongSerializer(songs, many=True).data),
+                         JSONRenderer().render(SongSerializer(songs, many=True).data))
+
+
+class UploadQueryBudgetTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.admin = User.objects.create_user("admin", password="pw", is_staff=True)
+        self.artist = Artist.objects.create(name="Uploader")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def upload(self, lines):
+        return self.client.post(reverse("song-upload"), {
+            "title": "Upload", "artist": self.artist.pk, "language": "en",
+            "genre": "rock", "duration": 200, "cover_image": make_png(),
+            "audio_file": SimpleUploadedFile("a.mp3", b"ID3"),
+            "lrc_file": make_lrc(lines),
+        }, format="multipart")
+
+    def test_song_upload_query_count_is_constant(self):
+        # artist lookup, savepoint, song insert, job insert, release;
+        # lyrics are parsed by the workers
+        with self.assertNumQueries(5):
+            res = self.upload(lines=5)
+        self.assertEqual(res.status_code, 202)
+
+        with self.assertNumQueries(5):
+            self.upload(lines=50)
+        self.assertEqual(SongLyricLine.objects.count(), 0)
+
+        run_pending()
+        self.assertEqual(SongLyricLine.objects.count(), 55)
+
+
+class UploadJobTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root, JOBS_RETRY_DELAY=0)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        admin = User.objects.create_user("admin", password="pw", is_staff=True)
+        self.artist = Artist.objects.create(name="Queued")
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def upload(self):
+        res = self.client.post(reverse("song-upload"), {
+            "title": "Queued song", "artist": self.artist.pk, "language": "en",
+            "genre": "rock", "duration": 200, "cover_image": make_png(),
+            "audio_file": SimpleUploadedFile("a.mp3", b"ID3"),
+            "lrc_file": make_lrc(3),
+        }, format="multipart")
+        self.assertEqual(res.status_code, 202)
+        return Song.objects.get(pk=res.data["id"]), res
+
+    def test_upload_is_processed_by_workers(self):
+        song, res = self.upload()
+        self.assertEqual(res.data["processing_state"], Song.PENDING)
+        self.assertEqual(res["Location"], reverse("song-processing", args=[song.pk]))
+        self.assertEqual(song.jobs.count(), 3)
+
+        # lyrics, covers, waveform, then the index job queued by the lyrics job
+        self.assertEqual(run_pending(), 4)
+        song.refresh_from_db()
+        self.assertEqual(song.processing_state, Song.READY)
+        self.assertEqual(len(unpack_lyrics(song.lyrics_packed)), 3)
+        self.assertEqual([hit[0] for hit in search_songs("line")], [song.pk])
+
+        status = self.client.get(res["Location"]).data
+        self.assertEqual(status["processing_state"], Song.READY)
+        self.assertEqual({job["state"] for job in status["jobs"]}, {Job.DONE})
+
+    def test_detail_cached_while_pending_is_replaced(self):
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+        song, _ = self.upload()
+        url = reverse("song-detail", args=[song.pk])
+        pending = self.client.get(url)
+        self.assertEqual(pending.data["lyrics"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            run_pending()
+        res = self.client.get(url)
+        self.assertEqual(len(res.data["lyrics"]), 3)
+        self.assertNotEqual(res["ETag"], pending["ETag"])
+
+    def test_failed_job_is_retried_then_fails_song(self):
+        song, _ = self.upload()
+        Job.objects.filter(song=song).exclude(kind="lyrics").delete()
+        Job.objects.filter(song=song).update(max_attempts=2)
+
+        with patch.dict(HANDLERS, lyrics=lambda song: 1 / 0), self.assertLogs("app.jobs", "WARNING"):
+            run_pending()
+        job = song.jobs.get()
+        self.assertEqual((job.state, job.attempts), (Job.FAILED, 2))
+        self.assertIn("ZeroDivisionError", job.last_error)
+        song.refresh_from_db()
+        self.assertEqual(song.processing_state, Song.FAILED)
+
+    def test_retry_backs_off(self):
+        song, _ = self.upload()
+        with override_settings(JOBS_RETRY_DELAY=60), patch.dict(HANDLERS, lyrics=lambda song: 1 / 0), \
+                self.assertLogs("app.jobs", "WARNING"):
+            run_pending()
+        job = song.jobs.get(kind="lyrics")
+        self.assertEqual((job.state, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=25))
+        song.refresh_from_db()
+        self.assertEqual(song.processing_state, Song.PROCESSING)
+
+    def test_claim_is_exclusive_and_stale_jobs_are_requeued(self):
+        song, _ = self.upload()
+        claimed = [claim(worker) for worker in "abc"]
+        self.assertEqual(len({job.pk for job in claimed}), 3)
+        self.assertIsNone(claim("d"))
+        first = claimed[0]
+
+        Job.objects.filter(pk=first.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(claim("d").pk, first.pk)
+
+
+class ResumableUploadTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.admin = User.objects.create_user("admin", password="pw", is_staff=True)
+        self.artist = Artist.objects.create(name="Resumer")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.audio = bytes(range(256)) * 40
+
+    def create(self, **extra):
+        res = self.client.post(reverse("upload-session-create"),
+                               {"filename": "master.flac", "size": len(self.audio), **extra}, format="json")
+        self.assertEqual(res.status_code, 201)
+        return res.data["id"]
+
+    def send(self, session_id, offset, data, **headers):
+        return self.client.generic(
+            "PATCH", reverse("upload-session", args=[session_id]), data,
+            content_type="application/offset+octet-stream", HTTP_UPLOAD_OFFSET=str(offset), **headers,
+        )
+
+    def attach(self, session_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse("song-upload"), {
+                "title": "Master", "artist": self.artist.pk, "language": "en",
+                "genre": "rock", "duration": 200, "cover_image": make_png(),
+                "audio_upload": session_id, "lrc_file": make_lrc(3),
+            }, format="multipart")
+
+    @override_settings(JWT_STATELESS_USER=True)
+    def test_upload_with_token_claims_user(self):
+        User.objects.create_user("stateless", password="pw-12345", role="admin", is_staff=True)
+        self.client = APIClient()
+        res = self.client.post(reverse("token_obtain_pair"), {"username": "stateless", "password": "pw-12345"})
+        self.assertEqual(res.status_code, 200)
+
+        session_id = self.create()
+        self.assertEqual(self.send(session_id, 0, self.audio).status_code, 204)
+        self.assertEqual(self.client.get(reverse("upload-session", args=[session_id])).data["complete"], True)
+        self.assertEqual(self.attach(session_id).status_code, 202)
+
+    def test_chunks_out_of_order_are_assembled(self):
+        session_id = self.create(sha256=hashlib.sha256(self.audio).hexdigest())
+        chunks = [(offset, self.audio[offset:offset + 4000]) for offset in range(0, len(self.audio), 4000)]
+
+        for offset, data in reversed(chunks[1:]):
+            res = self.send(session_id, offset, data)
+            self.assertEqual(res.status_code, 204)
+            self.assertEqual(res["Upload-Offset"], "0")
+
+        progress = self.client.get(reverse("upload-session", args=[session_id])).data
+        self.assertEqual(progress["received"], [[4000, len(self.audio)]])
+        self.assertEqual(self.attach(session_id).status_code, 400)
+
+        res = self.send(session_id, 0, chunks[0][1])
+        self.assertEqual(res["Upload-Offset"], str(len(self.audio)))
+
+        res = self.attach(session_id)
+        self.assertEqual(res.status_code, 202)
+        song = Song.objects.get(pk=res.data["id"])
+        with song.audio_file.open("rb") as audio:
+            self.assertEqual(audio.read(), self.audio)
+        self.assertTrue(song.audio_file.name.endswith(hashlib.sha256(self.audio).hexdigest() + ".flac"))
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_failed_attach_keeps_the_upload(self):
+        session_id = self.create()
+        self.send(session_id, 0, self.audio)
+        path = part_path(UploadSession.objects.get())
+
+        with patch("app.jobs.enqueue_upload", side_effect=RuntimeError("queue down")), \
+                self.assertRaises(RuntimeError):
+            self.attach(session_id)
+        self.assertFalse(Song.objects.exists())
+        self.assertTrue(UploadSession.objects.filter(pk=session_id).exists())
+        self.assertEqual(os.path.getsize(path), len(self.audio))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, "songs", "audio")))
+
+        self.assertEqual(self.attach(session_id).status_code, 202)
+        self.assertEqual(Song.objects.get().audio_file.read(), self.audio)
+        self.assertFalse(os.path.exists(path))
+
+    def test_sequential_chunks_hash_incrementally(self):
+        session_id = self.create()
+        for offset in range(0, len(self.audio), 1000):
+            self.send(session_id, offset, self.audio[offset:offset + 1000])
+        self.assertEqual(upload_hashers[UUID(session_id)].offset, len(self.audio))
+
+        self.assertEqual(self.attach(session_id).status_code, 202)
+        self.assertNotIn(UUID(session_id), upload_hashers)
+        self.assertEqual(Song.objects.get().audio_file.read(), self.audio)
+
+    def test_chunk_checksum_is_verified(self):
+        session_id = self.create()
+        data = self.audio[:100]
+        bad = base64.b64encode(hashlib.sha256(b"other").digest()).decode()
+        res = self.send(session_id, 0, data, HTTP_UPLOAD_CHECKSUM=f"sha256 {bad}")
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(UploadChunk.objects.exists())
+
+        good = base64.b64encode(hashlib.sha256(data).digest()).decode()
+        res = self.send(session_id, 0, data, HTTP_UPLOAD_CHECKSUM=f"sha256 {good}")
+        self.assertEqual(res["Upload-Offset"], "100")
+
+    def test_rejects_chunks_past_the_end_and_other_owners(self):
+        session_id = self.create()
+        self.assertEqual(self.send(session_id, len(self.audio) - 10, b"x" * 20).status_code, 400)
+
+        other = User.objects.create_user("other", password="pw", is_staff=True)
+        self.client.force_authenticate(other)
+        self.assertEqual(self.send(session_id, 0, b"x").status_code, 404)
+
+    def test_prune_removes_expired_sessions(self):
+        session_id = self.create()
+        path = part_path(UploadSession.objects.get())
+        self.assertEqual(os.path.getsize(path), len(self.audio))
+
+        UploadSession.objects.update(created_at=timezone.now() - timedelta(days=2))
+        call_command("prune_uploads", stdout=io.StringIO())
+        self.assertFalse(UploadSession.objects.filter(pk=session_id).exists())
+        self.assertFalse(os.path.exists(path))
+
+
+class WaveformTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+        admin = User.objects.create_user("admin", password="pw", is_staff=True)
+        self.artist = Artist.objects.create(name="Waves")
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def upload(self, audio, **extra):
+        return self.client.post(reverse("song-upload"), {
+            "title": "Waves", "artist": self.artist.pk, "language": "en", "genre": "ambient",
+            "cover_image": make_png(), "audio_file": audio, "lrc_file": make_lrc(2), **extra,
+        }, format="multipart")
+
+    def test_admin_audio_change_queues_waveform(self):
+        song = seed_catalog(songs=1, lines_per_song=0)[0]
+        request = RequestFactory().post("/")
+        request.user = User.objects.get(username="admin")
+        song_admin = SongAdmin(Song, admin_site)
+
+        song_admin.save_model(request, song, SimpleNamespace(changed_data=["title"]), change=True)
+        self.assertFalse(Job.objects.filter(kind="waveform").exists())
+        song.audio_file = "songs/audio/b.wav"
+        song_admin.save_model(request, song, SimpleNamespace(changed_data=["audio_file"]), change=True)
+        self.assertEqual(Job.objects.filter(kind="waveform", song=song).count(), 1)
+
+    def test_peaks_at_every_level(self):
+        rate = 8000
+        samples = np.zeros(rate, np.int16)
+        samples[300] = 16384     # second finest peak
+        samples[5000] = -32768   # second coarsest peak
+        path = os.path.join(self.media_root, "mono.wav")
+        with wave.open(path, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(rate)
+            out.writeframes(samples.tobytes())
+
+        blob = pack_peaks(*compute_peaks(path))
+        header = read_header(blob)
+        self.assertEqual((header["frames"], header["duration"]), (rate, 1.0))
+        self.assertEqual(header["levels"], [(256, 32), (1024, 8), (4096, 2)])
+
+        peaks = unpack_peaks(blob)
+        self.assertEqual(peaks[256][1].tolist(), [0, 64])
+        self.assertEqual(peaks[256][0].tolist(), [0, 0])
+        self.assertEqual(peaks[4096].tolist(), [[0, 64], [-127, 0]])
+
+    def test_upload_derives_duration_and_serves_peaks(self):
+        audio = SimpleUploadedFile("song.wav", synthetic_wav(3), content_type="audio/wav")
+        res = self.upload(audio)
+        self.assertEqual(res.status_code, 202)
+        run_pending()
+
+        song = Song.objects.get(pk=res.data["id"])
+        self.assertEqual(song.duration, 3)
+
+        url = self.client.get(reverse("song-detail", args=[song.pk])).data["waveform"]
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("immutable", res["Cache-Control"])
+        self.assertEqual(read_header(b"".join(res.streaming_content))["duration"], 3.0)
+
+        # Unversioned or outdated URLs may outlive the audio
+        for version in ("", "?v=0123456789ab"):
+            res = self.client.get(reverse("song-waveform", args=[song.pk]) + version)
+            self.assertEqual(res["Cache-Control"], "no-cache")
+            res.close()
+        self.assertEqual(named_locks, {})
+
+    def test_duration_required_for_other_formats(self):
+        res = self.upload(SimpleUploadedFile("song.mp3", b"ID3"))
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("duration", res.data)
+
+        res = self.upload(SimpleUploadedFile("song.mp3", b"ID3"), duration=120)
+        self.assertEqual(res.status_code, 202)
+        run_pending()
+        song = Song.objects.get(pk=res.data["id"])
+        self.assertEqual(song.duration, 120)
+        self.assertIsNone(self.client.get(reverse("song-detail", args=[song.pk])).data["waveform"])
+        self.assertEqual(self.client.get(reverse("song-waveform", args=[song.pk])).status_code, 404)
+
+
+class LrcParserTests(TestCase):
+
+    def parse(self, data, chunk_size=7):
+        return list(LrcParser(io.BytesIO(data), chunk_size=chunk_size))
+
+    def test_matches_simple_lines(self):
+        self.assertEqual(parse_lrc("[ar:Someone]\n[00:01.50]Hello\n[01:02]World\n[00:03.00]\n"), [
+            {"timestamp": 1.5, "text": "Hello"},
+            {"timestamp": 62.0, "text": "World"},
+        ])
+
+    def test_multiple_timestamps_sorted(self):
+        lines = self.parse(b"[00:12.10][01:40.00]chorus\n[00:20.00]verse\n")
+        self.assertEqual([(l.timestamp, l.text) for l in lines],
+                         [(12.1, "chorus"), (20.0, "verse"), (100.0, "chorus")])
+
+    def test_offset_and_length(self):
+        parser = LrcParser(io.BytesIO(b"[length: 03:30]\n[offset:+500]\n[00:10.00]late\n"))
+        self.assertEqual([l.timestamp for l in parser], [9.5])
+        self.assertEqual(parser.length, 210.0)
+
+    def test_word_timings(self):
+        [line] = self.parse(b"[00:01.00]<00:01.00>Hello <00:01.50>big <00:02.00>world\n")
+        self.assertEqual(line.text, "Hello big world")
+        self.assertEqual(line.words, ((1.0, "Hello"), (1.5, "big"), (2.0, "world")))
+
+    def test_encodings(self):
+        text = "[00:01.00]Grüße ✓\r\n[00:02.00]zwei\r\n"
+        for data in (text.encode("utf-8-sig"), text.encode("utf-16"), text.encode("utf-8")):
+            lines = self.parse(data)
+            self.assertEqual([l.text for l in lines], ["Grüße ✓", "zwei"])
+
+        [line] = self.parse("[00:01.00]café\n".encode("cp1252"), chunk_size=1024)
+        self.assertEqual(line.text, "café")
+
+
+class AsyncViewTests(TestCase):
+    """The async catalog views must answer byte for byte like the DRF ones."""
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+        self.factory = RequestFactory()
+        self.songs = seed_catalog(songs=5, lines_per_song=3)
+
+    def both(self, sync_view, async_view, path, **kwargs):
+        sync_res = sync_view(self.factory.get(path), **kwargs)
+        sync_res.render()
+        catalog_cache.clear()
+        async_res = async_to_sync(async_view)(self.factory.get(path), **kwargs)
+        catalog_cache.clear()
+        return sync_res, async_res
+
+    def assertSame(self, sync_res, async_res):
+        self.assertEqual(async_res.status_code, sync_res.status_code)
+        self.assertEqual(async_res.content, sync_res.content)
+        self.assertEqual(async_res.get("ETag"), sync_res.get("ETag"))
+
+    def test_list_pages_match(self):
+        path = reverse("song-list") + "?page_size=2"
+        sync_res, async_res = self.both(SongListView.as_view(), async_views.song_list, path)
+        self.assertSame(sync_res, async_res)
+
+        next_url = json.loads(async_res.content)["next"]
+        sync_res, async_res = self.both(SongListView.as_view(), async_views.song_list, next_url)
+        self.assertSame(sync_res, async_res)
+        self.assertEqual([song["id"] for song in json.loads(async_res.content)["results"]],
+                         [self.songs[2].pk, self.songs[3].pk])
+
+        previous_url = json.loads(async_res.content)["previous"]
+        self.assertSame(*self.both(SongListView.as_view(), async_views.song_list, previous_url))
+
+    def test_list_filters_and_facets_match(self):
+        path = reverse("song-list") + f"?artist={self.songs[1].artist_id}&facets=true"
+        self.assertSame(*self.both(SongListView.as_view(), async_views.song_list, path))
+        path = reverse("song-list") + "?artist=9999"
+        sync_res, async_res = self.both(SongListView.as_view(), async_views.song_list, path)
+        self.assertEqual(async_res.status_code, 400)
+        self.assertSame(sync_res, async_res)
+
+    def test_detail_matches(self):
+        song = self.songs[0]
+        path = reverse("song-detail", args=[song.pk])
+        self.assertSame(*self.both(SongDetailView.as_view(), async_views.song_detail, path, pk=song.pk))
+
+        Song.objects.filter(pk=song.pk).update(lyrics_packed=None)
+        self.assertSame(*self.both(SongDetailView.as_view(), async_views.song_detail, path, pk=song.pk))
+
+        path = reverse("song-detail", args=[9999])
+        self.assertSame(*self.both(SongDetailView.as_view(), async_views.song_detail, path, pk=9999))
+
+    def test_detail_served_from_cache(self):
+        song = self.songs[0]
+        request = self.factory.get(reverse("song-detail", args=[song.pk]))
+        etag = async_to_sync(async_views.song_detail)(request, pk=song.pk)["ETag"]
+        with self.assertNumQueries(0):
+            res = async_to_sync(async_views.song_detail)(request, pk=song.pk)
+        self.assertEqual(res["ETag"], etag)
+
+
+class WireFormatTests(TestCase):
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+        compressed_bodies.clear()
+        self.client = APIClient()
+        self.song = seed_catalog(songs=3, lines_per_song=40)[0]
+        self.url = reverse("song-detail", args=[self.song.pk])
+
+    def test_columnar_delta_encodes_timestamps(self):
+        self.assertEqual(columnar({"lyrics": [{"timestamp": 1.5, "text": "a"}, {"timestamp": 2.25, "text": "b"}]}),
+                         {"lyrics": {"timestamp_delta_ms": [1500, 750], "text": ["a", "b"]}})
+        self.assertEqual(columnar({"results": [], "tags": ["x", {"y": 1}]}), {"results": [], "tags": ["x", {"y": 1}]})
+
+    def test_detail_negotiates_columnar(self):
+        plain = self.client.get(self.url)
+        res = self.client.get(self.url, HTTP_ACCEPT=ColumnarJSONRenderer.media_type)
+        self.assertEqual(res["Content-Type"], ColumnarJSONRenderer.media_type)
+        self.assertIn("Accept", res["Vary"])
+        self.assertLess(len(res.content), len(plain.content))
+
+        body = json.loads(res.content)
+        lyrics = plain.json()["lyrics"]
+        self.assertEqual(body["lyrics"]["text"], [line["text"] for line in lyrics])
+        self.assertEqual(sum(body["lyrics"]["timestamp_delta_ms"]), round(lyrics[-1]["timestamp"] * 1000))
+
+        # Each representation has its own validator
+        self.assertNotEqual(res["ETag"], plain["ETag"])
+        again = self.client.get(self.url, HTTP_ACCEPT=ColumnarJSONRenderer.media_type, HTTP_IF_NONE_MATCH=res["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=res["ETag"]).status_code, 200)
+
+    def test_browsable_api_has_its_own_etag(self):
+        plain = self.client.get(self.url)
+        html = self.client.get(self.url, HTTP_ACCEPT="text/html")
+        self.assertTrue(html["Content-Type"].startswith("text/html"))
+        self.assertNotEqual(html["ETag"], plain["ETag"])
+        self.assertEqual(self.client.get(self.url, HTTP_ACCEPT="text/html",
+                                         HTTP_IF_NONE_MATCH=plain["ETag"]).status_code, 200)
+
+    def test_async_detail_matches_columnar(self):
+        request = RequestFactory().get(self.url, HTTP_ACCEPT=ColumnarJSONRenderer.media_type)
+        async_res = async_to_sync(async_views.song_detail)(request, pk=self.song.pk)
+        catalog_cache.clear()
+        sync_res = self.client.get(self.url, HTTP_ACCEPT=ColumnarJSONRenderer.media_type)
+        self.assertEqual(async_res.content, sync_res.content)
+        self.assertEqual(async_res["ETag"], sync_res["ETag"])
+
+    def test_async_detail_miss_checks_the_representation_etag(self):
+        plain = async_to_sync(async_views.song_detail)(RequestFactory().get(self.url), pk=self.song.pk)
+        catalog_cache.clear()
+        request = RequestFactory().get(self.url, HTTP_ACCEPT=ColumnarJSONRenderer.media_type,
+                                       HTTP_IF_NONE_MATCH=plain["ETag"])
+        res = async_to_sync(async_views.song_detail)(request, pk=self.song.pk)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Content-Type"], ColumnarJSONRenderer.media_type)
+
+    @skipUnless(msgpack, "msgpack is not installed")
+    def test_msgpack(self):
+        res = self.client.get(self.url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(msgpack.unpackb(res.content), self.client.get(self.url).json())
+
+    def test_gzip_is_cached_by_etag(self):
+        plain = self.client.get(self.url)
+        res = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", res["Vary"])
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+        self.assertEqual(res["ETag"], f"W/{plain['ETag']}")
+
+        hits = compressed_bodies.stats()["hits"]
+        again = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(again.content, res.content)
+        self.assertEqual(compressed_bodies.stats()["hits"], hits + 1)
+
+        revalidate = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=res["ETag"])
+        self.assertEqual(revalidate.status_code, 304)
+
+    def test_compressed_html_is_not_shared_between_users(self):
+        pages = {}
+        for name in ("alice", "bob"):
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user(name, password="pw"))
+            res = client.get(self.url, HTTP_ACCEPT="text/html", HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(res["Content-Encoding"], "gzip")
+            pages[name] = gzip.decompress(res.content).decode()
+        self.assertIn("bob", pages["bob"])
+        self.assertNotIn("alice", pages["bob"])
+        self.assertEqual(compressed_bodies.stats()["hits"], 0)
+
+    def test_small_or_refused_bodies_are_not_compressed(self):
+        res = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip;q=0, identity")
+        self.assertFalse(res.has_header("Content-Encoding"))
+        with override_settings(COMPRESSION_MIN_BYTES=10 ** 6):
+            res = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(res.has_header("Content-Encoding"))
+
+
+class DatabaseProfileTests(TestCase):
+
+    def test_unset_pragmas_are_skipped(self):
+        self.assertEqual(
+            pragma_statements({"journal_mode": "WAL", "synchronous": "", "mmap_size": 0, "busy_timeout": 5000}),
+            ["PRAGMA journal_mode=WAL", "PRAGMA busy_timeout=5000"],
+        )
+
+    @override_settings(SQLITE_PRAGMAS={"busy_timeout": 1234, "cache_size": -4000})
+    def test_pragmas_applied_to_connection(self):
+        apply_sqlite_pragmas(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute("PRAGMA busy_timeout").fetchone()[0], 1234)
+            self.assertEqual(cursor.execute("PRAGMA cache_size").fetchone()[0], -4000)
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaRouterTests(TestCase):
+    """Routing decisions only; the test database has no replica aliases."""
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def run_request(self, request, view):
+        """Run `view` inside ReplicaPinMiddleware; returns (view result, response)."""
+        result = []
+
+        def get_response(request):
+            result.append(view())
+            return HttpResponse()
+
+        response = ReplicaPinMiddleware(get_response)(request)
+        return result[0], response
+
+    def test_catalog_reads_go_to_replica(self):
+        with patch.object(connection, "in_atomic_block", False):
+            self.assertEqual(self.router.db_for_read(Song), "replica1")
+            self.assertEqual(self.router.db_for_read(SongLyricLine), "replica1")
+        self.assertEqual(self.router.db_for_read(User), "default")
+        self.assertEqual(self.router.db_for_write(Song), "default")
+
+    def test_reads_in_transaction_use_primary(self):
+        # TestCase wraps every test in an atomic block
+        self.assertTrue(connection.in_atomic_block)
+        self.assertEqual(self.router.db_for_read(Song), "default")
+
+    def test_request_reads_own_writes(self):
+        def write_then_read():
+            self.router.db_for_write(Song)
+            return self.router.db_for_read(Song)
+
+        with patch.object(connection, "in_atomic_block", False):
+            db, response = self.run_request(self.factory.get("/"), write_then_read)
+        self.assertEqual(db, "default")
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 5)
+
+    def test_pin_cookie_and_unsafe_methods_use_primary(self):
+        read = lambda: self.router.db_for_read(Song)  # noqa: E731
+        with patch.object(connection, "in_atomic_block", False):
+            self.assertEqual(self.run_request(self.factory.get("/"), read)[0], "replica1")
+            request = self.factory.get("/")
+            request.COOKIES[PIN_COOKIE] = "1"
+            self.assertEqual(self.run_request(request, read)[0], "default")
+            db, response = self.run_request(self.factory.post("/"), read)
+            self.assertEqual(db, "default")
+            self.assertNotIn(PIN_COOKIE, response.cookies)
+            # Outside a request the pin is gone again
+            self.assertEqual(read(), "replica1")
+
+    def test_blob_reference_count_reads_the_primary(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        song = seed_catalog(songs=1, lines_per_song=0)[0]
+        with self.captureOnCommitCallbacks() as callbacks:
+            release_unreferenced([song.audio_file.name])
+        # After commit, outside any transaction; "replica1" doesn't resolve here
+        with override_settings(MEDIA_ROOT=media_root), patch.object(connection, "in_atomic_block", False), \
+                patch.object(media_storage, "delete") as delete:
+            callbacks[0]()
+        delete.assert_not_called()
+
+
+class BenchmarkToolTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_generate_catalog_imports_songs_once(self):
+        options = {"artists": 2, "songs": 4, "lines": 6, "audio_seconds": 0.1, "workers": 1,
+                   "stdout": io.StringIO()}
+        call_command("generate_catalog", **options)
+        call_command("generate_catalog", **options)
+
+        self.assertEqual(Song.objects.count(), 4)
+        self.assertLessEqual(Artist.objects.count(), 2)
+        song = Song.objects.first()
+        self.assertEqual(len(unpack_lyrics(song.lyrics_packed)), 6)
+        self.assertTrue(song.audio_file.name.endswith(".wav"))
+        self.assertTrue(song.cover_image)
+
+    def test_bench_micro_json(self):
+        out = io.StringIO()
+        call_command("bench_micro", lines="10", repeat=1, only=["unpack_lyrics"], json=True, stdout=out)
+        results = json.loads(out.getvalue())["results"]
+        self.assertEqual([(r["benchmark"], r["lines"]) for r in results], [("unpack_lyrics", 10)])
+        self.assertGreater(results[0]["ops_per_second"], 0)
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN="", METRICS_SLOW_REQUEST_MS=60000)
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.addCleanup(catalog_cache.clear)
+        registry.clear()
+        self.client = APIClient()
+        self.song = seed_catalog(songs=3, lines_per_song=3)[0]
+
+    def test_server_timing_header(self):
+        res = self.client.get(reverse("song-detail", args=[self.song.pk]))
+        timing = res["Server-Timing"]
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn("serialize;dur=", timing)
+        self.assertIn("total;dur=", timing)
+
+    def test_metrics_endpoint(self):
+        hits = catalog_cache.stats()["hits"]
+        self.client.get(reverse("song-list"))
+        self.client.get(reverse("song-list"))
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('cadence_http_requests_total{view="song-list",method="GET",status="200"} 2', body)
+        self.assertIn('cadence_db_queries_bucket{view="song-list",le="+Inf"} 2', body)
+        self.assertIn('cadence_span_duration_seconds_count{view="song-list",span="serialize"} 1', body)
+        self.assertIn(f"cadence_catalog_cache_hits_total {hits + 1}", body)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+        res = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_sql(self):
+        with self.assertLogs("app.metrics", "WARNING") as logs:
+            self.client.get(reverse("song-detail", args=[self.song.pk]))
+        self.assertIn("SELECT", logs.output[0])
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        res = self.client.get(reverse("song-list"))
+        self.assertNotIn("Server-Timing", res)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
@@ -0,0 +1,240 @@
+import base64
+import binascii
+import hashlib
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import UploadChunk, UploadSession
+from .storage import media_storage
+
+# Bytes read from the request / file per step; bounds memory per chunk
+BLOCK_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """
+    A chunk or finalize request the session can't accept (HTTP 409/400).
+    """
+
+
+def part_path(session):
+    """
+    The session's part file, under the storage's .incoming/ so the finished
+    file can be moved into place without a copy.
+    """
+    return os.path.join(media_storage.location, ".incoming", "uploads", f"{session.pk}.part")
+
+
+def create_session(owner_id, filename, size, sha256=""):
+    # By id: request.user may be a token-claims user (JWT_STATELESS_USER)
+    if size > settings.UPLOAD_MAX_BYTES:
+        raise UploadError(f"Uploads are limited to {settings.UPLOAD_MAX_BYTES} bytes")
+
+    session = UploadSession.objects.create(owner_id=owner_id, filename=filename, size=size, sha256=sha256.lower())
+    path = part_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Sparse file of the final size: chunks are written in place, in any order
+    with open(path, "wb") as part:
+        part.truncate(size)
+    return session
+
+
+def parse_checksum(header):
+    """
+    tus-style "Upload-Checksum: sha256 <base64 digest>" -> hex digest or None.
+    """
+    if not header:
+        return None
+    algorithm, _, value = header.partition(" ")
+    if algorithm.lower() != "sha256":
+        raise UploadError("Only sha256 checksums are supported")
+    try:
+        return base64.b64decode(value, validate=True).hex()
+    except binascii.Error:
+        raise UploadError("Malformed Upload-Checksum")
+
+
+def write_chunk(session, offset, length, stream, checksum=None):
+    """
+    Copy `length` bytes from `stream` to the part file at `offset` with
+    pwrite, so concurrent requests for other ranges of the same session
+    never contend. A chunk re-sent at the same offset replaces the first.
+    """
+    if length <= 0 or length > settings.UPLOAD_CHUNK_MAX_BYTES:
+        raise UploadError(f"Chunks must be 1..{settings.UPLOAD_CHUNK_MAX_BYTES} bytes")
+    if offset + length > session.size:
+        raise UploadError("Chunk extends past the end of the upload")
+
+    digest = hashlib.sha256()
+    hasher = _prefix_hasher(session, offset)
+    written = 0
+    accepted = False
+    try:
+        fd = os.open(part_path(session), os.O_WRONLY)
+        try:
+            while written < length:
+                block = stream.read(min(BLOCK_SIZE, length - written))
+                if not block:
+                    raise UploadError(f"Chunk ended after {written} of {length} bytes")
+                os.pwrite(fd, block, offset + written)
+                digest.update(block)
+                if hasher:
+                    hasher.update(block)
+                written += len(block)
+        finally:
+            os.close(fd)
+
+        hexdigest = digest.hexdigest()
+        if checksum is not None and checksum != hexdigest:
+            raise UploadError("Chunk checksum mismatch")
+        accepted = True
+    finally:
+        if hasher:
+            hasher.release(accepted)
+
+    try:
+        with transaction.atomic():
+            UploadChunk.objects.update_or_create(
+                session=session, offset=offset, defaults={"length": length, "sha256": hexdigest},
+            )
+    except IntegrityError:
+        # A concurrent retry of the same chunk recorded it first
+        pass
+    return hexdigest
+
+
+def received_ranges(session):
+    """
+    Merged [start, end) byte ranges received so far.
+    """
+    ranges = []
+    for offset, length in session.chunks.order_by("offset").values_list("offset", "length"):
+        if ranges and offset <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], offset + length)
+        else:
+            ranges.append([offset, offset + length])
+    return ranges
+
+
+def upload_offset(ranges):
+    """
+    Length of the contiguous prefix received (tus Upload-Offset).
+    """
+    return ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+
+
+def finish(session, name):
+    """
+    Check that every byte arrived, hash the file and delete the session.
+    Returns the blob name the file gets in media storage under `name`'s
+    upload_to; it is moved there when the current transaction commits,
+    so a rollback leaves the session and its part file as they were.
+    """
+    if upload_offset(received_ranges(session)) < session.size:
+        raise UploadError("Upload is incomplete")
+
+    path = part_path(session)
+    try:
+        hexdigest = _file_digest(session, path)
+    except FileNotFoundError:
+        raise UploadError("Upload was already attached or discarded")
+    if session.sha256 and session.sha256 != hexdigest:
+        raise UploadError("Upload checksum mismatch")
+
+    # Also the lock: a concurrent finish of the same session deletes nothing
+    deleted, _ = UploadSession.objects.filter(pk=session.pk).delete()
+    if not deleted:
+        raise UploadError("Upload was already attached or discarded")
+    # Runs once the row referencing the blob has committed: no lease needed
+    transaction.on_commit(lambda: media_storage.adopt(path, name, hexdigest, lease=False))
+    return media_storage.blob_name(name, hexdigest)
+
+
+def discard(session):
+    _forget_hasher(session.pk)
+    try:
+        os.unlink(part_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def expired_sessions():
+    return UploadSession.objects.filter(
+        created_at__lt=timezone.now() - timedelta(seconds=settings.UPLOAD_SESSION_TTL),
+    )
+
+
+# Incremental whole-file hashing. Chunks that extend the hashed prefix
+# (the usual sequential client) feed a per-session sha256 as they are
+# written, so finalize only reads what arrived out of order. The hasher
+# lives in this process; finalize on another worker rereads the file.
+
+class _PrefixHasher:
+
+    def __init__(self):
+        self.digest = hashlib.sha256()
+        self.offset = 0
+        self.lock = threading.Lock()
+        self.busy = False
+        self.broken = False
+
+    def update(self, block):
+        self.digest.update(block)
+        self.offset += len(block)
+
+    def release(self, accepted):
+        with self.lock:
+            self.busy = False
+            if not accepted:
+                # The digest took bytes of a chunk that was rejected
+                self.broken = True
+
+
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def _prefix_hasher(session, offset):
+    """
+    The session's hasher if this chunk starts exactly where it stopped
+    (claimed until release()), else None.
+    """
+    with _hashers_lock:
+        hasher = _hashers.get(session.pk)
+        if hasher is None and offset == 0:
+            hasher = _hashers[session.pk] = _PrefixHasher()
+    if hasher is None:
+        return None
+    with hasher.lock:
+        if offset < hasher.offset:
+            # Rewrites bytes already hashed; only a full reread is safe now
+            hasher.broken = True
+        if hasher.busy or hasher.broken or hasher.offset != offset:
+            return None
+        hasher.busy = True
+    return hasher
+
+
+def _forget_hasher(session_id):
+    with _hashers_lock:
+        return _hashers.pop(session_id, None)
+
+
+def _file_digest(session, path):
+    hasher = _forget_hasher(session.pk)
+    if hasher is not None and not hasher.busy and not hasher.broken:
+        digest, position = hasher.digest, hasher.offset
+    else:
+        digest, position = hashlib.sha256(), 0
+
+    with open(path, "rb") as part:
+        part.seek(position)
+        while block := part.read(BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
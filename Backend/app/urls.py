@@ -1,8 +1,37 @@
+from django.conf import settings
 from django.urls import path
-from .views import SongUploadView, SongListView, SongDetailView
+from . import async_views
+from .views import (
+    SongUploadView,
+    SongProcessingView,
+    SongListView,
+    SongDetailView,
+    SongSearchView,
+    SongLyricsView,
+    SongAudioView,
+    SongCoverView,
+    SongWaveformView,
+    SongCacheStatsView,
+    UploadSessionCreateView,
+    UploadSessionView,
+)
+
+if settings.ASYNC_VIEWS:
+    song_list, song_detail = async_views.song_list, async_views.song_detail
+else:
+    song_list, song_detail = SongListView.as_view(), SongDetailView.as_view()
 
 urlpatterns = [
     path("songs/upload/", SongUploadView.as_view(), name="song-upload"),
-    path("songs/", SongListView.as_view(), name="song-list"),
-    path("songs/<int:pk>/", SongDetailView.as_view(), name="song-detail"),
+    path("songs/uploads/", UploadSessionCreateView.as_view(), name="upload-session-create"),
+    path("songs/uploads/<uuid:pk>/", UploadSessionView.as_view(), name="upload-session"),
+    path("songs/", song_list, name="song-list"),
+    path("songs/search/", SongSearchView.as_view(), name="song-search"),
+    path("songs/<int:pk>/", song_detail, name="song-detail"),
+    path("songs/<int:pk>/processing/", SongProcessingView.as_view(), name="song-processing"),
+    path("songs/<int:pk>/lyrics/", SongLyricsView.as_view(), name="song-lyrics"),
+    path("songs/<int:pk>/audio/", SongAudioView.as_view(), name="song-audio"),
+    path("songs/<int:pk>/cover/<int:size>.<slug:fmt>", SongCoverView.as_view(), name="song-cover"),
+    path("songs/<int:pk>/waveform/", SongWaveformView.as_view(), name="song-waveform"),
+    path("songs/cache-stats/", SongCacheStatsView.as_view(), name="song-cache-stats"),
 ]
@@ -1,30 +1,210 @@
+import codecs
 import re
+from collections import namedtuple
+from operator import itemgetter
 
-def parse_lrc(lrc_text: str):
+CHUNK_SIZE = 64 * 1024
+
+# Fast path: one leading time tag, rest of the line is text
+LINE = re.compile(r"\[(\d+):(\d+(?:[.:]\d+)?)\](.*)")
+# [mm:ss] / [mm:ss.xx] / [mm:ss.xxx] (some editors write [mm:ss:xx])
+TIME_TAG = re.compile(r"\[(\d+):(\d+)(?:[.:](\d+))?\]")
+# [offset:+/-ms], [length:mm:ss]
+META_TAG = re.compile(r"^\[(offset|length):\s*([^\]]*)\]\s*$", re.IGNORECASE)
+# Enhanced LRC word timing: <mm:ss.xx>
+WORD_TAG = re.compile(r"<(\d+):(\d+)(?:[.:](\d+))?>")
+
+BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+# timestamp in seconds, line text, ((word_timestamp, word), ...) for enhanced LRC
+LyricLine = namedtuple("LyricLine", ["timestamp", "text", "words"])
+
+
+def _seconds(minutes, seconds, fraction):
+    if fraction:
+        return int(minutes) * 60 + float(f"{seconds}.{fraction}")
+    return int(minutes) * 60 + float(seconds)
+
+
+def detect_encoding(head, fallback="cp1252"):
     """
-    Parse LRC files with or without milliseconds.
-    Returns list of {timestamp_in_seconds, text}
+    Guess the encoding of an LRC file from its first bytes.
+    Returns (encoding, bom_length).
+    """
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding, len(bom)
+
+    # UTF-16 without a BOM: ASCII tags leave every other byte zero
+    if len(head) >= 4 and head[1:8:2].count(0) >= 2:
+        return "utf-16-le", 0
+    if len(head) >= 4 and head[0:8:2].count(0) >= 2:
+        return "utf-16-be", 0
+
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        # A multibyte sequence cut at the end of the sample is still UTF-8
+        if exc.reason != "unexpected end of data":
+            return fallback, 0
+    return "utf-8", 0
+
+
+def iter_text_lines(fileobj, chunk_size=CHUNK_SIZE):
+    """
+    Yield decoded lines from a binary file object, reading `chunk_size`
+    bytes at a time. Never holds more than one chunk of text in memory.
+    """
+    head = fileobj.read(chunk_size)
+    if isinstance(head, str):
+        raise TypeError("iter_text_lines expects a binary file object")
+
+    encoding, bom_length = detect_encoding(head)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    pending = ""
+    chunk = head[bom_length:]
+    while chunk:
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines()
+        # Last piece may be an incomplete line; keep it for the next chunk
+        pending = lines.pop() if lines and not pending.endswith(("\n", "\r")) else ""
+        yield from lines
+        chunk = fileobj.read(chunk_size)
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield from pending.splitlines()
+
+
+class LrcParser:
+    """
+    Streaming LRC parser.
+
+    Iterating yields LyricLine tuples sorted by timestamp. Supports
+    lines with several timestamps ([00:12.10][01:40.00]chorus),
+    [offset:] (applied to every line) and [length:] headers, and
+    enhanced <mm:ss.xx> word timings (moved into `words`).
+
+    After iteration, `offset` (ms) and `length` (seconds or None) hold
+    the header values.
     """
-    # Matches: [mm:ss] OR [mm:ss.xx] OR [mm:ss.xxx]
-    pattern = re.compile(r"\[(\d+):(\d+(?:\.\d+)?)\](.*)")
 
-    lines = []
+    def __init__(self, source, chunk_size=CHUNK_SIZE):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.offset = 0
+        self.length = None
+
+    def _lines(self):
+        if isinstance(self.source, str):
+            return self.source.splitlines()
+        return iter_text_lines(self.source, self.chunk_size)
+
+    def _parse_meta(self, key, value):
+        key = key.lower()
+        try:
+            if key == "offset":
+                self.offset = int(value.strip().lstrip("+"))
+            else:
+                match = re.match(r"(\d+):(\d+)(?:[.:](\d+))?", value.strip())
+                if match:
+                    self.length = _seconds(*match.groups())
+        except ValueError:
+            pass
+
+    def _parse_line(self, raw_line):
+        """
+        Slow path: metadata tags, several time tags, word timings.
+        Returns ([timestamps], text, words) or None.
+        """
+        meta = META_TAG.match(raw_line)
+        if meta:
+            self._parse_meta(*meta.groups())
+            return None
+
+        # Leading run of time tags; text is whatever follows them
+        timestamps = []
+        position = 0
+        match = TIME_TAG.match(raw_line)
+        while match:
+            timestamps.append(_seconds(*match.groups()))
+            position = match.end()
+            match = TIME_TAG.match(raw_line, position)
+
+        if not timestamps:
+            return None
 
-    for raw_line in lrc_text.splitlines():
-        match = pattern.match(raw_line)
-        if not match:
-            continue
+        body = raw_line[position:]
+        words = ()
+        if WORD_TAG.search(body):
+            parts = WORD_TAG.split(body)
+            # parts: [lead, m, s, f, word, m, s, f, word, ...]
+            words = tuple(
+                (_seconds(parts[i], parts[i + 1], parts[i + 2]), parts[i + 3].strip())
+                for i in range(1, len(parts) - 3, 4)
+                if parts[i + 3].strip()
+            )
+            body = " ".join(WORD_TAG.sub(" ", body).split())
 
-        minutes = int(match.group(1))
-        seconds = float(match.group(2))
-        text = match.group(3).strip()
+        return timestamps, body.strip(), words
 
-        timestamp = minutes * 60 + seconds
+    def __iter__(self):
+        entries = []
+        append = entries.append
+        match_line = LINE.match
+        new_line = LyricLine._make
 
-        if text:
-            lines.append({
-                "timestamp": timestamp,
-                "text": text
-            })
+        for raw_line in self._lines():
+            if not raw_line.startswith("["):
+                continue
 
-    return lines
+            match = match_line(raw_line)
+            if match:
+                minutes, seconds, body = match.groups()
+                if not body.startswith("[") and "<" not in body:
+                    text = body.strip()
+                    if text:
+                        if ":" in seconds:
+                            seconds = seconds.replace(":", ".")
+                        append(new_line((int(minutes) * 60 + float(seconds), text, ())))
+                    continue
+
+            parsed = self._parse_line(raw_line)
+            if parsed is None or not parsed[1]:
+                continue
+            timestamps, text, words = parsed
+            for timestamp in timestamps:
+                append(LyricLine(timestamp, text, words))
+
+        # Positive offset means lyrics should show up earlier
+        if self.offset:
+            shift = self.offset / 1000
+            entries = [
+                LyricLine(
+                    max(line.timestamp - shift, 0.0),
+                    line.text,
+                    tuple((max(t - shift, 0.0), w) for t, w in line.words),
+                )
+                for line in entries
+            ]
+
+        entries.sort(key=itemgetter(0))
+        yield from entries
+
+
+def parse_lrc(lrc_text: str):
+    """
+    Parse LRC text with or without milliseconds.
+    Returns list of {timestamp_in_seconds, text}
+    """
+    return [
+        {"timestamp": line.timestamp, "text": line.text}
+        for line in LrcParser(lrc_text)
+    ]
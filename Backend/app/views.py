@@ -1,23 +1,350 @@
-from rest_framework import generics, permissions
-from .models import Song
-from .serializers import SongSerializer, SongUploadSerializer
+import json
+import math
+import secrets
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import UnsupportedMediaType, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .cache import catalog_cache
+from .compression import compressed_bodies
+from .conditional import not_modified, page_etag, set_validators, song_etag
+from .facets import catalog_facets
+from .filters import SongFilter
+from .images import cover_digest, ensure_derivative
+from .lyrics import line_at, lyrics_window
+from .metrics import registry, span
+from .models import Song, UploadSession
+from .pagination import SongCursorPagination
+from .renderers import CATALOG_RENDERERS, representation_etag
+from .search import search_songs
+from .serializers import (
+    FastSongSerializer, SongListSerializer, SongProcessingSerializer, SongUploadSerializer, UploadSessionSerializer,
+)
+from .streaming import stream_file
+from .uploads import UploadError, discard, parse_checksum, received_ranges, upload_offset, write_chunk
+from .waveform import UnsupportedAudio, ensure_waveform, waveform_version
 
 # Admin uploads song
+# Answers 202: the song is processed by `manage.py run_workers`,
+# progress at the Location (song-processing)
 class SongUploadView(generics.CreateAPIView):
     queryset = Song.objects.all()
     serializer_class = SongUploadSerializer
     permission_classes = [permissions.IsAdminUser]
 
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        song = serializer.save()
+        location = reverse("song-processing", args=[song.pk])
+        return Response(
+            {"id": song.pk, "processing_state": song.processing_state, "status": request.build_absolute_uri(location)},
+            status=status.HTTP_202_ACCEPTED, headers={"Location": location},
+        )
 
-# List songs for users
-class SongListView(generics.ListAPIView):
+
+class SongProcessingView(generics.RetrieveAPIView):
     queryset = Song.objects.all()
-    serializer_class = SongSerializer
+    serializer_class = SongProcessingSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+
+# Resumable audio uploads (tus-style): POST {filename, size[, sha256]}
+# creates a session; PATCH sends a chunk as application/offset+octet-stream
+# at its Upload-Offset, in any order and concurrently; HEAD/GET report
+# progress. The finished upload is attached by posting its id as
+# audio_upload to song-upload.
+class UploadSessionCreateView(generics.CreateAPIView):
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+
+class UploadSessionView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    chunk_content_type = "application/offset+octet-stream"
+
+    def get_session(self, request, pk):
+        return get_object_or_404(UploadSession, pk=pk, owner_id=request.user.id)
+
+    def progress(self, session, data=True):
+        ranges = received_ranges(session)
+        offset = upload_offset(ranges)
+        body = {"id": session.pk, "size": session.size, "offset": offset,
+                "received": ranges, "complete": offset == session.size} if data else None
+        response = Response(body, status=status.HTTP_200_OK if data else status.HTTP_204_NO_CONTENT)
+        response["Upload-Offset"] = str(offset)
+        response["Upload-Length"] = str(session.size)
+        response["Cache-Control"] = "no-store"
+        return response
+
+    def get(self, request, pk):
+        return self.progress(self.get_session(request, pk))
+
+    def head(self, request, pk):
+        return self.progress(self.get_session(request, pk), data=False)
+
+    def patch(self, request, pk):
+        session = self.get_session(request, pk)
+        if request.content_type != self.chunk_content_type:
+            raise UnsupportedMediaType(request.content_type)
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except (KeyError, ValueError):
+            raise ValidationError("Upload-Offset and Content-Length headers are required")
+        if offset < 0:
+            raise ValidationError("Upload-Offset must not be negative")
+
+        try:
+            checksum = parse_checksum(request.headers.get("Upload-Checksum"))
+            # The body is never parsed: it is copied from the stream block by block
+            write_chunk(session, offset, length, request.stream, checksum)
+        except UploadError as exc:
+            raise ValidationError(str(exc))
+        return self.progress(session, data=False)
+
+    def delete(self, request, pk):
+        discard(self.get_session(request, pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# List songs for users (paginated, without lyrics)
+# ?genre=&language=&artist=&duration_min=&duration_max= filter,
+# ?facets=true adds per-genre/language counts for the whole catalog
+class SongListView(generics.ListAPIView):
+    queryset = Song.objects.select_related("artist").defer("lyrics_packed")
+    serializer_class = SongListSerializer
+    pagination_class = SongCursorPagination
     permission_classes = [permissions.AllowAny]
+    renderer_classes = CATALOG_RENDERERS
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = SongFilter
+
+    def list(self, request, *args, **kwargs):
+        key = catalog_cache.list_key(request)
+        cached = catalog_cache.get(key)
+
+        if cached is None:
+            page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+            facets = catalog_facets() if request.query_params.get("facets") in ("1", "true") else None
+            links = (self.paginator.get_next_link(), self.paginator.get_previous_link())
+            etag = page_etag(request, page, links, json.dumps(facets, sort_keys=True) if facets else "")
+
+            # Unchanged page: answer before serializing anything
+            response = not_modified(request, representation_etag(request, etag))
+            if response is not None:
+                return response
+
+            with span("serialize"):
+                data = self.get_paginated_response(self.get_serializer(page, many=True).data).data
+            if facets is not None:
+                data["facets"] = facets
+            cached = (etag, data)
+            catalog_cache.set(key, cached)
+
+        etag = representation_etag(request, cached[0])
+        return not_modified(request, etag) or set_validators(Response(cached[1]), etag)
 
 
 # Get single song + audio + lyrics
 class SongDetailView(generics.RetrieveAPIView):
-    queryset = Song.objects.all()
-    serializer_class = SongSerializer
+    # artist joined in, lyrics served from the packed blob; the payload is
+    # SongSerializer's, built without DRF fields (SongSerializer also works)
+    queryset = Song.objects.select_related("artist")
+    serializer_class = FastSongSerializer
     permission_classes = [permissions.AllowAny]
+    renderer_classes = CATALOG_RENDERERS
+
+    def retrieve(self, request, *args, **kwargs):
+        key = catalog_cache.song_key(request, self.kwargs["pk"])
+        cached = catalog_cache.get(key)
+
+        if cached is None:
+            song = self.get_object()
+            etag = song_etag(request, song)
+
+            # Unchanged song: answer before serializing anything
+            response = not_modified(request, representation_etag(request, etag), song.updated_at)
+            if response is not None:
+                return response
+
+            with span("serialize"):
+                cached = (etag, song.updated_at, self.get_serializer(song).data)
+            catalog_cache.set(key, cached)
+
+        etag, last_modified, data = cached
+        etag = representation_etag(request, etag)
+        return not_modified(request, etag, last_modified) or set_validators(Response(data), etag, last_modified)
+
+
+# Lyrics in a time window (?from=&to=, seconds) or the line showing at ?at=
+class SongLyricsView(APIView):
+    permission_classes = [permissions.AllowAny]
+    renderer_classes = CATALOG_RENDERERS
+
+    def get(self, request, pk):
+        try:
+            params = {
+                name: float(request.query_params[name])
+                for name in ("from", "to", "at")
+                if request.query_params.get(name, "") != ""
+            }
+        except ValueError:
+            raise ValidationError("from, to and at must be numbers of seconds")
+        if not all(math.isfinite(value) for value in params.values()):
+            raise ValidationError("from, to and at must be finite")
+
+        song = get_object_or_404(Song.objects.only("lyrics_packed", "updated_at"), pk=pk)
+        etag = representation_etag(request, song_etag(request, song, variant=request.get_full_path()))
+        response = not_modified(request, etag, song.updated_at)
+        if response is not None:
+            return response
+
+        if "at" in params:
+            data = line_at(song, params["at"])
+        else:
+            data = lyrics_window(song, params.get("from"), params.get("to"))
+        return set_validators(Response(data), etag, song.updated_at)
+
+
+# Ranked full-text search over titles, artists and lyrics
+class SongSearchView(generics.GenericAPIView):
+    queryset = Song.objects.select_related("artist").defer("lyrics_packed")
+    serializer_class = SongListSerializer
+    permission_classes = [permissions.AllowAny]
+    renderer_classes = CATALOG_RENDERERS
+    max_limit = 50
+
+    def get(self, request):
+        query = request.query_params.get("q", "")
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 20)), self.max_limit))
+        except ValueError:
+            raise ValidationError("limit must be an integer")
+
+        key = catalog_cache.list_key(request)
+        data = catalog_cache.get(key)
+        if data is None:
+            hits = search_songs(query, limit)
+            songs = self.get_queryset().in_bulk([pk for pk, _, _ in hits])
+            data = {"results": []}
+            with span("serialize"):
+                for pk, rank, snippet in hits:
+                    if pk in songs:
+                        item = self.get_serializer(songs[pk]).data
+                        item["rank"] = rank
+                        item["snippet"] = snippet
+                        data["results"].append(item)
+            catalog_cache.set(key, data)
+        return Response(data)
+
+
+# Stream a song's audio with HTTP Range support (seeking)
+class SongAudioView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk):
+        song = get_object_or_404(Song.objects.only("audio_file"), pk=pk)
+        if not song.audio_file:
+            raise Http404("Song has no audio file")
+        try:
+            return stream_file(request, song.audio_file)
+        except FileNotFoundError:
+            raise Http404("Audio file is missing")
+
+
+# Cover thumbnail in a fixed size/format, rendered on first request
+class SongCoverView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk, size, fmt):
+        song = get_object_or_404(Song.objects.only("cover_image"), pk=pk)
+        if not song.cover_image:
+            raise Http404("Song has no cover image")
+        try:
+            path = ensure_derivative(song.cover_image.name, size, fmt)
+        except ValueError:
+            raise Http404("Unsupported cover size or format")
+        except FileNotFoundError:
+            raise Http404("Cover image is missing")
+        except OSError:  # includes PIL.UnidentifiedImageError
+            raise Http404("Cover image can't be decoded")
+
+        response = FileResponse(open(path, "rb"), content_type=f"image/{fmt}")
+        # URLs from cover_srcset are versioned by the source image; others
+        # must revalidate, the cover may be replaced
+        if request.query_params.get("v") == cover_digest(song.cover_image.name)[:12]:
+            response["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response["Cache-Control"] = "no-cache"
+        return response
+
+
+# Waveform peaks of the song's audio (see app.waveform for the layout),
+# computed on first request if the upload job hasn't yet
+class SongWaveformView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk):
+        song = get_object_or_404(Song.objects.only("audio_file"), pk=pk)
+        if not song.audio_file:
+            raise Http404("Song has no audio file")
+        try:
+            path = ensure_waveform(song.audio_file.name)
+        except UnsupportedAudio:
+            raise Http404("No waveform for this audio format")
+        except FileNotFoundError:
+            raise Http404("Audio file is missing")
+
+        response = FileResponse(open(path, "rb"), content_type="application/octet-stream")
+        # URLs from waveform_url are versioned by the audio blob; others
+        # must revalidate, the audio may be replaced
+        if request.query_params.get("v") == waveform_version(song.audio_file.name):
+            response["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response["Cache-Control"] = "no-cache"
+        return response
+
+
+# Catalog cache hit/miss counters (per worker process)
+class SongCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(catalog_cache.stats())
+
+
+# Prometheus scrape endpoint (METRICS_ENABLED); METRICS_TOKEN, if set,
+# must be sent as a bearer token
+def metrics(request):
+    if not settings.METRICS_ENABLED:
+        raise Http404("Metrics are disabled")
+    if settings.METRICS_TOKEN and not secrets.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        return HttpResponse(status=401)
+
+    cache = catalog_cache.stats()
+    extra = [
+        ("cadence_catalog_cache_hits_total", "counter", "Catalog cache hits.", cache["hits"]),
+        ("cadence_catalog_cache_misses_total", "counter", "Catalog cache misses.", cache["misses"]),
+    ]
+    if "entries" in cache:
+        extra.append(("cadence_catalog_cache_entries", "gauge", "Entries in the catalog cache.", cache["entries"]))
+    if "evictions" in cache:
+        extra.append(("cadence_catalog_cache_evictions_total", "counter", "Catalog cache evictions.",
+                      cache["evictions"]))
+    compression = compressed_bodies.stats()
+    extra += [
+        ("cadence_compression_cache_hits_total", "counter", "Compressed body cache hits.", compression["hits"]),
+        ("cadence_compression_cache_misses_total", "counter", "Compressed body cache misses.", compression["misses"]),
+        ("cadence_compression_cache_bytes", "gauge", "Bytes in the compressed body cache.", compression["bytes"]),
+    ]
+    return HttpResponse(registry.render(extra), content_type="text/plain; version=0.0.4; charset=utf-8")
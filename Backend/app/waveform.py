@@ -0,0 +1,198 @@
+import hashlib
+import os
+import struct
+import tempfile
+import wave
+
+import numpy as np
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from .locks import named_lock
+
+# Frames per peak at each zoom level, finest first; each divides the next,
+# so coarser levels are reduced from the finer peaks, not the audio
+LEVELS = (256, 1024, 4096)
+
+# Frames decoded per step (a multiple of LEVELS[0]); bounds memory
+BLOCK_FRAMES = LEVELS[0] * 1024
+
+# Sidecar layout (little-endian):
+#   b"WAVP" magic, uint16 version, uint16 channels, uint32 sample rate,
+#   uint64 frames, uint16 level count,
+#   per level: uint32 frames per peak, uint32 peak count,
+#   then per level: count (min, max) int8 pairs, full scale = 127.
+MAGIC = b"WAVP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIQH")
+LEVEL = struct.Struct("<II")
+
+class UnsupportedAudio(ValueError):
+    """
+    The audio file isn't PCM WAV (the only format decoded locally).
+    """
+
+
+def decodable(audio_name):
+    return os.path.splitext(audio_name)[1].lower() in (".wav", ".wave")
+
+
+def waveform_name(audio_name):
+    """
+    Deterministic storage path of the peaks sidecar for an audio blob.
+    """
+    digest = hashlib.sha256(audio_name.encode("utf-8")).hexdigest()
+    return f"songs/waveforms/{digest[:2]}/{digest}.peaks"
+
+
+def waveform_version(audio_name):
+    return waveform_name(audio_name).rsplit("/", 1)[1][:12]
+
+
+def waveform_url(song, request=None):
+    """
+    URL of the song's peaks, versioned by the audio blob so it can be
+    cached forever; None when the audio can't be decoded here.
+    """
+    if not song.audio_file or not decodable(song.audio_file.name):
+        return None
+    url = reverse("song-waveform", args=[song.pk]) + f"?v={waveform_version(song.audio_file.name)}"
+    return request.build_absolute_uri(url) if request else url
+
+
+def delete_waveform(audio_name):
+    try:
+        os.unlink(default_storage.path(waveform_name(audio_name)))
+    except FileNotFoundError:
+        pass
+
+
+def _samples(raw, width):
+    """
+    Interleaved PCM bytes -> float32 samples in [-1, 1).
+    """
+    if width == 1:  # unsigned 8-bit
+        return (np.frombuffer(raw, np.uint8).astype(np.float32) - 128) / 128
+    if width == 2:
+        return np.frombuffer(raw, "<i2").astype(np.float32) / 2 ** 15
+    if width == 3:
+        b = np.frombuffer(raw, np.uint8).reshape(-1, 3).astype(np.int32)
+        # Shift the top byte into the sign bit and back to sign-extend
+        packed = (b[:, 0] << 8) | (b[:, 1] << 16) | (b[:, 2] << 24)
+        return (packed >> 8).astype(np.float32) / 2 ** 23
+    if width == 4:
+        return np.frombuffer(raw, "<i4").astype(np.float32) / 2 ** 31
+    raise UnsupportedAudio(f"Unsupported sample width: {width} bytes")
+
+
+def _reduce(mins, maxs, factor):
+    """
+    Peaks covering `factor` times as many frames; a short last group is padded.
+    """
+    pad = -len(mins) % factor
+    if pad:
+        mins = np.concatenate([mins, np.full(pad, np.inf, np.float32)])
+        maxs = np.concatenate([maxs, np.full(pad, -np.inf, np.float32)])
+    return mins.reshape(-1, factor).min(axis=1), maxs.reshape(-1, factor).max(axis=1)
+
+
+def compute_peaks(path):
+    """
+    Decode a PCM WAV file block by block and return
+    (channels, sample_rate, frames, [(frames per peak, mins, maxs), ...]).
+    Peaks span all channels; each level's arrays are float32 in [-1, 1].
+    """
+    try:
+        reader = wave.open(path, "rb")
+    except (wave.Error, EOFError) as exc:
+        raise UnsupportedAudio(str(exc))
+
+    with reader:
+        channels, width, rate = reader.getnchannels(), reader.getsampwidth(), reader.getframerate()
+        step = LEVELS[0] * channels
+        mins, maxs, frames = [], [], 0
+
+        while raw := reader.readframes(BLOCK_FRAMES):
+            samples = _samples(raw, width)
+            frames += len(samples) // channels
+            # Last block: repeat the final sample to fill the partial peak
+            pad = -len(samples) % step
+            if pad:
+                samples = np.pad(samples, (0, pad), mode="edge")
+            buckets = samples.reshape(-1, step)
+            mins.append(buckets.min(axis=1))
+            maxs.append(buckets.max(axis=1))
+
+    finest = (
+        np.concatenate(mins) if mins else np.zeros(0, np.float32),
+        np.concatenate(maxs) if maxs else np.zeros(0, np.float32),
+    )
+    levels = [(LEVELS[0], *finest)]
+    for size in LEVELS[1:]:
+        levels.append((size, *_reduce(finest[0], finest[1], size // LEVELS[0])))
+    return channels, rate, frames, levels
+
+
+def pack_peaks(channels, rate, frames, levels):
+    parts = [HEADER.pack(MAGIC, VERSION, channels, rate, frames, len(levels))]
+    parts += [LEVEL.pack(size, len(level_mins)) for size, level_mins, _ in levels]
+    for _, level_mins, level_maxs in levels:
+        pairs = np.empty((len(level_mins), 2), np.float32)
+        pairs[:, 0], pairs[:, 1] = level_mins, level_maxs
+        parts.append(np.clip(np.rint(pairs * 127), -127, 127).astype(np.int8).tobytes())
+    return b"".join(parts)
+
+
+def read_header(blob):
+    """
+    {"channels", "sample_rate", "frames", "duration", "levels": [(frames per peak, count)]}
+    """
+    magic, version, channels, rate, frames, count = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a waveform peaks file")
+    levels = [LEVEL.unpack_from(blob, HEADER.size + i * LEVEL.size) for i in range(count)]
+    return {
+        "channels": channels, "sample_rate": rate, "frames": frames,
+        "duration": frames / rate if rate else 0.0, "levels": levels,
+    }
+
+
+def unpack_peaks(blob):
+    """
+    {frames per peak: int8 array of shape (count, 2)} for every level.
+    """
+    header = read_header(blob)
+    position = HEADER.size + len(header["levels"]) * LEVEL.size
+    peaks = {}
+    for size, count in header["levels"]:
+        peaks[size] = np.frombuffer(blob, np.int8, count * 2, position).reshape(count, 2)
+        position += count * 2
+    return peaks
+
+
+def ensure_waveform(audio_name):
+    """
+    Filesystem path of the audio's peaks sidecar, computing it first if
+    needed. Raises UnsupportedAudio for anything but PCM WAV.
+    """
+    if not decodable(audio_name):
+        raise UnsupportedAudio(f"No local decoder for {audio_name}")
+
+    target_path = default_storage.path(waveform_name(audio_name))
+    if os.path.exists(target_path):
+        return target_path
+
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    with named_lock(target_path):
+        if not os.path.exists(target_path):
+            blob = pack_peaks(*compute_peaks(default_storage.path(audio_name)))
+            # Write next to the target and rename, so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    out.write(blob)
+                os.replace(tmp_path, target_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+    return target_path
@@ -0,0 +1,89 @@
+#
+# Async versions of the auth views (ASYNC_VIEWS). Same URLs, same JSON.
+#
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .authentication import CookiesJWTAuthentication
+from .models import Todo, User
+from .serializers import TodoSerializer, UserSerializer
+from .tokens import ClaimsRefreshToken
+from .views import set_token_cookies
+
+# PBKDF2 runs here, off the event loop. The pool is bounded so a burst of
+# logins queues up instead of taking every thread the catalog reads need.
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+
+
+def _json(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+async def _authenticated_user(request):
+    try:
+        result = await CookiesJWTAuthentication().aauthenticate(request)
+    except InvalidToken as exc:
+        return None, _json(exc.detail, status=exc.status_code)
+    if result is None:
+        return None, _json({'detail': 'Authentication credentials were not provided.'}, status=401)
+    return result[0], None
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    try:
+        data = json.loads(request.body) if request.content_type == 'application/json' else request.POST
+        username, password = str(data['username']), str(data['password'])
+    except (ValueError, KeyError, TypeError):
+        return _json({'success': False, 'message': 'Invalid credentials'}, status=401)
+
+    loop = asyncio.get_running_loop()
+    user = await User.objects.filter(username=username).afirst()
+    if user is None:
+        # Hash anyway so unknown usernames take as long as wrong passwords
+        await loop.run_in_executor(password_executor, User().set_password, password)
+        valid = False
+    else:
+        valid = await loop.run_in_executor(password_executor, user.check_password, password)
+    if not valid or not user.is_active:
+        return _json({'success': False, 'message': 'Invalid credentials'}, status=401)
+
+    # Records the OutstandingToken row
+    refresh = await sync_to_async(ClaimsRefreshToken.for_user)(user)
+    access_token, refresh_token = str(refresh.access_token), str(refresh)
+
+    res = _json({
+        'success': True,
+        'user': UserSerializer(user).data,
+        'access': access_token,
+        'refresh': refresh_token,
+    })
+    return set_token_cookies(res, access_token, refresh_token)
+
+
+@require_GET
+async def get_todos(request):
+    user, error = await _authenticated_user(request)
+    if error is not None:
+        return error
+    todos = [todo async for todo in Todo.objects.filter(owner_id=user.id)]
+    return _json(TodoSerializer(todos, many=True).data)
+
+
+@require_GET
+async def is_logged_in(request):
+    user, error = await _authenticated_user(request)
+    if error is not None:
+        return error
+    return _json(UserSerializer(user, many=False).data)
@@ -1,6 +1,66 @@
+import threading
+import time
+
+from django.conf import settings
+from django.utils.functional import cached_property
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.exceptions import AuthenticationFailed
 
+from .models import User
+
+
+class ClaimsUser(TokenUser):
+    """User built from the claims signed into the token at login.
+
+    Carries id, username, email, role and the staff flags without touching
+    the database. Use ``get_full_user`` when a real ``User`` row is needed.
+    """
+
+    @cached_property
+    def email(self):
+        return self.token.get("email", "")
+
+    @cached_property
+    def role(self):
+        return self.token.get("role", "client")
+
+
+_full_users = {}
+_full_users_lock = threading.Lock()
+_FULL_USERS_MAX = 1024
+
+
+def get_full_user(user):
+    """Return the ``User`` row behind ``user``.
+
+    Token users are looked up once and kept for ``JWT_USER_CACHE_TTL``
+    seconds, so a burst of requests from the same user costs one query.
+    """
+    if not isinstance(user, TokenUser):
+        return user
+    now = time.monotonic()
+    with _full_users_lock:
+        hit = _full_users.get(user.id)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+    full = User.objects.get(pk=user.id)
+    with _full_users_lock:
+        if len(_full_users) >= _FULL_USERS_MAX:
+            for key in [k for k, (expires, _) in _full_users.items() if expires <= now]:
+                del _full_users[key]
+            if len(_full_users) >= _FULL_USERS_MAX:
+                _full_users.clear()
+        _full_users[user.id] = (now + settings.JWT_USER_CACHE_TTL, full)
+    return full
+
+
+def clear_user_cache():
+    with _full_users_lock:
+        _full_users.clear()
+
+
 class CookiesJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
         access_token = request.COOKIES.get('access_token')
@@ -10,9 +70,32 @@ class CookiesJWTAuthentication(JWTAuthentication):
         
         validated_token = self.get_validated_token(access_token)
 
+        # Tokens issued before the claims were added still go to the DB.
+        if settings.JWT_STATELESS_USER and "role" in validated_token:
+            return (ClaimsUser(validated_token), validated_token)
+
         try:
             user = self.get_user(validated_token)
         except AuthenticationFailed:
             return None
 
-        return (user, validated_token)
\ No newline at end of file
+        return (user, validated_token)
+
+    async def aauthenticate(self, request):
+        """``authenticate`` for async views: the user row is read with the async ORM."""
+        access_token = request.COOKIES.get('access_token')
+
+        if not access_token:
+            return None
+
+        validated_token = self.get_validated_token(access_token)
+
+        if settings.JWT_STATELESS_USER and "role" in validated_token:
+            return (ClaimsUser(validated_token), validated_token)
+
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = await User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).afirst()
+        if user is None or not user.is_active:
+            return None
+
+        return (user, validated_token)
@@ -0,0 +1,78 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+def _digest(jti):
+    return int.from_bytes(hashlib.blake2b(jti.encode(), digest_size=8).digest(), "big")
+
+
+class JtiFilter:
+    """In-process set of hashed blacklisted jtis.
+
+    Loaded from the BlacklistedToken table on first use, then topped up with
+    rows newer than the last one seen every ``JWT_BLACKLIST_SYNC_SECONDS``,
+    so blacklisting done by other workers shows up within that window.
+    Rows can commit out of id order (concurrent sequence allocations), so
+    each top-up rereads the last ``JWT_BLACKLIST_SYNC_OVERLAP`` ids too. The
+    set is rebuilt from scratch once per refresh-token lifetime, which drops
+    tokens that have expired (and been pruned) since the last build.
+    Entries are 64-bit hashes: a miss is final, a hit is confirmed against
+    the table because two jtis can share a hash.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hashes = set()
+        self._last_id = None
+        self._synced_at = 0.0
+        self._built_at = 0.0
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._last_id is not None and now - self._synced_at < settings.JWT_BLACKLIST_SYNC_SECONDS:
+            return
+        with self._lock:
+            if self._last_id is not None and now - self._synced_at < settings.JWT_BLACKLIST_SYNC_SECONDS:
+                return
+            if now - self._built_at > api_settings.REFRESH_TOKEN_LIFETIME.total_seconds():
+                self._hashes = set()
+                self._last_id = None
+                self._built_at = now
+            rows = BlacklistedToken.objects.order_by("id").values_list("id", "token__jti")
+            if self._last_id is not None:
+                rows = rows.filter(id__gt=self._last_id - settings.JWT_BLACKLIST_SYNC_OVERLAP)
+            last_id = self._last_id or 0
+            for row_id, jti in rows.iterator(chunk_size=5000):
+                self._hashes.add(_digest(jti))
+                last_id = max(last_id, row_id)
+            self._last_id = last_id
+            self._synced_at = now
+
+    def add(self, jti):
+        with self._lock:
+            self._hashes.add(_digest(jti))
+
+    def contains(self, jti):
+        self._sync()
+        if _digest(jti) not in self._hashes:
+            return False
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    def reset(self):
+        """Drop everything; the next lookup reloads from the table."""
+        with self._lock:
+            self._hashes = set()
+            self._last_id = None
+            self._synced_at = 0.0
+            self._built_at = 0.0
+
+    def __len__(self):
+        return len(self._hashes)
+
+
+jti_filter = JtiFilter()
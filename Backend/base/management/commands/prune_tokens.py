@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+
+class Command(BaseCommand):
+    help = ("Delete expired outstanding and blacklisted refresh tokens in small batches. "
+            "Meant to be run periodically, e.g. hourly from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Rows deleted per transaction.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only report how many tokens would be removed.")
+
+    def handle(self, *args, **options):
+        expired = OutstandingToken.objects.filter(expires_at__lte=aware_utcnow())
+
+        if options["dry_run"]:
+            blacklisted = BlacklistedToken.objects.filter(token__in=expired).count()
+            self.stdout.write(f"{expired.count()} expired token(s), {blacklisted} blacklisted.")
+            return
+
+        tokens = blacklisted = 0
+        while True:
+            ids = list(expired.order_by("id").values_list("id", flat=True)[:options["batch_size"]])
+            if not ids:
+                break
+            blacklisted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+            tokens += OutstandingToken.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Pruned {tokens} expired token(s), {blacklisted} of them blacklisted."))
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import User, Todo
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
+from .tokens import ClaimsRefreshToken
 
 class UserRegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -35,3 +37,11 @@ class TodoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Todo
         fields = ['id', 'name', 'completed']
+
+
+class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ClaimsRefreshToken
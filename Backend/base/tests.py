@@ -1,3 +1,163 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from . import async_views
+from .authentication import ClaimsUser, clear_user_cache, get_full_user
+from .blacklist import jti_filter
+from .models import Todo, User
+
+
+class StatelessUserTests(TestCase):
+    def setUp(self):
+        clear_user_cache()
+        self.user = User.objects.create_user("alice", "alice@example.com", "pw-12345", role="admin")
+        self.client = APIClient()
+        res = self.client.post(reverse("token_obtain_pair"), {"username": "alice", "password": "pw-12345"})
+        self.assertEqual(res.status_code, 200)
+
+    def test_access_token_carries_claims(self):
+        access = self.client.cookies["access_token"].value
+        res = self.client.get(reverse("authenticated"))
+        self.assertEqual(res.json()["role"], "admin")
+        token = AccessToken(access)
+        self.assertEqual(token["username"], "alice")
+        self.assertEqual(token["role"], "admin")
+
+    @override_settings(JWT_STATELESS_USER=True)
+    def test_authenticated_needs_no_queries(self):
+        with self.assertNumQueries(0):
+            res = self.client.get(reverse("authenticated"))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {
+            "id": self.user.id, "username": "alice", "email": "alice@example.com", "role": "admin",
+        })
+
+    @override_settings(JWT_STATELESS_USER=True)
+    def test_todos_filter_by_token_user(self):
+        Todo.objects.create(name="one", owner=self.user)
+        with self.assertNumQueries(1):
+            res = self.client.get(reverse("todos"))
+        self.assertEqual([t["name"] for t in res.json()], ["one"])
+
+    @override_settings(JWT_STATELESS_USER=True)
+    def test_refresh_picks_up_role_change(self):
+        User.objects.filter(pk=self.user.pk).update(role="client")
+        self.assertEqual(self.client.get(reverse("authenticated")).json()["role"], "admin")
+        self.assertEqual(self.client.post(reverse("token_refresh")).status_code, 200)
+        self.assertEqual(self.client.get(reverse("authenticated")).json()["role"], "client")
+
+    @override_settings(JWT_STATELESS_USER=True)
+    def test_refresh_rejects_inactive_user(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.post(reverse("token_refresh")).status_code, 400)
+
+    def test_full_user_is_cached(self):
+        token_user = ClaimsUser(AccessToken(self.client.cookies["access_token"].value))
+        with self.assertNumQueries(1):
+            self.assertEqual(get_full_user(token_user), self.user)
+            self.assertEqual(get_full_user(token_user), self.user)
+        self.assertIs(get_full_user(self.user), self.user)
+
+
+class TokenBlacklistTests(TestCase):
+    def setUp(self):
+        jti_filter.reset()
+        self.user = User.objects.create_user("bob", "bob@example.com", "pw-12345")
+        self.client = APIClient()
+        self.client.post(reverse("token_obtain_pair"), {"username": "bob", "password": "pw-12345"})
+        self.refresh = self.client.cookies["refresh_token"].value
+
+    def test_logout_blocks_refresh(self):
+        self.assertEqual(self.client.post(reverse("logout")).status_code, 200)
+        self.client.cookies["refresh_token"] = self.refresh
+        res = self.client.post(reverse("token_refresh"))
+        self.assertEqual(res.status_code, 400)
+
+    def test_refresh_skips_blacklist_table_once_loaded(self):
+        self.client.post(reverse("token_refresh"))
+        # Only the user lookup that refreshes the claims is left.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.post(reverse("token_refresh")).status_code, 200)
+
+    def test_blacklist_from_another_worker_is_picked_up(self):
+        self.client.post(reverse("token_refresh"))
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(user=self.user))
+        with override_settings(JWT_BLACKLIST_SYNC_SECONDS=0):
+            self.assertEqual(self.client.post(reverse("token_refresh")).status_code, 400)
+
+    def test_blacklist_committed_out_of_id_order_is_picked_up(self):
+        def blacklist(jti, **fields):
+            token = OutstandingToken.objects.create(
+                user=self.user, jti=jti, token=jti, expires_at=aware_utcnow() + timedelta(days=1))
+            return BlacklistedToken.objects.create(token=token, **fields)
+
+        first = blacklist("first")
+        blacklist("third", id=first.id + 2)
+        self.assertTrue(jti_filter.contains("third"))
+        # Got its id before "third" but committed after the filter synced
+        blacklist("second", id=first.id + 1)
+        with override_settings(JWT_BLACKLIST_SYNC_SECONDS=0):
+            self.assertTrue(jti_filter.contains("second"))
+
+    def test_prune_tokens_removes_expired(self):
+        expired = OutstandingToken.objects.create(
+            user=self.user, jti="old", token="x", expires_at=aware_utcnow() - timedelta(days=1))
+        BlacklistedToken.objects.create(token=expired)
+        out = StringIO()
+        call_command("prune_tokens", "--batch-size=1", stdout=out)
+        self.assertIn("Pruned 1 expired token(s), 1 of them blacklisted.", out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class AsyncAuthViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("carol", "carol@example.com", "pw-12345", role="admin")
+        self.factory = RequestFactory()
+
+    def login(self, password):
+        request = self.factory.post("/auth/login/", {"username": "carol", "password": password},
+                                    content_type="application/json")
+        return async_to_sync(async_views.login)(request)
+
+    def get(self, view, res):
+        request = self.factory.get("/auth/")
+        request.COOKIES["access_token"] = res.cookies["access_token"].value
+        return async_to_sync(view)(request)
+
+    def test_login_sets_cookies(self):
+        res = self.login("pw-12345")
+        self.assertEqual(res.status_code, 200)
+        body = json.loads(res.content)
+        self.assertTrue(body["success"])
+        self.assertEqual(body["user"]["role"], "admin")
+        self.assertEqual(res.cookies["refresh_token"].value, body["refresh"])
+        self.assertEqual(AccessToken(res.cookies["access_token"].value)["role"], "admin")
+        self.assertTrue(OutstandingToken.objects.filter(user=self.user).exists())
+
+    def test_login_rejects_bad_password(self):
+        res = self.login("wrong")
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(json.loads(res.content), {"success": False, "message": "Invalid credentials"})
+
+    def test_authenticated_and_todos(self):
+        res = self.login("pw-12345")
+        Todo.objects.create(name="one", owner=self.user)
+        self.assertEqual(json.loads(self.get(async_views.is_logged_in, res).content)["username"], "carol")
+        self.assertEqual(json.loads(self.get(async_views.get_todos, res).content)[0]["name"], "one")
+        with override_settings(JWT_STATELESS_USER=True), self.assertNumQueries(0):
+            self.assertEqual(self.get(async_views.is_logged_in, res).status_code, 200)
+
+    def test_anonymous_is_rejected(self):
+        res = async_to_sync(async_views.is_logged_in)(self.factory.get("/auth/authenticated/"))
+        self.assertEqual(res.status_code, 401)
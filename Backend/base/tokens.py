@@ -0,0 +1,57 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import jti_filter
+from .models import User
+
+# Signed into every token so CookiesJWTAuthentication can build request.user
+# without loading the row (see JWT_STATELESS_USER).
+USER_CLAIMS = ('username', 'email', 'role', 'is_staff', 'is_superuser')
+
+
+def set_user_claims(token, user):
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry up-to-date user claims.
+
+    The claims are re-read from the user row on every refresh, so a role
+    change or deactivation reaches clients within one access-token lifetime.
+    """
+
+    _user = None
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        set_user_claims(token, user)
+        token._user = user
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        if 'role' not in self:
+            # Issued before claims were added; keep the plain token.
+            return access
+        user = self._user
+        if user is None:
+            user = User.objects.filter(pk=self[api_settings.USER_ID_CLAIM]).first()
+            if user is None or not user.is_active:
+                raise TokenError('User is inactive or deleted')
+        set_user_claims(access, user)
+        return access
+
+    def check_blacklist(self):
+        # Answered from the in-process filter; only a hit reaches the DB.
+        if jti_filter.contains(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        result = super().blacklist()
+        jti_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return result
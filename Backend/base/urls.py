@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.urls import path
+from . import async_views
 from .views import (
     get_todos,
     CustomTokenObtainPairView,
@@ -8,11 +10,18 @@ from .views import (
     is_logged_in
 )
 
+if settings.ASYNC_VIEWS:
+    login = async_views.login
+    todos, authenticated = async_views.get_todos, async_views.is_logged_in
+else:
+    login = CustomTokenObtainPairView.as_view()
+    todos, authenticated = get_todos, is_logged_in
+
 urlpatterns = [
-    path('login/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('login/', login, name='token_obtain_pair'),
     path('logout/', logout, name='logout'),
     path('token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
-    path('todos/', get_todos, name='todos'),
+    path('todos/', todos, name='todos'),
     path('register/', register, name='register'),
-    path('authenticated/', is_logged_in, name='authenticated'),
+    path('authenticated/', authenticated, name='authenticated'),
 ]
@@ -13,6 +13,7 @@ from rest_framework_simplejwt.tokens import RefreshToken # <-- Import RefreshTok
 
 from .models import Todo
 from .serializers import TodoSerializer, UserRegisterSerializer, UserSerializer
+from .tokens import ClaimsRefreshToken
 
 from datetime import datetime, timedelta
 
@@ -28,6 +29,30 @@ def register(request):
     # FIX: Use .errors (plural) and return a 400 status
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+def set_token_cookies(res, access_token, refresh_token=None):
+    # HttpOnly cookies. secure=False and samesite='Lax' for local http
+    # development; 'None' would require secure=True.
+    res.set_cookie(
+        key='access_token',
+        value=str(access_token),
+        httponly=True,
+        secure=False,
+        samesite='Lax',
+        path='/'
+    )
+    if refresh_token is not None:
+        res.set_cookie(
+            key='refresh_token',
+            value=str(refresh_token),
+            httponly=True,
+            secure=False,
+            samesite='Lax',
+            path='/'
+        )
+    return res
+
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     def post(self, request, *args, **kwargs):
         
@@ -48,30 +73,8 @@ class CustomTokenObtainPairView(TokenObtainPairView):
         refresh_token = tokens['refresh']
 
         res = Response()
-        
-        # Set HttpOnly cookies
-        res.set_cookie(
-            key='access_token',
-            value=str(access_token),
-            httponly=True,
-            # FIX: Must be False for local http development
-            secure=False,
-            # FIX: 'Lax' is correct for local dev. 'None' requires secure=True
-            samesite='Lax', 
-            path='/'
-        )
+        set_token_cookies(res, access_token, refresh_token)
 
-        res.set_cookie(
-            key='refresh_token',
-            value=str(refresh_token),
-            httponly=True,
-            # FIX: Must be False for local http development
-            secure=False, 
-            # FIX: 'Lax' is correct
-            samesite='Lax',
-            path='/'
-        )
-        
         # Return user data and tokens in the response body (optional)
         res.data = {
             'success': True,
@@ -139,7 +142,7 @@ def logout(request):
         
         if refresh_token:
             # FIX: Blacklist the token
-            token = RefreshToken(refresh_token)
+            token = ClaimsRefreshToken(refresh_token)
             token.blacklist()
         
         res = Response()
@@ -163,8 +166,7 @@ def logout(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_todos(request):
-    user = request.user
-    todos = Todo.objects.filter(owner=user)
+    todos = Todo.objects.filter(owner_id=request.user.id)
     serializer = TodoSerializer(todos, many=True)
     return Response(serializer.data)
 
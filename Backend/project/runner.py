@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Keeps tests off the host's shared caches: "catalog-versions" is a file
+    cache other processes read, and tests clear it freely.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = override_settings(CACHES={
+            **settings.CACHES,
+            "catalog-versions": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "catalog-versions",
+                "TIMEOUT": None,
+                "OPTIONS": settings.CACHES["catalog-versions"].get("OPTIONS", {}),
+            },
+        })
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,6 +1,6 @@
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,7 +45,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.middleware.MetricsMiddleware',
+    'app.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'app.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.common.CommonMiddleware',
@@ -86,6 +89,8 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": False,
     "UPDATE_LAST_LOGIN": False,
+    "TOKEN_OBTAIN_SERIALIZER": "base.serializers.CustomTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "base.serializers.CustomTokenRefreshSerializer",
 
     'AUTH_COOKIE': 'access_token',  # Cookie name for the access token
     'AUTH_COOKIE_REFRESH': 'refresh_token',  # Cookie name for the refresh token
@@ -121,11 +126,72 @@ WSGI_APPLICATION = 'project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_PROFILE picks the defaults below; every value can still be set on
+# its own through the environment.
+#   dev         SQLite, rollback journal, one connection per request
+#   production  SQLite in WAL mode with the pragmas in SQLITE_PRAGMAS
+#               (applied in app/db.py) and persistent connections
+#   postgres    PostgreSQL (needs psycopg) with persistent connections.
+#               Put PgBouncer in front for pooling and set DB_PGBOUNCER.
+DB_PROFILE = config('DB_PROFILE', default='dev')
+
+if DB_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='cadence'),
+            'USER': config('DB_USER', default='postgres'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            # Transaction-mode PgBouncer can't hold server-side cursors
+            'DISABLE_SERVER_SIDE_CURSORS': config('DB_PGBOUNCER', default=False, cast=bool),
+            'OPTIONS': {
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+                'application_name': 'cadence',
+                'options': '-c statement_timeout=%d' % config('DB_STATEMENT_TIMEOUT_MS', default=30000, cast=int),
+            },
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60 if DB_PROFILE == 'production' else 0, cast=int),
+            'CONN_HEALTH_CHECKS': DB_PROFILE == 'production',
+        }
+    }
+
+# Read replicas for catalog reads (app/routers.py): SQLite files, or
+# PostgreSQL hosts with the postgres profile. `manage.py sync_replicas`
+# copies a SQLite primary into its replicas for local testing.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(config('DB_REPLICAS', default='', cast=Csv()), start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST' if DB_PROFILE == 'postgres' else 'NAME': replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['app.routers.PrimaryReplicaRouter']
+# How long a client keeps reading from the primary after a write; should
+# cover the replication lag.
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
+# PRAGMAs run on every new SQLite connection; empty or 0 keeps SQLite's
+# default. journal_mode=WAL is stored in the database file, the others
+# are per connection.
+SQLITE_PRAGMAS = {
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL' if DB_PROFILE == 'production' else ''),
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL' if DB_PROFILE == 'production' else ''),
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=268435456 if DB_PROFILE == 'production' else 0, cast=int),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT_MS', default=5000, cast=int),
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-20000 if DB_PROFILE == 'production' else 0, cast=int),
 }
 
 
@@ -172,3 +238,102 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Razorpay Settings
 RAZORPAY_KEY_ID = config('RAZORPAY_KEY_ID', default='rzp_test_ROhm8gRpTv2xUm')
 RAZORPAY_KEY_SECRET = config('RAZORPAY_KEY_SECRET', default='AOX9CU7x2sCR2Sp8XYv3lFoq')
+
+# Response cache for the song catalog (see app/cache.py). Bodies are kept
+# per process for at most CATALOG_CACHE_TTL seconds; the version keys that
+# invalidate them are shared through the "catalog-versions" cache below, so
+# a write in any process (or run_workers) reaches every worker. Use
+# app.cache.DjangoCacheBackend to share the bodies too.
+CATALOG_CACHE = {
+    "BACKEND": "app.cache.LRUBackend",
+    "OPTIONS": {
+        "max_entries": config("CATALOG_CACHE_MAX_ENTRIES", default=2048, cast=int),
+        "timeout": config("CATALOG_CACHE_TTL", default=300, cast=int),
+    },
+    "VERSIONS": {"BACKEND": "app.cache.DjangoCacheBackend", "OPTIONS": {"alias": "catalog-versions"}},
+}
+
+# The file cache is shared by every process on this host; point
+# "catalog-versions" at Redis or Memcached when the app runs on several.
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "catalog-versions": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": config("CATALOG_VERSIONS_DIR", default=str(BASE_DIR / "var" / "catalog-versions")),
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": config("CATALOG_VERSIONS_MAX_ENTRIES", default=100000, cast=int)},
+    },
+}
+
+# Tests swap "catalog-versions" for a per-process cache (project/runner.py)
+TEST_RUNNER = "project.runner.TestRunner"
+
+# Audio streaming (app/streaming.py). Leave empty to serve ranges from
+# Django, or hand the transfer to the front web server:
+#   "x-accel"    -> nginx, internal location at AUDIO_STREAM_ACCEL_PREFIX
+#   "x-sendfile" -> Apache mod_xsendfile / lighttpd
+AUDIO_STREAM_OFFLOAD = config("AUDIO_STREAM_OFFLOAD", default="") or None
+AUDIO_STREAM_ACCEL_PREFIX = config("AUDIO_STREAM_ACCEL_PREFIX", default="/protected-media/")
+
+# Resolve request.user from the signed token claims instead of loading the
+# User row on every request (base/authentication.py). Role or account
+# changes reach clients on the next token refresh.
+JWT_STATELESS_USER = config("JWT_STATELESS_USER", default=False, cast=bool)
+JWT_USER_CACHE_TTL = config("JWT_USER_CACHE_TTL", default=30, cast=int)
+
+# Blacklisted refresh tokens are checked against an in-process set
+# (base/blacklist.py) that picks up other workers' logouts this often,
+# rereading the last JWT_BLACKLIST_SYNC_OVERLAP rows for ones that
+# committed out of id order.
+# Expired rows are removed by `manage.py prune_tokens`; run it from cron.
+JWT_BLACKLIST_SYNC_SECONDS = config("JWT_BLACKLIST_SYNC_SECONDS", default=5, cast=float)
+JWT_BLACKLIST_SYNC_OVERLAP = config("JWT_BLACKLIST_SYNC_OVERLAP", default=1000, cast=int)
+
+# Serve the catalog list/detail and the auth views with the async views in
+# app/async_views.py and base/async_views.py. Opt-in, also under ASGI:
+# the async ORM queues every query on one sync thread, and loadtest shows
+# them slower than the DRF views. Logins hash passwords in a pool of
+# PASSWORD_HASH_WORKERS threads.
+ASYNC_VIEWS = config("ASYNC_VIEWS", default=False, cast=bool)
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=4, cast=int)
+
+# Request metrics (app/metrics.py): Server-Timing headers, Prometheus text
+# at /metrics (bearer METRICS_TOKEN if set) and a warning on the
+# app.metrics logger, with the SQL, for a sample of requests slower than
+# METRICS_SLOW_REQUEST_MS. Off means the middleware is not loaded at all.
+METRICS_ENABLED = config("METRICS_ENABLED", default=False, cast=bool)
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+METRICS_SLOW_REQUEST_MS = config("METRICS_SLOW_REQUEST_MS", default=500, cast=float)
+METRICS_SLOW_SAMPLE_RATE = config("METRICS_SLOW_SAMPLE_RATE", default=1.0, cast=float)
+
+# Background jobs (app/jobs.py), run by `manage.py run_workers` from the
+# database queue; no broker needed. Failed jobs are retried up to
+# JOBS_MAX_ATTEMPTS times with exponential backoff from JOBS_RETRY_DELAY
+# seconds, capped at JOBS_RETRY_MAX_DELAY. Jobs running longer than
+# JOBS_LOCK_TIMEOUT are assumed orphaned and requeued.
+JOBS_WORKERS = config("JOBS_WORKERS", default=4, cast=int)
+JOBS_POLL_SECONDS = config("JOBS_POLL_SECONDS", default=1.0, cast=float)
+JOBS_MAX_ATTEMPTS = config("JOBS_MAX_ATTEMPTS", default=5, cast=int)
+JOBS_RETRY_DELAY = config("JOBS_RETRY_DELAY", default=5.0, cast=float)
+JOBS_RETRY_MAX_DELAY = config("JOBS_RETRY_MAX_DELAY", default=600.0, cast=float)
+JOBS_LOCK_TIMEOUT = config("JOBS_LOCK_TIMEOUT", default=900, cast=int)
+
+# Resumable audio uploads (app/uploads.py): largest file and chunk
+# accepted, and how long an unfinished session is kept before
+# `manage.py prune_uploads` deletes it.
+UPLOAD_MAX_BYTES = config("UPLOAD_MAX_BYTES", default=2 * 1024 ** 3, cast=int)
+UPLOAD_CHUNK_MAX_BYTES = config("UPLOAD_CHUNK_MAX_BYTES", default=64 * 1024 ** 2, cast=int)
+UPLOAD_SESSION_TTL = config("UPLOAD_SESSION_TTL", default=24 * 3600, cast=int)
+
+# A media blob reused by a save is not deleted by a concurrent release until
+# that save commits, or for at most this long (app/storage.py). Keep it
+# above the longest transaction that saves songs.
+MEDIA_BLOB_LEASE_SECONDS = config("MEDIA_BLOB_LEASE_SECONDS", default=600, cast=int)
+
+# Response compression (app/compression.py): gzip, or Brotli when the
+# brotli package is installed, for bodies of COMPRESSION_MIN_BYTES or more.
+# Compressed catalog payloads are kept per ETag in an in-process LRU of
+# COMPRESSION_CACHE_BYTES. Disable when a front proxy already compresses.
+COMPRESSION_ENABLED = config("COMPRESSION_ENABLED", default=True, cast=bool)
+COMPRESSION_MIN_BYTES = config("COMPRESSION_MIN_BYTES", default=1024, cast=int)
+COMPRESSION_CACHE_BYTES = config("COMPRESSION_CACHE_BYTES", default=32 * 1024 ** 2, cast=int)
@@ -3,12 +3,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from app.views import metrics
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api/", include("app.urls")),
     path('auth/', include('base.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -1,9 +1,9 @@
 import AxiosInstance from "../Axios"; // adjust if path differs
 
 class ClientService {
-  // Fetch all songs
-  static async getSongs() {
-    return AxiosInstance.get("api/songs/");
+  // Fetch one page of songs (pass the `next` URL to get the following page)
+  static async getSongs(pageUrl = "api/songs/") {
+    return AxiosInstance.get(pageUrl);
   }
 
   // Fetch one song by ID
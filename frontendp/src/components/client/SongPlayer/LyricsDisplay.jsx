@@ -1,6 +1,18 @@
 import React, { useEffect, useState, useRef } from "react";
 import LyricsLine from "./LyricsLine";
 
+// Index of the last line with timestamp <= time (lyrics are sorted by time)
+const findActiveIndex = (lyrics, time) => {
+  let lo = 0;
+  let hi = lyrics.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (lyrics[mid].timestamp <= time) lo = mid + 1;
+    else hi = mid;
+  }
+  return Math.max(lo - 1, 0);
+};
+
 const LyricsDisplay = ({ lyrics, audioRef }) => {
   const [currentIndex, setCurrentIndex] = useState(0);
   const scrollRef = useRef(null);
@@ -10,15 +22,7 @@ const LyricsDisplay = ({ lyrics, audioRef }) => {
     const interval = setInterval(() => {
       if (!audioRef.current) return;
 
-      const time = audioRef.current.currentTime;
-
-      for (let i = 0; i < lyrics.length; i++) {
-        if (time < lyrics[i].timestamp) {
-          const newIndex = i - 1 >= 0 ? i - 1 : 0;
-          setCurrentIndex(newIndex);
-          break;
-        }
-      }
+      setCurrentIndex(findActiveIndex(lyrics, audioRef.current.currentTime));
     }, 200);
 
     return () => clearInterval(interval);
@@ -36,7 +36,7 @@ const SongPlayerPage = () => {
 
       {/* Modern Audio Player */}
       <div className="w-full max-w-2xl mt-8">
-        <AudioPlayer audioUrl={song.audio_file} audioRef={audioRef} />
+        <AudioPlayer audioUrl={song.audio_stream || song.audio_file} audioRef={audioRef} />
       </div>
 
       {/* Lyrics Section */}
@@ -1,7 +1,15 @@
 import React from "react";
 import { useNavigate } from "react-router-dom";
 
+// "url 160w, url 320w, ..." from one format of song.cover_srcset
+const toSrcSet = (sizes = {}) =>
+  Object.entries(sizes)
+    .map(([width, url]) => `${url} ${width}w`)
+    .join(", ");
+
 const SongCard = ({ song }) => {
+  const covers = song.cover_srcset || {};
+
   const navigate = useNavigate();
 
   return (
@@ -16,13 +24,19 @@ const SongCard = ({ song }) => {
         boxShadow: "0 0 5px rgba(255,255,255,0.1)",
       }}
     >
-      <img
-        src={song.cover_image}
-        alt="Cover"
-        style={{ width: "100%", height: "180px", borderRadius: "8px" }}
-      />
+      <picture>
+        <source type="image/webp" srcSet={toSrcSet(covers.webp)} sizes="200px" />
+        <img
+          src={covers.jpeg?.["320"] || song.cover_image}
+          srcSet={toSrcSet(covers.jpeg)}
+          sizes="200px"
+          alt="Cover"
+          loading="lazy"
+          style={{ width: "100%", height: "180px", borderRadius: "8px" }}
+        />
+      </picture>
       <h3>{song.title}</h3>
-      <p>Artist ID: {song.artist}</p>
+      <p>{song.artist_name}</p>
     </div>
   );
 };
@@ -4,22 +4,34 @@ import SongGrid from "./SongGrid";
 
 const SongSelectionPage = () => {
   const [songs, setSongs] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [loading, setLoading] = useState(true);
 
-  useEffect(() => {
-    ClientService.getSongs()
+  const loadPage = (pageUrl) => {
+    setLoading(true);
+    return ClientService.getSongs(pageUrl)
       .then((res) => {
-        setSongs(res.data);
+        setSongs((prev) => (pageUrl ? [...prev, ...res.data.results] : res.data.results));
+        setNextPage(res.data.next);
       })
       .finally(() => setLoading(false));
+  };
+
+  useEffect(() => {
+    loadPage();
   }, []);
 
-  if (loading) return <p>Loading songs...</p>;
+  if (loading && songs.length === 0) return <p>Loading songs...</p>;
 
   return (
     <div style={{ padding: "20px" }}>
       <h1>Select a Song</h1>
       <SongGrid songs={songs} />
+      {nextPage && (
+        <button onClick={() => loadPage(nextPage)} disabled={loading}>
+          {loading ? "Loading..." : "Load more"}
+        </button>
+      )}
     </div>
   );
 };